@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Tuple, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 import os
 from dotenv import load_dotenv
 
@@ -17,8 +23,55 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Work factor của bcrypt (mỗi +1 gấp đôi thời gian hash)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt nhả GIL nên chạy được song song trên thread pool có giới hạn
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", 4))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 30))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 security = HTTPBearer()
+password_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+class UserCache:
+    """Cache ngắn hạn trong process: token subject (username) -> snapshot các cột của User.
+
+    Chỉ lưu dict (không lưu instance ORM) để mỗi request dựng instance riêng,
+    sửa đổi của một request không lọt sang request khác.
+    """
+
+    def __init__(self, ttl: float = AUTH_USER_CACHE_TTL, max_size: int = AUTH_USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, username: str) -> Optional[Any]:
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[username]
+            return None
+        self._entries.move_to_end(username)
+        return user
+
+    def set(self, username: str, user: Any):
+        if self.ttl <= 0:
+            return
+        self._entries[username] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        self._entries.pop(username, None)
+
+    def clear(self):
+        self._entries.clear()
+
+user_cache = UserCache()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -26,6 +79,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password trên thread pool, không block event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash trên thread pool, không block event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -54,24 +117,42 @@ def verify_token(token: str):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+def _user_snapshot(user: User) -> Dict[str, Any]:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+async def _attach_cached_user(db: AsyncSession, snapshot: Dict[str, Any]) -> User:
+    """Dựng User từ snapshot và gắn vào session của request (merge load=False: không query)"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)):
     token = credentials.credentials
     username = verify_token(token)
-    user = db.query(User).filter(User.username == username).first()
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        return await _attach_cached_user(db, snapshot)
+    
+    user = await get_user_by_username(db, username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_cache.set(username, _user_snapshot(user))
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-def get_admin_user(current_user: User = Depends(get_current_active_user)):
+async def get_admin_user(current_user: User = Depends(get_current_active_user)):
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -79,10 +160,10 @@ def get_admin_user(current_user: User = Depends(get_current_active_user)):
         )
     return current_user
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
\ No newline at end of file
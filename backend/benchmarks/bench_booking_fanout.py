@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark: tìm kiếm booking gọi tuần tự vs fan-out song song có deadline.
+
+Dựng P provider giả lập (StandInProvider) với độ trễ trải từ --min-latency đến
+--max-latency ms (và tùy chọn tỉ lệ lỗi), rồi đo cho R lần tìm kiếm:
+  - sequential: gọi lần lượt từng provider (như khi nối thẳng từng API)
+  - fan-out: BookingService.fan_out gọi song song, cắt ở --deadline ms
+In ra p50/p95 latency và số offer / provider trung bình nhận được trước deadline.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_booking_fanout.py --providers 8 --deadline 400
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.schemas import FlightSearchRequest  # noqa: E402
+from services.booking_providers import StandInProvider  # noqa: E402
+from services.booking_service import BookingService  # noqa: E402
+
+REQUEST = FlightSearchRequest(origin="Hà Nội", destination="TP. Hồ Chí Minh", departure_date="2025-01-01")
+
+
+def make_providers(count: int, min_latency: float, max_latency: float, jitter: float, failure_rate: float):
+    providers = []
+    for i in range(count):
+        latency = min_latency + (max_latency - min_latency) * i / max(count - 1, 1)
+        offers = [
+            {"id": f"F{(i + j) % count:03d}", "airline": f"Airline {(i + j) % count}", "origin": None,
+             "destination": None, "departure_time": f"{6 + j:02d}:00", "price": 1000000 + 10000 * ((i * 7 + j) % 50),
+             "class": None}
+            for j in range(5)
+        ]
+        providers.append(StandInProvider(f"provider_{i}", {"flights": offers}, latency_ms=latency,
+                                         jitter_ms=jitter, failure_rate=failure_rate, seed=i))
+    return providers
+
+
+async def sequential(service: BookingService):
+    offers, answered = [], 0
+    for provider in service.providers:
+        try:
+            offers.extend(await provider.search("flights", REQUEST))
+            answered += 1
+        except Exception:
+            pass
+    return len(service._dedupe("flights", offers)), answered
+
+
+async def fan_out(service: BookingService):
+    result = await service.fan_out("flights", REQUEST)
+    answered = sum(1 for entry in result.get("providers", {}).values() if entry["status"] == "ok")
+    return len(result.get("flights", [])), answered
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(args):
+    service = BookingService()
+    service.providers = []
+    service.search_deadline = args.deadline / 1000
+    for provider in make_providers(args.providers, args.min_latency, args.max_latency, args.jitter, args.failure_rate):
+        service.register_provider(provider)
+
+    for name, fn in (("sequential", sequential), ("fan-out", fan_out)):
+        latencies, offers, answered = [], [], []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            found, responded = await fn(service)
+            latencies.append((time.perf_counter() - start) * 1000)
+            offers.append(found)
+            answered.append(responded)
+        print(f"{name:<11} p50={statistics.median(latencies):8.1f}ms  p95={percentile(latencies, 0.95):8.1f}ms  "
+              f"offers={statistics.mean(offers):5.1f}  providers={statistics.mean(answered):4.1f}/{args.providers}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--providers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--min-latency", type=float, default=50, help="ms")
+    parser.add_argument("--max-latency", type=float, default=600, help="ms")
+    parser.add_argument("--jitter", type=float, default=100, help="ms")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=400, help="ms")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Benchmark: chi phí liệt kê booking (my-bookings / admin bookings).
+
+Tạo N booking (mặc định 50k) rồi so sánh:
+- orm: load ORM object, validate BookingResponse, jsonable_encoder, json.dumps
+  (đường đi của response_model: parse booking_data rồi serialize lại từng row)
+- prebuilt: BookingQueryService.list_json, booking_data đi nguyên văn từ database
+và lọc theo destination bằng json_extract trên booking_data vs cột sinh có index.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_booking_listing.py --bookings 50000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_bookings_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import select, insert, func, text  # noqa: E402
+
+from config.database import Base, engine, SessionLocal, AsyncSessionLocal  # noqa: E402
+from models.models import User, Booking  # noqa: E402
+from models.schemas import BookingResponse  # noqa: E402
+from services.booking_query_service import booking_query_service  # noqa: E402
+
+CITIES = ["Hà Nội", "Đà Nẵng", "Huế", "Hồ Chí Minh", "Nha Trang", "Đà Lạt", "Phú Quốc", "Hải Phòng"]
+PROVIDERS = ["vietnam_airlines", "vietjet", "bamboo", "vnr", "hotel_inventory"]
+
+
+def seed(bookings: int, users: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add_all([User(email=f"bench{i}@example.com", username=f"bench{i}", hashed_password="x") for i in range(users)])
+    db.commit()
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(bookings):
+        travel = start + timedelta(days=rng.randrange(365))
+        batch.append({
+            "user_id": 1 + i % users,
+            "booking_type": "flight",
+            "booking_reference": str(uuid.uuid4()),
+            "status": "confirmed",
+            "total_amount": rng.randrange(500, 5000) * 1000,
+            "booking_data": {
+                "booking_id": f"FLIGHT_{i}",
+                "provider": rng.choice(PROVIDERS),
+                "travel_date": travel.date().isoformat(),
+                "destination": rng.choice(CITIES),
+                "confirmation_code": uuid.uuid4().hex[:6].upper(),
+                "passengers": [{"name": f"Hành khách {j}", "seat": f"{j + 1}A"} for j in range(rng.randrange(1, 4))]
+            },
+            "created_at": start + timedelta(minutes=i)
+        })
+        if len(batch) == 10000:
+            db.execute(insert(Booking), batch)
+            batch = []
+    if batch:
+        db.execute(insert(Booking), batch)
+    db.commit()
+    db.close()
+
+
+async def orm_listing(query) -> bytes:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(query)).scalars().all()
+        return json.dumps(jsonable_encoder([BookingResponse.model_validate(row) for row in rows])).encode()
+
+
+async def prebuilt_listing(**kwargs) -> bytes:
+    async with AsyncSessionLocal() as db:
+        return await booking_query_service.list_json(db, **kwargs)
+
+
+async def count(query) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(query)
+
+
+def timed(make, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = asyncio.run(make())
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.bookings, args.users)
+    print(f"Seeded {args.bookings} bookings for {args.users} users in {time.perf_counter() - t0:.1f}s")
+
+    user_query = select(Booking).where(Booking.user_id == 1).order_by(Booking.created_at.desc(), Booking.id.desc())
+    scenarios = {
+        "admin, all rows": (
+            lambda: orm_listing(select(Booking).order_by(Booking.id)),
+            lambda: prebuilt_listing()
+        ),
+        "admin, page 100": (
+            lambda: orm_listing(select(Booking).order_by(Booking.id).offset(1000).limit(100)),
+            lambda: prebuilt_listing(offset=1000, limit=100)
+        ),
+        "my-bookings": (
+            lambda: orm_listing(user_query),
+            lambda: prebuilt_listing(user_id=1)
+        ),
+    }
+    print(f"{'listing':<18} {'rows':>7} {'orm':>10} {'prebuilt':>10} {'speedup':>8}")
+    for name, (orm, prebuilt) in scenarios.items():
+        orm_ms, orm_body = timed(orm, args.repeat)
+        prebuilt_ms, prebuilt_body = timed(prebuilt, args.repeat)
+        assert json.loads(orm_body) == json.loads(prebuilt_body), "prebuilt listing differs from response_model"
+        print(f"{name:<18} {len(json.loads(prebuilt_body)):>7} {orm_ms:>8.1f}ms {prebuilt_ms:>8.1f}ms "
+              f"{orm_ms / prebuilt_ms:>7.1f}x")
+
+    scan = select(func.count()).select_from(Booking).where(
+        func.json_extract(Booking.booking_data, "$.destination") == "Huế")
+    indexed = select(func.count()).select_from(Booking).where(Booking.destination == "Huế")
+    with engine.connect() as conn:
+        plan = conn.execute(text("EXPLAIN QUERY PLAN " + str(indexed.compile(
+            engine, compile_kwargs={"literal_binds": True})))).all()
+    print("Indexed filter plan:", " | ".join(row[-1] for row in plan))
+    scan_ms, scan_count = timed(lambda: count(scan), args.repeat)
+    indexed_ms, indexed_count = timed(lambda: count(indexed), args.repeat)
+    assert scan_count == indexed_count
+    print(f"destination filter ({indexed_count} rows): json_extract {scan_ms:.1f}ms, "
+          f"generated column {indexed_ms:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark: event-loop lag khi route handler dùng Session sync vs AsyncSession.
+
+Mô phỏng N request đồng thời, mỗi request ghi 2 ChatMessage + commit rồi đọc lại
+lịch sử session (giống /api/chatbot/send). Một coroutine đo độ trễ của event loop
+(thời gian thực tế ngủ vượt quá 1 ms) trong lúc các request chạy.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_event_loop_lag.py --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_lag_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+
+from config.database import Base, engine, SessionLocal, AsyncSessionLocal, async_engine  # noqa: E402
+from models.models import User, ChatSession, ChatMessage  # noqa: E402
+
+
+async def monitor_lag(samples: list, stop: asyncio.Event, interval: float = 0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def sync_turn(session_pk: int):
+    # Pattern cũ: Session sync gọi thẳng trong async def
+    db = SessionLocal()
+    try:
+        db.add(ChatMessage(session_id=session_pk, message="hi", response="hello", is_user=True))
+        db.add(ChatMessage(session_id=session_pk, message="hello", is_user=False))
+        db.commit()
+        db.query(ChatMessage).filter(ChatMessage.session_id == session_pk).limit(20).all()
+    finally:
+        db.close()
+
+
+async def async_turn(session_pk: int):
+    async with AsyncSessionLocal() as db:
+        db.add(ChatMessage(session_id=session_pk, message="hi", response="hello", is_user=True))
+        db.add(ChatMessage(session_id=session_pk, message="hello", is_user=False))
+        await db.commit()
+        await db.execute(select(ChatMessage).where(ChatMessage.session_id == session_pk).limit(20))
+
+
+async def run(turn, session_pk: int, requests: int, concurrency: int):
+    samples: list = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(samples, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await turn(session_pk)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    samples.sort()
+    return {
+        "elapsed_s": elapsed,
+        "lag_mean_ms": statistics.mean(samples) if samples else 0.0,
+        "lag_p99_ms": samples[int(len(samples) * 0.99) - 1] if samples else 0.0,
+        "lag_max_ms": samples[-1] if samples else 0.0,
+        "lag_samples": len(samples),
+    }
+
+
+def setup() -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    session = ChatSession(user_id=user.id, session_id="bench-session", title="bench")
+    db.add(session)
+    db.commit()
+    session_pk = session.id
+    db.close()
+    return session_pk
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    session_pk = setup()
+    print(f"DB: {DB_PATH} | requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'mode':<8} {'elapsed':>9} {'lag mean':>10} {'lag p99':>10} {'lag max':>10}")
+    for name, turn in (("sync", sync_turn), ("async", async_turn)):
+        result = await run(turn, session_pk, args.requests, args.concurrency)
+        print(f"{name:<8} {result['elapsed_s']:>8.2f}s {result['lag_mean_ms']:>8.2f}ms "
+              f"{result['lag_p99_ms']:>8.2f}ms {result['lag_max_ms']:>8.2f}ms")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
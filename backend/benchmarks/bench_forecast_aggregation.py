@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark: gộp dự báo theo ngày bằng vòng lặp cũ, Python thuần và NumPy.
+
+Sinh N forecast giả lập (mỗi forecast 40 mốc 3 giờ như API 5 ngày của
+OpenWeatherMap) và đo thời gian tổng hợp theo ngày. Vòng lặp cũ gọi
+datetime.fromtimestamp cho từng mốc (múi giờ của server) và chỉ tính min/max;
+aggregate_daily (Python thuần) nhóm theo ngày địa phương của thành phố và tính
+thêm trung bình, mode, lượng mưa. Bản NumPy được đo theo từng lô cỡ khác nhau
+để chọn BATCH_MIN_FORECASTS: dưới ngưỡng đó aggregate_daily_batch gọi
+aggregate_daily từng forecast.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_forecast_aggregation.py --forecasts 2000 --points 40
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.forecast_aggregation import (  # noqa: E402
+    BATCH_MIN_FORECASTS, aggregate_daily, _aggregate_daily_numpy
+)
+
+CONDITIONS = [("trời quang", "01"), ("mây rải rác", "03"), ("mưa nhẹ", "10"), ("dông", "11")]
+
+
+def make_forecast(points: int, rng: random.Random) -> dict:
+    start = 1704067200 + rng.randrange(0, 86400 * 30, 10800)
+    items = []
+    for i in range(points):
+        temp = rng.uniform(18, 35)
+        description, icon = rng.choice(CONDITIONS)
+        item = {
+            "dt": start + i * 10800,
+            "main": {"temp": temp, "temp_min": temp - 1, "temp_max": temp + 1, "humidity": rng.randint(40, 95)},
+            "wind": {"speed": rng.uniform(0, 10)},
+            "weather": [{"description": description, "icon": icon + rng.choice("dn")}]
+        }
+        if icon == "10":
+            item["rain"] = {"3h": rng.uniform(0, 5)}
+        items.append(item)
+    return {"list": items, "city": {"timezone": 25200}}
+
+
+def legacy_aggregate(forecast_data: dict) -> list:
+    """Vòng lặp trước đây trong WeatherService.format_weather_response"""
+    daily_forecasts = {}
+    for item in forecast_data["list"]:
+        date = datetime.fromtimestamp(item["dt"]).date()
+        if date not in daily_forecasts:
+            daily_forecasts[date] = {
+                "date": date.isoformat(),
+                "temp_min": item["main"]["temp_min"],
+                "temp_max": item["main"]["temp_max"],
+                "description": item["weather"][0]["description"],
+                "icon": item["weather"][0]["icon"],
+                "humidity": item["main"]["humidity"],
+                "wind_speed": item["wind"]["speed"]
+            }
+        else:
+            daily_forecasts[date]["temp_min"] = min(daily_forecasts[date]["temp_min"], item["main"]["temp_min"])
+            daily_forecasts[date]["temp_max"] = max(daily_forecasts[date]["temp_max"], item["main"]["temp_max"])
+    return list(daily_forecasts.values())[:5]
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--forecasts", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=40, help="số mốc 3 giờ mỗi forecast")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-sizes", default="1,4,16,64,256", help="cỡ lô cho bản NumPy, cách nhau bởi dấu phẩy")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    forecasts = [make_forecast(args.points, rng) for _ in range(args.forecasts)]
+    assert _aggregate_daily_numpy(forecasts, 5) == [aggregate_daily(f) for f in forecasts]
+
+    results = {
+        "legacy loop": timed(lambda: [legacy_aggregate(f) for f in forecasts], args.repeat),
+        "python (per forecast)": timed(lambda: [aggregate_daily(f) for f in forecasts], args.repeat)
+    }
+    for size in (int(value) for value in args.batch_sizes.split(",")):
+        chunks = [forecasts[i:i + size] for i in range(0, len(forecasts), size)]
+        results[f"numpy (batch of {size})"] = timed(lambda: [_aggregate_daily_numpy(c, 5) for c in chunks], args.repeat)
+    legacy_ms = results["legacy loop"]
+    print(f"{args.forecasts} forecasts x {args.points} points (BATCH_MIN_FORECASTS={BATCH_MIN_FORECASTS})")
+    for name, ms in results.items():
+        print(f"  {name:<23}: {ms:8.1f}ms total  {ms / args.forecasts * 1000:8.1f}us/forecast  {legacy_ms / ms:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Benchmark: chỉ mục khách sạn trong bộ nhớ (HotelInventory) trên N khách sạn.
+
+Sinh N khách sạn giả lập (mặc định 100k) trải trên C thành phố với giá, hạng
+sao, tiện nghi và các ngày hết phòng ngẫu nhiên, đo thời gian dựng index và
+p50/p99 cho từng kiểu truy vấn (lọc giá/hạng sao/tiện nghi/ngày ở, các cách
+sắp xếp). Kiểu truy vấn đầu tiên được so sánh với quét tuần tự bằng Python
+trên list dict để kiểm tra kết quả và thấy mức chênh lệch.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_hotel_inventory.py --hotels 100000 --cities 60
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.hotel_inventory import HotelInventory, normalize_city  # noqa: E402
+
+AMENITIES = ["WiFi", "Pool", "Spa", "Gym", "Restaurant", "Bar", "Parking", "Breakfast", "Beach Access",
+             "Airport Shuttle", "Kitchen", "Pet Friendly", "Bicycle Rental", "Garden", "Heating", "Air Conditioning"]
+BASE = date(2025, 1, 1)
+
+
+def generate(hotels: int, cities: int, seed: int = 7):
+    rng = random.Random(seed)
+    city_names = ["Đà Nẵng", "Hà Nội", "TP. Hồ Chí Minh"] + [f"City {i}" for i in range(cities - 3)]
+    records = []
+    for i in range(hotels):
+        # Phân bố lệch: vài thành phố lớn chiếm phần lớn khách sạn
+        city = city_names[min(int(rng.paretovariate(1.2)) - 1, cities - 1)]
+        stars = rng.choice([2, 3, 3, 4, 4, 4, 5])
+        blackout = [(BASE + timedelta(days=rng.randrange(365))).isoformat() for _ in range(rng.randrange(0, 30))]
+        records.append({
+            "id": f"H{i:06d}",
+            "name": f"Hotel {i}",
+            "city": city,
+            "rating": round(stars - rng.random() * 0.9, 1),
+            "price_per_night": rng.randrange(200, 8000) * 1000,
+            "amenities": rng.sample(AMENITIES, rng.randrange(1, 8)),
+            "rooms": rng.randrange(1, 80),
+            "max_guests_per_room": rng.choice([1, 2, 2, 3, 4]),
+            "blackout_dates": blackout
+        })
+    return records
+
+
+def naive_search(records, city, check_in, check_out, max_price, min_rating, amenities):
+    nights = set()
+    day = date.fromisoformat(check_in)
+    while day < date.fromisoformat(check_out):
+        nights.add(day.isoformat())
+        day += timedelta(days=1)
+    required = {a.casefold() for a in amenities}
+    matches = [
+        r for r in records
+        if normalize_city(r["city"]) == normalize_city(city)
+        and r["price_per_night"] <= max_price and r["rating"] >= min_rating
+        and required <= {a.casefold() for a in r["amenities"]}
+        and not nights & set(r["blackout_dates"])
+    ]
+    matches.sort(key=lambda r: r["price_per_night"])
+    return [r["id"] for r in matches[:20]]
+
+
+QUERIES = {
+    "4*+ pool <1.5M, Da Nang": dict(city="Da Nang", max_price=1500000, min_rating=4, amenities=["Pool"]),
+    "price range, Hanoi": dict(city="Hà Nội", min_price=500000, max_price=2000000),
+    "spa+gym, rating sort": dict(city="TP. Hồ Chí Minh", amenities=["Spa", "Gym"], sort_by="rating_desc"),
+    "family 2 rooms 6 guests": dict(city="Da Nang", rooms=2, guests=6, sort_by="price_desc"),
+    "small city, no filter": dict(city="City 40"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hotels", type=int, default=100000)
+    parser.add_argument("--cities", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    records = generate(args.hotels, args.cities)
+    print(f"Generated {args.hotels} hotels in {time.perf_counter() - t0:.1f}s")
+    inventory = HotelInventory(horizon_days=365)
+    t0 = time.perf_counter()
+    inventory.build(records, base_date=BASE)
+    print(f"Index build: {(time.perf_counter() - t0) * 1000:.0f}ms, largest city: "
+          f"{max(index.prices.size for index in inventory.cities.values())} hotels")
+
+    rng = random.Random(1)
+    stays = []
+    for _ in range(args.repeat):
+        start = BASE + timedelta(days=rng.randrange(300))
+        stays.append((start.isoformat(), (start + timedelta(days=rng.randrange(1, 8))).isoformat()))
+
+    check_in, check_out = stays[0]
+    first = QUERIES["4*+ pool <1.5M, Da Nang"]
+    expected = naive_search(records, first["city"], check_in, check_out, first["max_price"],
+                            first["min_rating"], first["amenities"])
+    got = [h["id"] for h in inventory.search(check_in=check_in, check_out=check_out, **first)[1]]
+    assert got == expected, "index results differ from naive scan"
+    t0 = time.perf_counter()
+    naive_search(records, first["city"], check_in, check_out, first["max_price"], first["min_rating"], first["amenities"])
+    print(f"Naive Python scan (first query): {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    print(f"{'query':<26} {'matches':>8} {'p50':>9} {'p99':>9}")
+    for name, params in QUERIES.items():
+        samples, matches = [], []
+        for check_in, check_out in stays:
+            start = time.perf_counter()
+            total, _ = inventory.search(check_in=check_in, check_out=check_out, **params)
+            samples.append((time.perf_counter() - start) * 1000)
+            matches.append(total)
+        samples.sort()
+        print(f"{name:<26} {statistics.mean(matches):8.0f} {samples[len(samples) // 2]:7.3f}ms "
+              f"{samples[int(len(samples) * 0.99)]:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: phân trang lịch sử chat theo OFFSET vs keyset (created_at, id).
+
+Tạo một session có N tin nhắn (mặc định 100k) và đo thời gian lấy một trang
+50 tin nhắn ở các độ sâu khác nhau. Keyset dùng index
+ix_chat_messages_session_created nên thời gian gần như không đổi theo độ sâu,
+OFFSET phải duyệt qua mọi row phía trước.
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_keyset_pagination.py --messages 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_keyset_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, insert, text, tuple_  # noqa: E402
+
+from config.database import Base, engine, SessionLocal  # noqa: E402
+from models.models import User, ChatSession, ChatMessage  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+def seed(messages: int) -> int:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    sessions = [ChatSession(user_id=user.id, session_id=f"bench-{i}", title="bench") for i in range(5)]
+    db.add_all(sessions)
+    db.commit()
+    target = sessions[0].id
+
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(messages):
+        # 90% vào session cần đo; nhiều tin nhắn cùng timestamp để kiểm tra tie-break theo id
+        batch.append({
+            "session_id": target if i % 10 else sessions[1 + (i // 10) % 4].id,
+            "message": f"message {i}",
+            "is_user": i % 2 == 0,
+            "created_at": start + timedelta(seconds=i // 3)
+        })
+        if len(batch) == 10000:
+            db.execute(insert(ChatMessage), batch)
+            batch = []
+    if batch:
+        db.execute(insert(ChatMessage), batch)
+    db.commit()
+    db.close()
+    return target
+
+
+def offset_page(db, session_pk: int, offset: int):
+    return db.execute(
+        select(ChatMessage).where(ChatMessage.session_id == session_pk)
+        .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+        .offset(offset).limit(PAGE_SIZE)
+    ).scalars().all()
+
+
+def keyset_query(session_pk: int, cursor):
+    query = select(ChatMessage).where(ChatMessage.session_id == session_pk)
+    if cursor is not None:
+        anchor = select(ChatMessage.created_at).where(ChatMessage.id == cursor).scalar_subquery()
+        query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(anchor, cursor))
+    return query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).limit(PAGE_SIZE)
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    session_pk = seed(args.messages)
+    db = SessionLocal()
+    ids = db.execute(
+        select(ChatMessage.id).where(ChatMessage.session_id == session_pk)
+        .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+    ).scalars().all()
+    print(f"Seeded {args.messages} messages ({len(ids)} in target session) in {time.perf_counter() - t0:.1f}s")
+
+    plan = db.execute(text("EXPLAIN QUERY PLAN " + str(keyset_query(session_pk, ids[0]).compile(
+        engine, compile_kwargs={"literal_binds": True})))).all()
+    print("Keyset plan:", " | ".join(row[-1] for row in plan))
+
+    print(f"{'depth':>8} {'offset':>10} {'keyset':>10}")
+    for depth in (0, 1000, 10000, len(ids) // 2, len(ids) - PAGE_SIZE - 1):
+        cursor = ids[depth - 1] if depth else None
+        expected = offset_page(db, session_pk, depth)
+        got = db.execute(keyset_query(session_pk, cursor)).scalars().all()
+        assert [m.id for m in got] == [m.id for m in expected], "keyset page differs from offset page"
+
+        offset_ms = timed(lambda: offset_page(db, session_pk, depth))
+        keyset_ms = timed(lambda: db.execute(keyset_query(session_pk, cursor)).scalars().all())
+        print(f"{depth:>8} {offset_ms:>8.2f}ms {keyset_ms:>8.2f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
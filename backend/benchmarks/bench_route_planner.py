@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark: tìm hành trình nhiều chặng (RoutePlanner) trên thời gian biểu giả lập.
+
+Sinh một tuyến đường sắt dọc S ga (như tuyến Bắc - Nam) với T chuyến tàu mỗi
+ngày chạy các đoạn ngẫu nhiên, cộng F chuyến bay mỗi ngày giữa A sân bay ở
+các thành phố trên tuyến, rồi đo thời gian dựng đồ thị và p50/p99 cho các cặp
+điểm đi/đến ngẫu nhiên theo từng chế độ (fastest/cheapest, tàu/máy bay/kết hợp).
+Cột "cut" là số truy vấn dừng vì hết ngân sách tìm kiếm (--budget-ms).
+
+Chạy từ thư mục backend:
+    python benchmarks/bench_route_planner.py --stations 60 --trains 300 --flights 600
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.route_planner import RoutePlanner  # noqa: E402
+
+
+def _clock(minutes: int) -> str:
+    minutes %= 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate(stations: int, trains: int, airports: int, flights: int, seed: int = 7):
+    rng = random.Random(seed)
+    positions = sorted(rng.sample(range(0, 1800), stations))
+    stops = [{"id": f"S{i:03d}", "name": f"Ga {i}", "city": f"City {i}", "aliases": [], "type": "station",
+              "min_transfer_minutes": 20} for i in range(stations)]
+    hubs = sorted(rng.sample(range(stations), airports))
+    stops += [{"id": f"A{i:03d}", "name": f"Sân bay {i}", "city": f"City {i}", "aliases": [], "type": "airport",
+               "min_transfer_minutes": 60} for i in hubs]
+
+    trips = []
+    for n in range(trains):
+        start, end = sorted(rng.sample(range(stations), 2))
+        if rng.random() < 0.5:
+            start, end = end, start
+        step = 1 if end > start else -1
+        calls = [i for i in range(start, end + step, step) if i in (start, end) or rng.random() < 0.6]
+        clock = rng.randrange(1440)
+        rows = []
+        for j, i in enumerate(calls):
+            if j:
+                clock += int(abs(positions[i] - positions[calls[j - 1]]) / 60 * 60) + 2
+            km = abs(positions[i] - positions[calls[0]])
+            rows.append([f"S{i:03d}", _clock(clock) if j else None,
+                         _clock(clock + 5) if j < len(calls) - 1 else None, km])
+            clock += 5
+        trips.append({"id": f"T{n}", "mode": "train", "operator": "VNR", "class": "Soft seat",
+                      "fare_per_km": rng.choice([300, 450, 600]), "stops": rows})
+    for n in range(flights):
+        a, b = rng.sample(hubs, 2)
+        departure = rng.randrange(5 * 60, 23 * 60)
+        duration = 50 + abs(positions[a] - positions[b]) // 12
+        trips.append({"id": f"F{n}", "mode": "flight", "operator": rng.choice(["VN", "VJ", "QH"]),
+                      "price": rng.randrange(800, 3000) * 1000,
+                      "stops": [[f"A{a:03d}", None, _clock(departure), 0],
+                                [f"A{b:03d}", _clock(departure + duration), None, abs(positions[a] - positions[b])]]})
+    return {"city_transfer_minutes": 90, "stops": stops, "trips": trips}, hubs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=60)
+    parser.add_argument("--trains", type=int, default=300)
+    parser.add_argument("--airports", type=int, default=12)
+    parser.add_argument("--flights", type=int, default=600)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=None, help="mặc định ROUTE_SEARCH_BUDGET_MS")
+    args = parser.parse_args()
+
+    timetable, hubs = generate(args.stations, args.trains, args.airports, args.flights)
+    planner = RoutePlanner()
+    if args.budget_ms is not None:
+        planner.search_budget = args.budget_ms / 1000
+    t0 = time.perf_counter()
+    planner.build(timetable)
+    print(f"Graph build: {(time.perf_counter() - t0) * 1000:.0f}ms, {len(timetable['trips'])} trips/day, "
+          f"{planner.hops} legs/day")
+
+    rng = random.Random(1)
+    pairs = [tuple(f"City {i}" for i in rng.sample(range(args.stations), 2)) for _ in range(args.queries)]
+    hub_pairs = [tuple(f"City {i}" for i in rng.sample(hubs, 2)) for _ in range(args.queries)]
+    scenarios = {
+        "train, fastest": (pairs, dict(modes=["train"], optimize="fastest")),
+        "train, cheapest": (pairs, dict(modes=["train"], optimize="cheapest")),
+        "flight, fastest": (hub_pairs, dict(modes=["flight"], optimize="fastest")),
+        "mixed, fastest": (pairs, dict(optimize="fastest")),
+        "mixed, cheapest": (pairs, dict(optimize="cheapest")),
+    }
+
+    print(f"{'scenario':<18} {'found':>6} {'transfers':>9} {'p50':>9} {'p99':>9} {'cut':>5}")
+    for name, (queries, params) in scenarios.items():
+        samples, found, transfers = [], 0, []
+        exhausted = planner.budget_exhausted
+        for origin, destination in queries:
+            start = time.perf_counter()
+            itineraries = planner.plan(origin, destination, k=args.k, **params)
+            samples.append((time.perf_counter() - start) * 1000)
+            found += bool(itineraries)
+            transfers.extend(it["transfers"] for it in itineraries)
+        samples.sort()
+        print(f"{name:<18} {found / len(queries):6.0%} {sum(transfers) / max(len(transfers), 1):9.2f} "
+              f"{samples[len(samples) // 2]:7.2f}ms {samples[int(len(samples) * 0.99)]:7.2f}ms "
+              f"{planner.budget_exhausted - exhausted:5d}")
+
+
+if __name__ == "__main__":
+    main()
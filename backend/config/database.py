@@ -1,24 +1,192 @@
 import os
-from sqlalchemy import create_engine
+import time
+from collections import deque
+from typing import Dict, Any
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./travel_app.db")
 
+# Connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+# SQLite pragmas
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+
+def to_async_url(url: str) -> str:
+    """Chuyển URL sync sang driver async tương ứng (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+class PoolWaitStats:
+    """Thời gian chờ lấy connection từ pool (ms), giữ N mẫu gần nhất"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples = deque(maxlen=max_samples)
+        self.checkouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, wait_ms: float):
+        self.samples.append(wait_ms)
+        self.checkouts += 1
+        self.total_ms += wait_ms
+        self.max_ms = max(self.max_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.samples)
+        return {
+            "checkouts": self.checkouts,
+            "wait_avg_ms": round(self.total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_p95_ms": round(recent[int(len(recent) * 0.95) - 1], 3) if recent else 0.0,
+            "wait_max_ms": round(self.max_ms, 3)
+        }
+
+class _TimedCheckoutMixin:
+    """Mỗi pool (sync/async engine) giữ thống kê chờ checkout riêng"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record((time.perf_counter() - start) * 1000)
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _is_sqlite_memory(url: str) -> bool:
+    if not url.startswith("sqlite"):
+        return False
+    path = url.split("://", 1)[-1]
+    return path in ("", "/") or ":memory:" in path or "mode=memory" in path
+
+def _engine_kwargs(url: str, pool_class) -> Dict[str, Any]:
+    if _is_sqlite_memory(url):
+        # In-memory SQLite dùng StaticPool/SingletonThreadPool mặc định
+        return {}
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+# Sync engine: chỉ dùng cho create_all lúc khởi động và các script
 if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **_engine_kwargs(DATABASE_URL, TimedQueuePool))
 else:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL, TimedQueuePool))
+
+# Async engine: dùng cho mọi route handler để không block event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, TimedAsyncAdaptedQueuePool))
+
+# WAL + busy_timeout: cho phép đọc đồng thời và tránh "database is locked" khi ghi song song
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: tránh lazy refresh (I/O ngầm) khi đọc attribute sau commit
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def ensure_indexes():
+    """create_all không thêm index mới vào bảng đã tồn tại, tạo bù các index còn thiếu
+    (bỏ qua index trên cột chưa có, ví dụ cột sinh chờ script migrate)"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in existing for column in index.columns):
+                index.create(bind=engine, checkfirst=True)
+
+def ensure_columns():
+    """create_all không thêm cột mới vào bảng đã tồn tại, ALTER TABLE bù các cột còn thiếu
+    (kèm server_default dạng hằng nếu có để row cũ nhận giá trị mặc định).
+    
+    Cột sinh (Computed) chỉ thêm tự động trên SQLite, nơi cột VIRTUAL không phải
+    ghi lại bảng; các dialect khác cần chạy script migrate tương ứng.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.computed is not None:
+                    if engine.dialect.name != "sqlite":
+                        print(f"⚠️ Generated column {table.name}.{column.name} missing, run the migration script")
+                        continue
+                    ddl += f" GENERATED ALWAYS AS ({column.computed.sqltext}) VIRTUAL"
+                elif column.server_default is not None and isinstance(column.server_default.arg, str):
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                print(f"🛠️ Added column {table.name}.{column.name}")
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+def _pool_snapshot(pool) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow
+        })
+    if isinstance(pool, _TimedCheckoutMixin):
+        stats.update(pool.wait_stats.snapshot())
+    return stats
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Trạng thái pool của async engine (route handler) và thời gian chờ checkout;
+    pool của sync engine (khởi động, script) nằm riêng trong "sync" """
+    return {**_pool_snapshot(async_engine.pool), "sync": _pool_snapshot(engine.pool)}
@@ -0,0 +1,74 @@
+import os
+from typing import Dict, Any, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def create_async_client(prefix: str, timeout: float = 30.0) -> httpx.AsyncClient:
+    """Tạo httpx.AsyncClient dùng chung với connection pool cấu hình qua env.
+
+    Các biến môi trường được đọc theo prefix, ví dụ với prefix "LANGFLOW":
+    LANGFLOW_MAX_CONNECTIONS, LANGFLOW_MAX_KEEPALIVE_CONNECTIONS,
+    LANGFLOW_KEEPALIVE_EXPIRY, LANGFLOW_HTTP2, LANGFLOW_TIMEOUT.
+    """
+    limits = httpx.Limits(
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", 30.0)),
+    )
+    timeout = float(os.getenv(f"{prefix}_TIMEOUT", timeout))
+
+    http2 = _env_bool(f"{prefix}_HTTP2", False)
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print(f"⚠️ {prefix}_HTTP2 is enabled but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_pool_stats(client: Optional[httpx.AsyncClient]) -> Dict[str, Any]:
+    """Thống kê connection pool của client (để sizing pool)"""
+    if client is None:
+        return {"initialized": False}
+
+    stats: Dict[str, Any] = {"initialized": True, "closed": client.is_closed}
+
+    # httpcore không có public API cho pool, đọc defensively
+    pool = getattr(client._transport, "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if pool is None or connections is None:
+        return stats
+
+    idle = sum(1 for conn in connections if conn.is_idle())
+    http2_connections = sum(
+        1 for conn in connections if getattr(conn, "_connection", None) is not None
+        and type(conn._connection).__name__.endswith("HTTP2Connection")
+    )
+    max_connections = getattr(pool, "_max_connections", None)
+    requests = getattr(pool, "_requests", [])
+    queued = sum(1 for request in requests if getattr(request, "is_queued", lambda: False)())
+
+    stats.update({
+        "max_connections": max_connections,
+        "max_keepalive_connections": getattr(pool, "_max_keepalive_connections", None),
+        "keepalive_expiry": getattr(pool, "_keepalive_expiry", None),
+        "http2_enabled": getattr(pool, "_http2", False),
+        "connections": len(connections),
+        "active_connections": len(connections) - idle,
+        "idle_connections": idle,
+        "http2_connections": http2_connections,
+        "in_flight_requests": len(requests) - queued,
+        "queued_requests": queued,
+        "utilization": round((len(connections) - idle) / max_connections, 3) if max_connections else None,
+    })
+    return stats
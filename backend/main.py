@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
@@ -8,15 +8,36 @@ import asyncio
 from dotenv import load_dotenv
 import asyncio
 
+from sqlalchemy import update
+
 from routes import auth, chatbot, weather, booking, admin, search
-from config.database import engine, Base
+from config.database import engine, async_engine, Base, ensure_columns, ensure_indexes, get_pool_stats as get_db_pool_stats
+from models.models import ChatSession
 from config.redis_client import redis_client
 from services.flow_id_broadcast_service import flow_id_broadcast_service
+from services.langflow_service import langflow_service
+from services.flow_warmup_service import flow_warmup_service
+from services.chat_persistence_service import chat_message_writer
+from services.weather_cache_service import weather_cache_service
+from services.weather_service import weather_service
+from services.search_cache_service import search_cache_service
+from services.idempotency_service import idempotency_service
+from services.stats_service import stats_service
+from services.event_hub import event_hub
+from services.hotel_inventory import hotel_inventory, DEFAULT_INVENTORY_PATH
+from services.route_planner import route_planner, DEFAULT_TIMETABLE_PATH
+from auth.auth import password_executor
 
 load_dotenv()
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+ensure_columns()
+ensure_indexes()
+
+# Session cũ chưa có updated_at (trước khi có server_default)
+with engine.begin() as conn:
+    conn.execute(update(ChatSession).where(ChatSession.updated_at.is_(None)).values(updated_at=ChatSession.created_at))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,17 +48,65 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"❌ Redis connection failed: {e}")
     
-    # Start Flow ID monitoring
+    # Shared HTTP connection pool to Langflow
+    await langflow_service.startup()
+    print("✅ Langflow HTTP client pool initialized")
+    await weather_service.startup()
+    
+    # Write-behind persistence of chat messages
+    await chat_message_writer.start()
+    
+    # Local hotel inventory index
+    inventory_path = os.getenv("HOTEL_INVENTORY_PATH") or DEFAULT_INVENTORY_PATH
+    if os.path.exists(inventory_path):
+        try:
+            await hotel_inventory.load_file_async(inventory_path)
+        except Exception as e:
+            print(f"❌ Hotel inventory load failed: {e}")
+    
+    # Train/flight timetable graph for multi-leg itineraries
+    timetable_path = os.getenv("TIMETABLE_PATH") or DEFAULT_TIMETABLE_PATH
+    if os.path.exists(timetable_path):
+        try:
+            await route_planner.load_file_async(timetable_path)
+        except Exception as e:
+            print(f"❌ Timetable load failed: {e}")
+    
+    # Periodic purge of expired weather cache rows
+    weather_purge_task = asyncio.create_task(weather_cache_service.run_purge_loop())
+    search_refresh_task = asyncio.create_task(search_cache_service.run_refresh_loop())
+    idempotency_purge_task = asyncio.create_task(idempotency_service.run_purge_loop())
+    stats_reconcile_task = asyncio.create_task(stats_service.run_reconcile_loop())
+    event_heartbeat_task = asyncio.create_task(event_hub.run_heartbeat_loop())
+    
+    # Flow ID sync across workers (Redis pub/sub, file watch fallback)
     try:
-        asyncio.create_task(flow_id_broadcast_service.start_monitoring())
+        await flow_id_broadcast_service.start_monitoring()
         print("✅ Flow ID monitoring started")
     except Exception as e:
         print(f"⚠️ Flow ID monitoring failed to start: {e}")
     
+    # Synthetic runs so the first real chat doesn't pay Langflow's cold start
+    flow_warmup_service.start()
+    keep_warm_task = asyncio.create_task(flow_warmup_service.run_keep_warm_loop())
+    
     yield
     
     # Shutdown
     flow_id_broadcast_service.stop_monitoring()
+    flow_warmup_service.stop()
+    keep_warm_task.cancel()
+    weather_purge_task.cancel()
+    search_refresh_task.cancel()
+    idempotency_purge_task.cancel()
+    stats_reconcile_task.cancel()
+    event_heartbeat_task.cancel()
+    event_hub.close_all()
+    await langflow_service.shutdown()
+    await weather_service.shutdown()
+    await chat_message_writer.stop()
+    await async_engine.dispose()
+    password_executor.shutdown(wait=False)
     await redis_client.close()
 
 app = FastAPI(
@@ -54,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],
 )
 
 # Security
@@ -77,17 +147,27 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
+async def health_check(response: Response):
     try:
         await redis_client.ping()
         redis_status = "healthy"
     except:
         redis_status = "unhealthy"
     
+    # Chưa ready trong lúc warm-up flow lúc khởi động (healthcheck của Docker chờ tới khi xong)
+    ready = flow_warmup_service.ready
+    if not ready:
+        response.status_code = 503
+    
     return {
-        "status": "healthy",
+        "status": "healthy" if ready else "warming_up",
+        "ready": ready,
         "redis": redis_status,
-        "langflow_host": os.getenv("LANGFLOW_HOST")
+        "langflow_host": os.getenv("LANGFLOW_HOST"),
+        "langflow_pool": langflow_service.get_pool_stats(),
+        "database_pool": get_db_pool_stats(),
+        "chat_writer": chat_message_writer.get_stats(),
+        "flow_warmup": flow_warmup_service.get_stats()
     }
 
 if __name__ == "__main__":
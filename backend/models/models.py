@@ -1,7 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey, Index, UniqueConstraint, JSON, Computed
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from config.database import Base
+from config.database import Base, engine
+
+def booking_data_field(key: str) -> Computed:
+    """Cột sinh từ một khóa trong booking_data: VIRTUAL trên SQLite (ALTER TABLE
+    thêm được), STORED trên PostgreSQL (chỉ hỗ trợ loại này)"""
+    if engine.dialect.name == "postgresql":
+        return Computed(f"booking_data ->> '{key}'", persisted=True)
+    return Computed(f"json_extract(booking_data, '$.{key}')", persisted=False)
 
 class User(Base):
     __tablename__ = "users"
@@ -28,11 +36,16 @@ class ChatSession(Base):
     session_id = Column(String, unique=True, index=True)
     title = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # server_default để keyset pagination theo updated_at không gặp NULL
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session")
+    
+    __table_args__ = (
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at", "id"),
+    )
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -46,6 +59,10 @@ class ChatMessage(Base):
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+    )
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -56,12 +73,57 @@ class Booking(Base):
     booking_reference = Column(String, unique=True)
     status = Column(String, default="pending")  # pending, confirmed, cancelled
     total_amount = Column(Float)
-    booking_data = Column(Text)  # JSON string of booking details
+    # JSONB trên PostgreSQL, JSON (lưu dạng text, truy vấn bằng json_extract) trên SQLite
+    booking_data = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"))
+    # Các trường hay lọc, sinh từ booking_data và có index
+    provider = Column(String, booking_data_field("provider"))
+    travel_date = Column(String, booking_data_field("travel_date"))
+    destination = Column(String, booking_data_field("destination"))
+    # Optimistic locking: mọi chuyển trạng thái là compare-and-set trên version
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="bookings")
+    
+    __table_args__ = (
+        Index("ix_bookings_user_created", "user_id", "created_at", "id"),
+        Index("ix_bookings_provider", "provider"),
+        Index("ix_bookings_travel_date", "travel_date"),
+        Index("ix_bookings_destination", "destination"),
+    )
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer)  # NULL khi request đầu tiên còn đang xử lý
+    response_body = Column(Text)  # JSON string
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    metric = Column(String, nullable=False)  # users, bookings_daily, chat_sessions_hourly, ...
+    bucket = Column(String, nullable=False)  # "total", YYYY-MM-DD hoặc YYYY-MM-DDTHH (UTC)
+    dimension = Column(String, nullable=False, default="", server_default="")  # vd. booking_type
+    count = Column(Integer, nullable=False, default=0, server_default="0")
+    amount = Column(Float, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("metric", "bucket", "dimension", name="uq_stat_counters_metric_bucket_dimension"),
+    )
 
 class WeatherCache(Base):
     __tablename__ = "weather_cache"
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr
+import json
+from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
 
@@ -77,6 +78,21 @@ class WeatherResponse(BaseModel):
     current: dict
     forecast: List[dict]
 
+class WeatherBatchRequest(BaseModel):
+    locations: List[str]
+    days: Optional[int] = 5
+    stream: bool = False  # True: trả về NDJSON, mỗi dòng một địa điểm khi có kết quả
+
+class WeatherBatchItem(BaseModel):
+    location: str
+    status: str  # "ok" | "error"
+    cached: bool = False
+    data: Optional[WeatherResponse] = None
+    error: Optional[str] = None
+
+class WeatherBatchResponse(BaseModel):
+    results: List[WeatherBatchItem]
+
 # Booking schemas
 class BookingBase(BaseModel):
     booking_type: str
@@ -92,8 +108,15 @@ class BookingResponse(BaseModel):
     total_amount: float
     booking_type: str
     booking_data: dict
+    version: int
     created_at: datetime
     
+    @field_validator("booking_data", mode="before")
+    @classmethod
+    def parse_booking_data(cls, value):
+        # Row ghi trước khi cột booking_data chuyển sang JSON có thể còn là chuỗi
+        return json.loads(value) if isinstance(value, str) else value
+    
     class Config:
         from_attributes = True
 
@@ -109,6 +132,11 @@ class FlightSearchRequest(BaseModel):
 class FlightBookingRequest(BaseModel):
     flight_id: str
     passenger_details: List[dict]
+    # Lấy từ offer/tìm kiếm đã chọn; lưu vào booking_data để lọc theo cột sinh
+    provider: Optional[str] = None
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    departure_date: Optional[str] = None
 
 # Hotel booking
 class HotelSearchRequest(BaseModel):
@@ -117,11 +145,21 @@ class HotelSearchRequest(BaseModel):
     check_out: str
     guests: int = 1
     rooms: int = 1
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    amenities: List[str] = []  # Khách sạn phải có đủ các tiện nghi này
+    sort_by: str = "price_asc"  # price_asc, price_desc, rating_desc
+    limit: int = 20
 
 class HotelBookingRequest(BaseModel):
     hotel_id: str
     room_type: str
     guest_details: dict
+    provider: Optional[str] = None
+    location: Optional[str] = None
+    check_in: Optional[str] = None
+    check_out: Optional[str] = None
 
 # Train booking
 class TrainSearchRequest(BaseModel):
@@ -133,6 +171,22 @@ class TrainSearchRequest(BaseModel):
 class TrainBookingRequest(BaseModel):
     train_id: str
     passenger_details: List[dict]
+    provider: Optional[str] = None
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    departure_date: Optional[str] = None
+
+# Multi-leg itineraries (train + flight)
+class RouteSearchRequest(BaseModel):
+    origin: str
+    destination: str
+    departure_date: str
+    earliest_departure: str = "00:00"
+    latest_departure: str = "23:59"
+    modes: List[str] = ["train", "flight"]
+    optimize: str = "fastest"  # fastest, cheapest
+    k: int = 3
+    max_transfers: Optional[int] = None
 
 # Search schemas
 class SearchRequest(BaseModel):
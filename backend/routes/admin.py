@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from pydantic import BaseModel
+import asyncio
+import os
 
 from config.database import get_db
-from models.models import User, Booking, ChatSession
+from models.models import User
 from models.schemas import User as UserSchema, BookingResponse
-from auth.auth import get_admin_user
+from auth.auth import get_admin_user, user_cache
 from services.langflow_service import langflow_service
 from services.flow_id_broadcast_service import flow_id_broadcast_service
+from services.response_cache_service import response_cache_service
+from services.weather_cache_service import weather_cache_service
+from services.search_cache_service import search_cache_service
+from services.hotel_inventory import hotel_inventory
+from services.route_planner import route_planner
+from services.idempotency_service import idempotency_service
+from services.booking_state_service import booking_state_service
+from services.booking_query_service import booking_query_service
+from services.stats_service import stats_service
+from services.event_hub import event_hub
+from services.flow_warmup_service import flow_warmup_service
 
 router = APIRouter()
 
@@ -24,20 +38,20 @@ async def get_all_users(
     skip: int = 0,
     limit: int = 100,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all users (admin only)"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    result = await db.execute(select(User).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get("/users/{user_id}", response_model=UserSchema)
 async def get_user(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get specific user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -46,15 +60,17 @@ async def get_user(
 async def toggle_user_active(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Toggle user active status (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = not user.is_active
-    db.commit()
+    await stats_service.record_user_active_changed(db, user.is_active)
+    await db.commit()
+    user_cache.invalidate(user.username)
     
     return {"message": f"User {'activated' if user.is_active else 'deactivated'} successfully"}
 
@@ -62,15 +78,16 @@ async def toggle_user_active(
 async def make_user_admin(
     user_id: int,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Make user admin (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_admin = True
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(user.username)
     
     return {"message": "User promoted to admin successfully"}
 
@@ -79,30 +96,133 @@ async def get_all_bookings(
     skip: int = 0,
     limit: int = 100,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all bookings (admin only)"""
-    bookings = db.query(Booking).offset(skip).limit(limit).all()
-    return bookings
+    content = await booking_query_service.list_json(db, offset=skip, limit=limit)
+    return Response(content=content, media_type="application/json")
 
 @router.get("/stats")
 async def get_stats(
+    days: int = 30,
+    hours: int = 48,
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get system statistics (admin only)"""
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    total_bookings = db.query(Booking).count()
-    total_chat_sessions = db.query(ChatSession).count()
-    
+    """Get system totals plus bookings/revenue per day and chat sessions per hour (admin only)"""
+    if not 1 <= days <= stats_service.max_series_days:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {stats_service.max_series_days}")
+    if not 1 <= hours <= stats_service.max_series_days * 24:
+        raise HTTPException(status_code=400, detail=f"hours must be between 1 and {stats_service.max_series_days * 24}")
+    return await stats_service.snapshot(db, days=days, hours=hours)
+
+@router.post("/stats/reconcile")
+async def reconcile_stats(
+    full: bool = False,
+    admin_user: User = Depends(get_admin_user),
+):
+    """Recompute stats counters from source tables (admin only)"""
+    drift = await stats_service.reconcile(None if full else stats_service.reconcile_window_days)
+    return {"message": "Stats counters reconciled", "drift": drift, **stats_service.get_stats()}
+
+@router.get("/response-cache/stats")
+async def get_response_cache_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get Langflow response cache hit/miss statistics (admin only)"""
+    return await response_cache_service.get_stats()
+
+@router.delete("/response-cache")
+async def clear_response_cache(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Clear all cached Langflow responses (admin only)"""
+    deleted = await response_cache_service.invalidate()
+    return {"message": "Response cache cleared", "deleted": deleted}
+
+@router.get("/weather-cache/stats")
+async def get_weather_cache_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get weather cache tier hit statistics (admin only)"""
+    return weather_cache_service.get_stats()
+
+@router.get("/search-cache/stats")
+async def get_search_cache_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get booking search cache statistics (admin only)"""
+    return search_cache_service.get_stats()
+
+@router.get("/hotel-inventory/stats")
+async def get_hotel_inventory_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get local hotel inventory index statistics (admin only)"""
+    return hotel_inventory.get_stats()
+
+@router.get("/booking-pipeline/stats")
+async def get_booking_pipeline_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get idempotency key and booking status transition statistics (admin only)"""
     return {
-        "total_users": total_users,
-        "active_users": active_users,
-        "total_bookings": total_bookings,
-        "total_chat_sessions": total_chat_sessions
+        "idempotency": idempotency_service.get_stats(),
+        "transitions": booking_state_service.get_stats()
     }
 
+@router.get("/route-planner/stats")
+async def get_route_planner_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get train/flight timetable graph statistics (admin only)"""
+    return route_planner.get_stats()
+
+@router.get("/langflow/stats")
+async def get_langflow_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get Langflow connection pool and request coalescing statistics (admin only)"""
+    return {
+        "pool": langflow_service.get_pool_stats(),
+        "coalescing": langflow_service.coalescer.get_stats(),
+        "latency": langflow_service.get_latency_stats()
+    }
+
+@router.get("/flow-warmup/stats")
+async def get_flow_warmup_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get flow warm-up / keep-warm status and cold vs warm latency (admin only)"""
+    return flow_warmup_service.get_stats()
+
+@router.post("/flow-warmup")
+async def trigger_flow_warmup(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Warm up the current flow in the background, e.g. after editing it in Langflow (admin only)"""
+    flow_warmup_service.schedule("admin")
+    return flow_warmup_service.get_stats()
+
+@router.get("/flow-id/stats")
+async def get_flow_id_sync_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get Flow ID pub/sub propagation statistics for this worker (admin only)"""
+    return flow_id_broadcast_service.get_stats()
+
+@router.get("/event-hub/stats")
+async def get_event_hub_stats(
+    admin_user: User = Depends(get_admin_user),
+):
+    """Get server-push connection and eviction statistics for this worker (admin only)"""
+    return event_hub.get_stats()
+
+def _write_flow_id_file(path: str, flow_id: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(flow_id)
+
 @router.post("/update-flow-id")
 async def update_flow_id(
     request: FlowIdUpdateRequest,
@@ -110,23 +230,24 @@ async def update_flow_id(
 ):
     """Update Flow ID in the system"""
     try:
-        # Update the langflow service with new Flow ID
-        langflow_service._cached_flow_id = request.flow_id
+        # Update the langflow service with new Flow ID (also drops cached responses)
+        await langflow_service.set_flow_id(request.flow_id)
         
-        # Save to persistent file if possible
+        # Save to persistent file if possible (fallback source when Redis is down)
         try:
-            import os
-            os.makedirs("/app/data", exist_ok=True)
-            with open("/app/data/flow_id.txt", 'w') as f:
-                f.write(request.flow_id)
+            await asyncio.to_thread(_write_flow_id_file, flow_id_broadcast_service.flow_id_file, request.flow_id)
         except Exception as e:
             print(f"⚠️ Could not save Flow ID to persistent file: {e}")
         
+        # Other workers/replicas swap their Flow ID via Redis pub/sub
+        propagation = await flow_id_broadcast_service.publish(request.flow_id, request.source)
+        
         return {
             "status": "success",
             "message": f"Flow ID updated to {request.flow_id}",
             "flow_id": request.flow_id,
-            "source": request.source
+            "source": request.source,
+            "propagation": propagation
         }
     except Exception as e:
         raise HTTPException(
@@ -142,12 +263,13 @@ async def broadcast_flow_id(
     """Broadcast Flow ID change to all connected clients"""
     try:
         # Use the broadcast service to notify all connected clients
-        await flow_id_broadcast_service.broadcast_flow_id_change(request.flow_id)
+        propagation = await flow_id_broadcast_service.broadcast_flow_id_change(request.flow_id)
         
         return {
             "status": "success",
-            "message": f"Flow ID broadcasted to all clients",
-            "flow_id": request.flow_id
+            "message": "Flow ID broadcasted to all clients",
+            "flow_id": request.flow_id,
+            "propagation": propagation
         }
     except Exception as e:
         raise HTTPException(
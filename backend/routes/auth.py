@@ -1,22 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from config.database import get_db
 from models.models import User
 from models.schemas import UserCreate, LoginRequest, Token, User as UserSchema
-from auth.auth import authenticate_user, create_access_token, get_password_hash, get_current_active_user
+from auth.auth import authenticate_user, create_access_token, get_password_hash_async, get_current_active_user
+from services.stats_service import stats_service
 
 router = APIRouter()
 security = HTTPBearer()
 
 @router.post("/register", response_model=UserSchema)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
-    db_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.email == user.email) | (User.username == user.username)
-    ).first()
+    ))
+    db_user = result.scalars().first()
     
     if db_user:
         raise HTTPException(
@@ -25,7 +28,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -34,14 +37,16 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    await stats_service.record_user(db, active=db_user.is_active)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-async def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, login_data.username, login_data.password)
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Callable, Awaitable, Dict, Any
 import uuid
-import json
-from datetime import datetime
+from datetime import datetime, date
 
 from config.database import get_db
 from models.models import User, Booking
@@ -10,151 +14,203 @@ from models.schemas import (
     FlightSearchRequest, FlightBookingRequest,
     HotelSearchRequest, HotelBookingRequest,
     TrainSearchRequest, TrainBookingRequest,
-    BookingResponse
+    RouteSearchRequest, BookingResponse
 )
 from auth.auth import get_current_active_user
 from services.booking_service import booking_service
+from services.booking_state_service import booking_state_service
+from services.booking_query_service import booking_query_service
+from services.stats_service import stats_service
+from services.idempotency_service import idempotency_service
+from services.hotel_inventory import SORT_OPTIONS as HOTEL_SORT_OPTIONS
+from services.route_planner import route_planner, OPTIMIZE_OPTIONS, MODES as ROUTE_MODES
 
 router = APIRouter()
 
+# Field của request booking -> key trong booking_data mà các cột sinh
+# provider/travel_date/destination của Booking đọc ra
+BOOKING_DATA_FIELDS = {
+    "flight": {"provider": "provider", "travel_date": "departure_date", "destination": "destination"},
+    "train": {"provider": "provider", "travel_date": "departure_date", "destination": "destination"},
+    "hotel": {"provider": "provider", "travel_date": "check_in", "destination": "location"}
+}
+
+def _booking_details(booking_type: str, request: BaseModel) -> Dict[str, Any]:
+    details = {key: getattr(request, field, None) for key, field in BOOKING_DATA_FIELDS[booking_type].items()}
+    return {key: value for key, value in details.items() if value is not None}
+
+async def _create_booking(
+    booking_type: str,
+    book: Callable[[BaseModel], Awaitable[Dict[str, Any]]],
+    request: BaseModel,
+    current_user: User,
+    db: AsyncSession,
+    idempotency_key: Optional[str]
+):
+    """Đặt chỗ qua provider rồi lưu Booking.
+    
+    Có Idempotency-Key: request lặp lại (cùng key, cùng body) nhận lại response
+    đã lưu với header Idempotent-Replayed, không tạo booking mới.
+    """
+    request_hash = None
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= idempotency_service.max_key_length:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{idempotency_service.max_key_length} characters")
+        request_hash = idempotency_service.fingerprint(f"{booking_type}:book", request.model_dump())
+        claim = await idempotency_service.begin(db, current_user.id, idempotency_key, request_hash)
+        if claim["status"] == "replay":
+            return JSONResponse(content=claim["body"], status_code=claim["status_code"],
+                                headers={"Idempotent-Replayed": "true"})
+        if claim["status"] == "in_progress":
+            raise HTTPException(status_code=409, detail=claim["error"])
+        if claim["status"] == "mismatch":
+            raise HTTPException(status_code=422, detail=claim["error"])
+    
+    try:
+        booking_result = await book(request)
+        if "error" in booking_result:
+            raise HTTPException(status_code=400, detail=booking_result["error"])
+        
+        # Save booking to database; giá trị provider trả về được ưu tiên hơn request
+        booking = Booking(
+            user_id=current_user.id,
+            booking_type=booking_type,
+            booking_reference=str(uuid.uuid4()),
+            status="pending",
+            total_amount=booking_result.get("total_amount", 0),
+            booking_data={**_booking_details(booking_type, request), **booking_result}
+        )
+        db.add(booking)
+        await db.flush()
+        await db.refresh(booking)
+        await stats_service.record_booking(db, booking_type, booking.total_amount)
+        body = jsonable_encoder(BookingResponse.model_validate(booking))
+        if idempotency_key is not None:
+            # Booking và response được lưu trong cùng transaction
+            await idempotency_service.complete(db, current_user.id, idempotency_key, status.HTTP_200_OK, body)
+        await db.commit()
+    except BaseException:
+        # Kể cả khi request bị hủy giữa chừng: nhả key để client retry được
+        if idempotency_key is not None:
+            await idempotency_service.release(db, current_user.id, idempotency_key)
+        raise
+    
+    if idempotency_key is not None:
+        await idempotency_service.remember(current_user.id, idempotency_key, request_hash, status.HTTP_200_OK, body)
+    return body
+
+def _cached_search_result(result: dict, response: Response) -> dict:
+    """X-Cache: HIT | MISS | STALE | BYPASS; Age: tuổi của kết quả (giây) khi lấy từ cache"""
+    response.headers["X-Cache"] = result["cache"]
+    if result["cache"] in ("HIT", "STALE"):
+        response.headers["Age"] = str(result["age"])
+    return result["data"]
+
 # Flight booking endpoints
 @router.post("/flights/search")
 async def search_flights(
     request: FlightSearchRequest,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Search for flights"""
-    results = await booking_service.search_flights(request)
-    return results
+    result = await booking_service.search("flights", request)
+    return _cached_search_result(result, response)
 
 @router.post("/flights/book", response_model=BookingResponse)
 async def book_flight(
     request: FlightBookingRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Book a flight"""
-    booking_result = await booking_service.book_flight(request)
-    
-    if "error" in booking_result:
-        raise HTTPException(status_code=400, detail=booking_result["error"])
-    
-    # Save booking to database
-    booking = Booking(
-        user_id=current_user.id,
-        booking_type="flight",
-        booking_reference=str(uuid.uuid4()),
-        status="pending",
-        total_amount=booking_result.get("total_amount", 0),
-        booking_data=json.dumps(booking_result)
-    )
-    
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
-    
-    return booking
+    return await _create_booking("flight", booking_service.book_flight, request, current_user, db, idempotency_key)
 
 # Hotel booking endpoints
 @router.post("/hotels/search")
 async def search_hotels(
     request: HotelSearchRequest,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Search for hotels"""
-    results = await booking_service.search_hotels(request)
-    return results
+    if request.sort_by not in HOTEL_SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(HOTEL_SORT_OPTIONS)}")
+    if not 1 <= request.limit <= booking_service.max_results:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {booking_service.max_results}")
+    try:
+        if date.fromisoformat(request.check_out) <= date.fromisoformat(request.check_in):
+            raise HTTPException(status_code=400, detail="check_out must be after check_in")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="check_in and check_out must be YYYY-MM-DD dates")
+    
+    result = await booking_service.search("hotels", request)
+    return _cached_search_result(result, response)
 
 @router.post("/hotels/book", response_model=BookingResponse)
 async def book_hotel(
     request: HotelBookingRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Book a hotel"""
-    booking_result = await booking_service.book_hotel(request)
-    
-    if "error" in booking_result:
-        raise HTTPException(status_code=400, detail=booking_result["error"])
-    
-    # Save booking to database
-    booking = Booking(
-        user_id=current_user.id,
-        booking_type="hotel",
-        booking_reference=str(uuid.uuid4()),
-        status="pending",
-        total_amount=booking_result.get("total_amount", 0),
-        booking_data=json.dumps(booking_result)
-    )
-    
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
-    
-    return booking
+    return await _create_booking("hotel", booking_service.book_hotel, request, current_user, db, idempotency_key)
 
 # Train booking endpoints
 @router.post("/trains/search")
 async def search_trains(
     request: TrainSearchRequest,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Search for trains"""
-    results = await booking_service.search_trains(request)
-    return results
+    result = await booking_service.search("trains", request)
+    return _cached_search_result(result, response)
 
 @router.post("/trains/book", response_model=BookingResponse)
 async def book_train(
     request: TrainBookingRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Book a train"""
-    booking_result = await booking_service.book_train(request)
-    
-    if "error" in booking_result:
-        raise HTTPException(status_code=400, detail=booking_result["error"])
-    
-    # Save booking to database
-    booking = Booking(
-        user_id=current_user.id,
-        booking_type="train",
-        booking_reference=str(uuid.uuid4()),
-        status="pending",
-        total_amount=booking_result.get("total_amount", 0),
-        booking_data=json.dumps(booking_result)
-    )
-    
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
-    
-    return booking
+    return await _create_booking("train", booking_service.book_train, request, current_user, db, idempotency_key)
 
 # General booking endpoints
 @router.get("/my-bookings", response_model=list[BookingResponse])
 async def get_my_bookings(
+    provider: Optional[str] = None,
+    destination: Optional[str] = None,
+    travel_date_from: Optional[str] = None,
+    travel_date_to: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get user's bookings"""
-    bookings = db.query(Booking).filter(
-        Booking.user_id == current_user.id
-    ).order_by(Booking.created_at.desc()).all()
-    
-    return bookings
+    """Get user's bookings, optionally filtered by provider, destination or travel date range"""
+    content = await booking_query_service.list_json(db, user_id=current_user.id, filters={
+        "provider": provider,
+        "destination": destination,
+        "travel_date_from": travel_date_from,
+        "travel_date_to": travel_date_to
+    })
+    # JSON đã dựng sẵn, khớp BookingResponse: bỏ qua validate/serialize lại từng row
+    return Response(content=content, media_type="application/json")
 
 @router.get("/bookings/{booking_id}", response_model=BookingResponse)
 async def get_booking(
     booking_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get specific booking"""
-    booking = db.query(Booking).filter(
+    result = await db.execute(select(Booking).where(
         Booking.id == booking_id,
         Booking.user_id == current_user.id
-    ).first()
+    ))
+    booking = result.scalars().first()
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -165,21 +221,63 @@ async def get_booking(
 async def cancel_booking(
     booking_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(None, alias="If-Match")
 ):
-    """Cancel a booking"""
-    booking = db.query(Booking).filter(
-        Booking.id == booking_id,
-        Booking.user_id == current_user.id
-    ).first()
-    
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+    """Cancel a booking (If-Match: version the client last saw, optional)"""
+    expected_version = None
+    if if_match is not None:
+        try:
+            expected_version = int(if_match.strip().strip('"'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="If-Match must be a booking version")
     
-    if booking.status == "cancelled":
-        raise HTTPException(status_code=400, detail="Booking already cancelled")
+    result = await booking_state_service.transition(db, booking_id, current_user.id, "cancelled", expected_version)
+    if "error" in result:
+        if result["reason"] == "not_found":
+            raise HTTPException(status_code=404, detail=result["error"])
+        if result["reason"] == "version_conflict":
+            raise HTTPException(status_code=412 if expected_version is not None else 409, detail=result["error"])
+        raise HTTPException(status_code=400, detail=result["error"])
     
-    booking.status = "cancelled"
-    db.commit()
+    return {
+        "message": "Booking cancelled successfully",
+        "status": result["booking"].status,
+        "version": result["booking"].version
+    }
+
+# Multi-leg itinerary search
+@router.post("/routes/search")
+async def search_routes(
+    request: RouteSearchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Search k fastest or cheapest train/flight itineraries, including connections"""
+    if not route_planner.is_loaded:
+        raise HTTPException(status_code=503, detail="Timetable not loaded")
+    if request.optimize not in OPTIMIZE_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"optimize must be one of {', '.join(OPTIMIZE_OPTIONS)}")
+    if not request.modes or not set(request.modes) <= set(ROUTE_MODES):
+        raise HTTPException(status_code=400, detail=f"modes must be a subset of {', '.join(ROUTE_MODES)}")
+    if not 1 <= request.k <= route_planner.max_k:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {route_planner.max_k}")
+    try:
+        travel_date = date.fromisoformat(request.departure_date)
+        datetime.strptime(request.earliest_departure, "%H:%M")
+        datetime.strptime(request.latest_departure, "%H:%M")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="departure_date must be YYYY-MM-DD and departure times HH:MM")
     
-    return {"message": "Booking cancelled successfully"}
\ No newline at end of file
+    itineraries = await route_planner.plan_async(
+        request.origin, request.destination,
+        earliest_departure=request.earliest_departure,
+        latest_departure=request.latest_departure,
+        modes=request.modes,
+        optimize=request.optimize,
+        k=request.k,
+        max_transfers=request.max_transfers
+    )
+    return {
+        "itineraries": [route_planner.describe(itinerary, travel_date) for itinerary in itineraries],
+        "optimize": request.optimize
+    }
@@ -1,5 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete, tuple_
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import json
 import uuid
 
 from config.database import get_db
@@ -7,120 +11,197 @@ from models.models import User, ChatSession, ChatMessage
 from models.schemas import ChatMessage as ChatMessageSchema, ChatResponse, ChatSessionCreate, ChatSessionResponse
 from auth.auth import get_current_active_user
 from services.langflow_service import langflow_service
+from services.chat_persistence_service import chat_message_writer
+from services.stats_service import stats_service
+from services.event_hub import event_hub, format_sse
 
 router = APIRouter()
 
-@router.post("/send", response_model=ChatResponse)
-async def send_message(
-    message: ChatMessageSchema,
-    session_id: str = None,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    # Get or create session
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # Tắt buffering của nginx để token tới client ngay
+}
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format một Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _get_user_session(db: AsyncSession, current_user: User, session_id: str):
+    result = await db.execute(select(ChatSession).where(
+        ChatSession.session_id == session_id,
+        ChatSession.user_id == current_user.id
+    ))
+    return result.scalars().first()
+
+async def _get_or_create_session(db: AsyncSession, current_user: User, session_id: str, message: str) -> ChatSession:
     if session_id:
-        session = db.query(ChatSession).filter(
-            ChatSession.session_id == session_id,
-            ChatSession.user_id == current_user.id
-        ).first()
+        session = await _get_user_session(db, current_user, session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
-    else:
-        # Create new session
-        session = ChatSession(
-            user_id=current_user.id,
-            session_id=str(uuid.uuid4()),
-            title=message.message[:50] + "..." if len(message.message) > 50 else message.message
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
-      # Prepare user context
-    user_context = {
+        return session
+    
+    # Create new session
+    session = ChatSession(
+        user_id=current_user.id,
+        session_id=str(uuid.uuid4()),
+        title=message[:50] + "..." if len(message) > 50 else message
+    )
+    db.add(session)
+    await stats_service.record_chat_session(db)
+    # PK được gán khi flush, không cần refresh thêm một round trip
+    await db.commit()
+    return session
+
+def _build_user_context(current_user: User) -> dict:
+    return {
         'userId': current_user.id,
         'email': current_user.email,
         'username': current_user.username,
         'fullName': current_user.full_name,
         'isAuthenticated': True
     }
+
+@router.post("/send", response_model=ChatResponse)
+async def send_message(
+    message: ChatMessageSchema,
+    session_id: str = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Get or create session
+    session = await _get_or_create_session(db, current_user, session_id, message.message)
+    
+    # Prepare user context
+    user_context = _build_user_context(current_user)
     
     # Send message to Langflow with user context
     response = await langflow_service.send_message(message.message, session.session_id, user_context)
     
-    # Save message and response to database
-    chat_message = ChatMessage(
-        session_id=session.id,
-        message=message.message,
-        response=response["response"],
-        is_user=True
-    )
-    db.add(chat_message)
-    
-    # Save bot response
-    bot_message = ChatMessage(
-        session_id=session.id,
-        message=response["response"],
-        is_user=False
-    )
-    db.add(bot_message)
-    
-    db.commit()
+    # Save message and response to database (write-behind, không chờ commit)
+    await chat_message_writer.enqueue_exchange(session.id, message.message, response["response"])
     
     return ChatResponse(
         response=response["response"],
         session_id=session.session_id
     )
 
+@router.post("/send/stream")
+async def send_message_stream(
+    message: ChatMessageSchema,
+    session_id: str = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming version of /send: relays Langflow tokens as Server-Sent Events
+    and persists the assembled answer once the stream ends
+    """
+    session = await _get_or_create_session(db, current_user, session_id, message.message)
+    session_pk = session.id
+    public_session_id = session.session_id
+    user_context = _build_user_context(current_user)
+    
+    async def event_stream():
+        yield _sse_event("session", {"session_id": public_session_id})
+        
+        chunks = []
+        try:
+            async for chunk in langflow_service.stream_message(message.message, public_session_id, user_context):
+                chunks.append(chunk)
+                yield _sse_event("token", {"chunk": chunk})
+        except Exception as e:
+            print(f"❌ Chat stream error: {e}")
+            yield _sse_event("error", {"message": "Xin lỗi, tôi đang gặp vấn đề kỹ thuật. Vui lòng thử lại sau!"})
+        
+        response_text = "".join(chunks)
+        if response_text:
+            await chat_message_writer.enqueue_exchange(session_pk, message.message, response_text)
+        
+        yield _sse_event("done", {"response": response_text, "session_id": public_session_id})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+DEFAULT_PAGE_SIZE = 100
+
+def _page_limit(limit: Optional[int], cursor: Optional[int]) -> Optional[int]:
+    """None = không phân trang (không có limit lẫn cursor), cursor không kèm limit dùng trang mặc định"""
+    if limit is None and cursor is not None:
+        return DEFAULT_PAGE_SIZE
+    return limit
+
 @router.get("/sessions", response_model=list[ChatSessionResponse])
 async def get_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Số phần tử mỗi trang; không truyền limit/cursor thì trả về toàn bộ"),
+    cursor: Optional[int] = Query(None, description="ID của session cuối cùng ở trang trước (X-Next-Cursor)"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    sessions = db.query(ChatSession).filter(
-        ChatSession.user_id == current_user.id
-    ).order_by(ChatSession.updated_at.desc()).all()
+    """Sessions mới cập nhật nhất trước, phân trang keyset theo (updated_at, id)
+    khi có limit hoặc cursor (client cũ không truyền gì vẫn nhận toàn bộ danh sách)"""
+    query = select(ChatSession).where(ChatSession.user_id == current_user.id)
+    if cursor is not None:
+        # So sánh với giá trị trong DB (subquery) thay vì bind datetime từ client
+        anchor = select(ChatSession.updated_at).where(ChatSession.id == cursor).scalar_subquery()
+        query = query.where(tuple_(ChatSession.updated_at, ChatSession.id) < tuple_(anchor, cursor))
+    query = query.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+    limit = _page_limit(limit, cursor)
+    if limit is not None:
+        query = query.limit(limit)
     
+    sessions = (await db.execute(query)).scalars().all()
+    if limit is not None and len(sessions) == limit:
+        response.headers["X-Next-Cursor"] = str(sessions[-1].id)
     return sessions
 
 @router.get("/sessions/{session_id}/messages")
 async def get_session_messages(
     session_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Số phần tử mỗi trang; không truyền limit/cursor thì trả về toàn bộ"),
+    cursor: Optional[int] = Query(None, description="ID của tin nhắn cuối cùng ở trang trước (X-Next-Cursor)"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    session = db.query(ChatSession).filter(
-        ChatSession.session_id == session_id,
-        ChatSession.user_id == current_user.id
-    ).first()
+    """Tin nhắn theo thứ tự thời gian, phân trang keyset theo (created_at, id)
+    khi có limit hoặc cursor (client cũ không truyền gì vẫn nhận toàn bộ lịch sử)"""
+    session = await _get_user_session(db, current_user, session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session.id
-    ).order_by(ChatMessage.created_at.asc()).all()
+    query = select(ChatMessage).where(ChatMessage.session_id == session.id)
+    if cursor is not None:
+        anchor = select(ChatMessage.created_at).where(ChatMessage.id == cursor).scalar_subquery()
+        query = query.where(tuple_(ChatMessage.created_at, ChatMessage.id) > tuple_(anchor, cursor))
+    query = query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+    limit = _page_limit(limit, cursor)
+    if limit is not None:
+        query = query.limit(limit)
     
+    messages = (await db.execute(query)).scalars().all()
+    if limit is not None and len(messages) == limit:
+        response.headers["X-Next-Cursor"] = str(messages[-1].id)
     return messages
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    session = db.query(ChatSession).filter(
-        ChatSession.session_id == session_id,
-        ChatSession.user_id == current_user.id
-    ).first()
+    session = await _get_user_session(db, current_user, session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Delete all messages first
-    db.query(ChatMessage).filter(ChatMessage.session_id == session.id).delete()
+    await db.execute(delete(ChatMessage).where(ChatMessage.session_id == session.id))
     # Delete session
-    db.delete(session)
-    db.commit()
+    created_at = session.created_at
+    await db.delete(session)
+    await stats_service.record_chat_session_deleted(db, created_at)
+    await db.commit()
     
     return {"message": "Session deleted successfully"}
 
@@ -135,6 +216,23 @@ async def get_flow_id():
         print(f"❌ Error getting flow ID: {e}")
         return {"flow_id": None, "status": "error", "message": str(e)}
 
+@router.get("/flow-id/events")
+async def flow_id_events():
+    """Server-Sent Events: Flow ID hiện tại, rồi một sự kiện `flow_id` mỗi khi đổi flow - Public endpoint"""
+    subscriber = event_hub.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many event stream connections", headers={"Retry-After": "5"})
+    try:
+        flow_id = await langflow_service.get_flow_id()
+    except Exception as e:
+        print(f"❌ Error getting flow ID: {e}")
+        flow_id = None
+    return StreamingResponse(
+        event_hub.stream(subscriber, snapshot=format_sse("flow_id", {"flow_id": flow_id})),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.get("/health")
 async def check_langflow_health():
     """Kiểm tra trạng thái Langflow - Public endpoint"""
@@ -148,31 +246,33 @@ async def check_langflow_health():
 async def chat_message(
     message: ChatMessageSchema,
     session_id: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Public endpoint for ChatWidget to send messages
     Accepts user context from frontend if user is authenticated
     """
     try:
-        # Generate session ID if not provided
-        if not session_id:
-            session_id = str(uuid.uuid4())
-          # Extract user context from request
+        # Lượt chat không kèm session_id không có lịch sử hội thoại nên có thể dùng cache
+        use_cache = not session_id
+        
+        # Extract user context from request
         user_context = None
         if hasattr(message, 'user_context') and message.user_context:
             user_context = message.user_context
         
         # Send message to Langflow with user context
+        # Không có session_id: send_message tạo session mới (sau khi gộp các lượt giống hệt nhau)
         response = await langflow_service.send_message(
             message.message, 
-            session_id, 
-            user_context
+            session_id or None, 
+            user_context,
+            use_cache=use_cache
         )
         
         return ChatResponse(
             response=response.get("response", "Xin lỗi, tôi không thể trả lời câu hỏi này."),
-            session_id=session_id
+            session_id=session_id or response.get("session_id") or str(uuid.uuid4())
         )
         
     except Exception as e:
@@ -180,4 +280,35 @@ async def chat_message(
         return ChatResponse(
             response="Xin lỗi, tôi đang gặp vấn đề kỹ thuật. Vui lòng thử lại sau!",
             session_id=session_id or str(uuid.uuid4())
-        )
\ No newline at end of file
+        )
+
+@router.post("/chat/stream")
+async def chat_message_stream(
+    message: ChatMessageSchema,
+    session_id: str = None
+):
+    """
+    Public streaming endpoint for ChatWidget.
+    Sends `session`, then `token` events as Langflow generates them, then `done`
+    with the full response (or `error`).
+    """
+    use_cache = not session_id
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    user_context = message.user_context if message.user_context else None
+    
+    async def event_stream():
+        yield _sse_event("session", {"session_id": session_id})
+        
+        chunks = []
+        try:
+            async for chunk in langflow_service.stream_message(message.message, session_id, user_context, use_cache=use_cache):
+                chunks.append(chunk)
+                yield _sse_event("token", {"chunk": chunk})
+        except Exception as e:
+            print(f"❌ Chat stream error: {e}")
+            yield _sse_event("error", {"message": "Xin lỗi, tôi đang gặp vấn đề kỹ thuật. Vui lòng thử lại sau!"})
+        
+        yield _sse_event("done", {"response": "".join(chunks), "session_id": session_id})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
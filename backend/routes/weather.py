@@ -1,8 +1,10 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config.database import get_db
-from models.schemas import WeatherRequest, WeatherResponse
+from models.schemas import WeatherRequest, WeatherResponse, WeatherBatchRequest, WeatherBatchResponse
 from services.weather_service import weather_service
 from auth.auth import get_current_active_user
 from models.models import User
@@ -13,11 +15,10 @@ router = APIRouter()
 async def get_current_weather(
     request: WeatherRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current weather for a location"""
-    current_data = await weather_service.get_current_weather(request.location)
-    forecast_data = await weather_service.get_weather_forecast(request.location, request.days)
+    current_data, forecast_data = await weather_service.get_current_with_forecast(request.location, request.days)
     
     if "error" in current_data:
         raise HTTPException(status_code=400, detail=current_data["error"])
@@ -25,6 +26,37 @@ async def get_current_weather(
     result = weather_service.format_weather_response(current_data, forecast_data)
     return result
 
+@router.post("/batch", response_model=WeatherBatchResponse)
+async def get_weather_batch(
+    request: WeatherBatchRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get current weather and forecast for several locations at once.
+    
+    With stream=true the response is NDJSON, one line per location as soon as it is ready.
+    """
+    locations = weather_service.dedupe_locations(request.locations)
+    if not locations:
+        raise HTTPException(status_code=400, detail="At least one location is required")
+    if len(locations) > weather_service.batch_max_locations:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many locations (max {weather_service.batch_max_locations})"
+        )
+    
+    if request.stream:
+        async def ndjson_stream():
+            async for item in weather_service.iter_batch(locations, request.days):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(
+            ndjson_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    return {"results": await weather_service.get_batch(locations, request.days)}
+
 @router.get("/forecast/{location}")
 async def get_weather_forecast(
     location: str,
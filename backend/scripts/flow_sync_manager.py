@@ -2,62 +2,39 @@
 """
 Flow ID Auto-Sync Manager - Automatically sync Flow ID across all services
 """
-import requests
+import asyncio
 import os
 import time
 import json
-import subprocess
 import sys
 
-LANGFLOW_HOST = os.getenv("LANGFLOW_HOST", "http://langflow:8080")
-BACKEND_HOST = os.getenv("BACKEND_HOST", "http://travel_backend:8000")
+import httpx
+
+from sync_engine import (
+    LANGFLOW_HOST, BACKEND_HOST, REQUEST_TIMEOUT,
+    SyncEngine, log, wait_for_healthy, fetch_flows, pick_flow_id
+)
+
 FLOW_ID_FILE = "/app/data/flow_id.txt"
 SYNC_STATUS_FILE = "/app/data/sync_status.json"
 
-def log(message, level="INFO"):
-    """Enhanced logging"""
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    prefix = {
-        "INFO": "ℹ️",
-        "SUCCESS": "✅",
-        "WARNING": "⚠️",
-        "ERROR": "❌",
-        "SYNC": "🔄"
-    }.get(level, "📝")
-    
-    print(f"[{timestamp}] {prefix} {message}")
-
 def ensure_data_dir():
     """Ensure data directory exists"""
     os.makedirs("/app/data", exist_ok=True)
 
-def get_current_flow_id():
+async def get_current_flow_id(client, stored_flow_id):
     """Get current Flow ID - Priority: 1) From uploader persistent file, 2) From Langflow API"""
     try:
         # Priority 1: Get from uploader's persistent file
-        stored_flow_id = get_stored_flow_id()
         if stored_flow_id:
             log(f"Using stored Flow ID from uploader: {stored_flow_id}", "SUCCESS")
             return stored_flow_id
         
         log("No stored Flow ID found, querying Langflow API...")
         
-        # Priority 2: Get from Langflow API
-        response = requests.get(f"{LANGFLOW_HOST}/api/v1/flows/", timeout=10)
-        response.raise_for_status()
-        flows = response.json()
-        
-        # Look for Travel Chatbot flow first
-        for flow in flows:
-            if flow.get('name') == 'Travel Chatbot':
-                flow_id = flow['id']
-                log(f"Found Travel Chatbot flow in Langflow: {flow_id}", "SUCCESS")
-                return flow_id
-        
-        # If no Travel Chatbot flow, use first available
-        if flows and len(flows) > 0:
-            flow_id = flows[0]['id']
-            log(f"Using first available flow: {flow_id} (Name: {flows[0].get('name', 'Unknown')})", "WARNING")
+        # Priority 2: Get from Langflow API (Travel Chatbot, else first available)
+        flow_id = pick_flow_id(await fetch_flows(client))
+        if flow_id:
             return flow_id
             
         raise Exception("No flows found in Langflow")
@@ -136,12 +113,12 @@ def update_frontend_file(flow_id):
         log(f"Failed to save frontend sync data: {e}", "ERROR")
         return False
 
-def notify_backend_of_change(flow_id):
+async def notify_backend_of_change(client, flow_id):
     """Notify backend service of Flow ID change"""
     try:
         # Try to notify backend through internal API
         payload = {"flow_id": flow_id, "source": "uploader"}
-        response = requests.post(
+        response = await client.post(
             f"{BACKEND_HOST}/api/internal/flow-id-update",
             json=payload,
             timeout=5
@@ -158,7 +135,7 @@ def notify_backend_of_change(flow_id):
         log(f"Failed to notify backend: {e}", "WARNING")
         return False
 
-def create_sync_status(flow_id, success_count, total_tasks):
+def create_sync_status(flow_id, success_count, total_tasks, timings=None):
     """Create sync status file"""
     try:
         ensure_data_dir()
@@ -169,7 +146,8 @@ def create_sync_status(flow_id, success_count, total_tasks):
             "sync_success": success_count == total_tasks,
             "tasks_completed": success_count,
             "total_tasks": total_tasks,
-            "last_sync": time.strftime("%Y-%m-%d %H:%M:%S")
+            "last_sync": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "timings_ms": timings or {}
         }
         
         with open(SYNC_STATUS_FILE, 'w') as f:
@@ -180,89 +158,72 @@ def create_sync_status(flow_id, success_count, total_tasks):
     except Exception as e:
         log(f"Failed to create sync status: {e}", "ERROR")
 
-def perform_full_sync():
+async def perform_full_sync(client, engine):
     """Perform full Flow ID synchronization"""
     log("Starting Flow ID Auto-Sync...", "SYNC")
     
-    # Get current Flow ID from Langflow
-    current_flow_id = get_current_flow_id()
+    # Get current Flow ID (stored file first, then Langflow)
+    async with engine.stage("Resolve Flow ID"):
+        stored_flow_id = await asyncio.to_thread(get_stored_flow_id)
+        current_flow_id = await get_current_flow_id(client, stored_flow_id)
     if not current_flow_id:
         log("Cannot proceed without Flow ID from Langflow", "ERROR")
         return False
     
     # Check if Flow ID changed
-    stored_flow_id = get_stored_flow_id()
     if stored_flow_id == current_flow_id:
         log(f"Flow ID unchanged: {current_flow_id}", "INFO")
     else:
         log(f"Flow ID changed: {stored_flow_id} -> {current_flow_id}", "SYNC")
-      # Perform sync tasks
-    tasks = [
-        ("Save persistent Flow ID", lambda: save_flow_id(current_flow_id)),
-        ("Save backend sync data", lambda: update_backend_env(current_flow_id)),
-        ("Save frontend sync data", lambda: update_frontend_file(current_flow_id)),
-        ("Notify backend service", lambda: notify_backend_of_change(current_flow_id))
-    ]
-    
-    success_count = 0
     
-    for task_name, task_func in tasks:
-        log(f"Executing: {task_name}", "SYNC")
-        try:
-            if task_func():
-                success_count += 1
-            else:
-                log(f"Task failed: {task_name}", "WARNING")
-        except Exception as e:
-            log(f"Task error: {task_name} - {e}", "ERROR")
+    # Các task ghi file/notify không phụ thuộc nhau: chạy song song
+    results = await engine.run_parallel("Sync tasks", {
+        "Save persistent Flow ID": lambda: asyncio.to_thread(save_flow_id, current_flow_id),
+        "Save backend sync data": lambda: asyncio.to_thread(update_backend_env, current_flow_id),
+        "Save frontend sync data": lambda: asyncio.to_thread(update_frontend_file, current_flow_id),
+        "Notify backend service": lambda: notify_backend_of_change(client, current_flow_id)
+    })
+    success_count = sum(results.values())
     
     # Create sync status
-    create_sync_status(current_flow_id, success_count, len(tasks))
+    await asyncio.to_thread(create_sync_status, current_flow_id, success_count, len(results), engine.breakdown())
     
     # Summary
     log("=" * 50, "INFO")
-    if success_count == len(tasks):
+    if success_count == len(results):
         log("Flow ID Auto-Sync completed successfully!", "SUCCESS")
     else:
-        log(f"Flow ID Auto-Sync completed with {len(tasks) - success_count} warnings", "WARNING")
+        log(f"Flow ID Auto-Sync completed with {len(results) - success_count} warnings", "WARNING")
     
     log(f"Current Flow ID: {current_flow_id}", "INFO")
-    log(f"Tasks completed: {success_count}/{len(tasks)}", "INFO")
+    log(f"Tasks completed: {success_count}/{len(results)}", "INFO")
     log("=" * 50, "INFO")
     
-    return success_count == len(tasks)
+    return success_count == len(results)
 
-def main():
-    """Main execution"""
-    try:
-        # Wait for Langflow to be ready
+async def run():
+    engine = SyncEngine("Flow ID Auto-Sync")
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        # Wait for Langflow to be ready (backoff + jitter, không sleep cố định)
         log("Waiting for Langflow to be ready...")
-        max_retries = 60
-        for i in range(max_retries):
-            try:
-                response = requests.get(f"{LANGFLOW_HOST}/api/v1/health", timeout=5)
-                if response.status_code == 200:
-                    log("Langflow is ready!", "SUCCESS")
-                    break
-            except:
-                pass
-            
-            if i % 10 == 0:
-                log(f"Waiting for Langflow... ({i}/{max_retries}s)")
-            time.sleep(1)
-        else:
+        async with engine.stage("Wait for Langflow"):
+            ready = await wait_for_healthy(client, "Langflow", f"{LANGFLOW_HOST}/api/v1/health")
+        if not ready:
             raise Exception("Langflow not ready within timeout")
         
         # Perform sync
-        success = perform_full_sync()
+        success = await perform_full_sync(client, engine)
+    engine.report()
+    return success
+
+def main():
+    """Main execution"""
+    try:
+        success = asyncio.run(run())
         
         if not success:
             log("Some sync tasks failed, but continuing...", "WARNING")
         
-        # Keep container running briefly for debugging
-        log("Sync completed. Container will exit in 5 seconds...")
-        time.sleep(5)
-        
     except Exception as e:
         log(f"Fatal error: {e}", "ERROR")
         sys.exit(1)
@@ -3,6 +3,7 @@
 Flow Manager for LangFlow - Đảm bảo flow ID persistent khi restart container
 """
 import requests
+import hashlib
 import os
 import time
 import json
@@ -10,7 +11,9 @@ import json
 LANGFLOW_HOST = os.getenv("LANGFLOW_HOST", "http://langflow:8080")
 FLOW_FILE_PATH = "/app/TravelMate.json"
 FLOW_ID_FILE = "/app/data/flow_id.txt"
+FLOW_HASH_FILE = "/app/data/flow_hash.json"
 FLOW_NAME = "Travel Chatbot"
+REQUEST_TIMEOUT = 60  # giây, cho upload/cập nhật flow
 
 def ensure_data_dir():
     """Đảm bảo thư mục data tồn tại"""
@@ -54,39 +57,83 @@ def save_flow_id(flow_id):
     except Exception as e:
         print(f"⚠️ Lỗi lưu flow ID: {e}")
 
-def check_flow_exists(flow_id):
-    """Kiểm tra flow có tồn tại trong LangFlow không"""
+def compute_flow_hash():
+    """SHA-256 nội dung file flow (đọc theo chunk)"""
+    digest = hashlib.sha256()
+    with open(FLOW_FILE_PATH, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_stored_flow_hash():
+    """Hash của file flow ở lần upload/cập nhật gần nhất: {"flow_id", "sha256", "synced_at"}"""
     try:
-        url = f"{LANGFLOW_HOST}/api/v1/flows/{flow_id}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            flow_data = response.json()
-            print(f"✅ Flow {flow_id} tồn tại: {flow_data.get('name', 'Unknown')}")
-            return True
-        else:
-            print(f"❌ Flow {flow_id} không tồn tại (HTTP {response.status_code})")
-            return False
+        if os.path.exists(FLOW_HASH_FILE):
+            with open(FLOW_HASH_FILE, 'r') as f:
+                return json.load(f)
     except Exception as e:
-        print(f"⚠️ Lỗi kiểm tra flow: {e}")
-        return False
+        print(f"⚠️ Lỗi đọc flow hash: {e}")
+    return {}
+
+def save_flow_hash(flow_id, flow_hash):
+    """Lưu hash cạnh flow_id.txt để lần khởi động sau bỏ qua upload nếu file không đổi"""
+    try:
+        ensure_data_dir()
+        with open(FLOW_HASH_FILE, 'w') as f:
+            json.dump({
+                "flow_id": flow_id,
+                "sha256": flow_hash,
+                "synced_at": time.strftime("%Y-%m-%d %H:%M:%S")
+            }, f, indent=2)
+        print(f"💾 Đã lưu flow hash: {flow_hash[:12]}…")
+    except Exception as e:
+        print(f"⚠️ Lỗi lưu flow hash: {e}")
 
-def get_existing_flows():
-    """Lấy danh sách flows hiện có"""
+def get_flow_headers():
+    """Lấy danh sách flows chỉ gồm header (id, name, ...), không tải graph data"""
     try:
         url = f"{LANGFLOW_HOST}/api/v1/flows/"
-        response = requests.get(url)
-        if response.status_code == 200:
-            flows = response.json()
-            print(f"📋 Tìm thấy {len(flows)} flows trong LangFlow")
-            for flow in flows:
-                if flow.get('name') == FLOW_NAME:
-                    print(f"🎯 Tìm thấy flow '{FLOW_NAME}' với ID: {flow['id']}")
-                    return flow['id']
-        return None
+        response = requests.get(url, params={"header_flows": "true", "get_all": "true"}, timeout=30)
+        response.raise_for_status()
+        flows = response.json()
+        print(f"📋 Tìm thấy {len(flows)} flows trong LangFlow")
+        return {flow['id']: flow.get('name') for flow in flows}
     except Exception as e:
         print(f"⚠️ Lỗi lấy danh sách flows: {e}")
         return None
 
+def check_flow_exists(flow_id, headers):
+    """Kiểm tra flow có tồn tại trong LangFlow không"""
+    if flow_id in headers:
+        print(f"✅ Flow {flow_id} tồn tại: {headers[flow_id] or 'Unknown'}")
+        return True
+    print(f"❌ Flow {flow_id} không tồn tại")
+    return False
+
+def get_existing_flows(headers):
+    """Tìm flow theo tên trong danh sách header"""
+    for flow_id, name in headers.items():
+        if name == FLOW_NAME:
+            print(f"🎯 Tìm thấy flow '{FLOW_NAME}' với ID: {flow_id}")
+            return flow_id
+    return None
+
+def update_flow(flow_id):
+    """Cập nhật graph của flow hiện có từ file (giữ nguyên flow ID)"""
+    try:
+        print(f"📝 File flow đã thay đổi, cập nhật flow {flow_id}...")
+        with open(FLOW_FILE_PATH, 'r', encoding='utf-8') as f:
+            flow = json.load(f)
+        url = f"{LANGFLOW_HOST}/api/v1/flows/{flow_id}"
+        resp = requests.patch(url, json={"data": flow["data"], "description": flow.get("description")},
+                              timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        print(f"✅ Cập nhật flow thành công! Flow ID: {flow_id}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Lỗi cập nhật flow, sẽ upload flow mới: {e}")
+        return False
+
 def upload_new_flow():
     """Upload flow mới"""
     try:
@@ -94,7 +141,7 @@ def upload_new_flow():
         url = f"{LANGFLOW_HOST}/api/v1/flows/upload/"
         with open(FLOW_FILE_PATH, 'rb') as f:
             files = {'file': ('TravelMate.json', f, 'application/json')}
-            resp = requests.post(url, files=files)
+            resp = requests.post(url, files=files, timeout=REQUEST_TIMEOUT)
             resp.raise_for_status()
             flows = resp.json()
             if flows and len(flows) > 0 and 'id' in flows[0]:
@@ -108,22 +155,49 @@ def upload_new_flow():
         raise
 
 def get_or_create_flow():
-    """Lấy hoặc tạo flow"""
+    """Lấy hoặc tạo flow; trả về (flow_id, changed) với changed=False khi bỏ qua upload"""
+    flow_hash = compute_flow_hash()
+    stored_hash = get_stored_flow_hash()
+    headers = get_flow_headers()
+    
     # 1. Kiểm tra flow ID đã lưu
     stored_flow_id = get_stored_flow_id()
-    if stored_flow_id and check_flow_exists(stored_flow_id):
-        return stored_flow_id
+    if headers is None:
+        # Không lấy được danh sách: giữ flow đã lưu thay vì upload trùng
+        if stored_flow_id:
+            return stored_flow_id, False
+        headers = {}
+    
+    flow_id = stored_flow_id if stored_flow_id and check_flow_exists(stored_flow_id, headers) else None
     
     # 2. Tìm flow theo tên trong LangFlow
-    existing_flow_id = get_existing_flows()
-    if existing_flow_id:
-        save_flow_id(existing_flow_id)
-        return existing_flow_id
+    if not flow_id:
+        flow_id = get_existing_flows(headers)
+    
+    if flow_id:
+        # File không đổi kể từ lần sync trước: bỏ qua upload
+        if stored_hash.get("flow_id") == flow_id and stored_hash.get("sha256") == flow_hash:
+            print(f"⏭️ Flow không thay đổi (sha256 {flow_hash[:12]}…), bỏ qua upload")
+            if flow_id != stored_flow_id:
+                save_flow_id(flow_id)
+            return flow_id, False
+        # Chưa có hash (lần đầu chạy bản có hash): flow trong LangFlow có thể đã được
+        # sửa trên UI, chỉ ghi nhận hash hiện tại thay vì ghi đè bằng file
+        if not stored_hash:
+            print(f"📌 Chưa có flow hash, giữ nguyên flow {flow_id} và ghi nhận sha256 {flow_hash[:12]}…")
+            save_flow_id(flow_id)
+            save_flow_hash(flow_id, flow_hash)
+            return flow_id, False
+        if update_flow(flow_id):
+            save_flow_id(flow_id)
+            save_flow_hash(flow_id, flow_hash)
+            return flow_id, True
     
     # 3. Upload flow mới
     new_flow_id = upload_new_flow()
     save_flow_id(new_flow_id)
-    return new_flow_id
+    save_flow_hash(new_flow_id, flow_hash)
+    return new_flow_id, True
 
 def test_flow(flow_id):
     """Test flow hoạt động"""
@@ -158,10 +232,11 @@ def main():
         wait_for_langflow(LANGFLOW_HOST)
         
         # Lấy hoặc tạo flow
-        flow_id = get_or_create_flow()
+        flow_id, changed = get_or_create_flow()
         
-        # Test flow
-        test_flow(flow_id)
+        # Test flow (chỉ khi flow vừa được upload/cập nhật)
+        if changed:
+            test_flow(flow_id)
         
         print("=" * 50)
         print(f"✅ HOÀN THÀNH!")
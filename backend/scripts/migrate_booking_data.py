@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Booking Data Migration
+Chuyển bookings.booking_data từ JSON string (Text) sang cột JSON/JSONB và thêm
+các cột sinh có index (provider, travel_date, destination).
+
+- SQLite: chuẩn hóa từng batch row tại chỗ (JSON hợp lệ, không mã hóa hai lần),
+  rồi thêm cột sinh VIRTUAL + index.
+- PostgreSQL: ghi từng batch sang cột JSONB tạm, đổi tên trong một transaction
+  có khóa bảng (xử lý bù các row mới ghi trong lúc chạy), rồi thêm cột sinh
+  STORED + index. Chạy trước khi deploy code mới.
+
+Row không parse được được giữ lại dưới dạng {"raw": "<chuỗi gốc>"}.
+
+Chạy từ thư mục backend:
+    python scripts/migrate_booking_data.py --batch-size 1000 [--dry-run]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text  # noqa: E402
+
+from config.database import engine, Base, ensure_columns, ensure_indexes  # noqa: E402
+from models.models import Booking  # noqa: E402
+
+TEMP_COLUMN = "booking_data_jsonb"
+
+
+def log(message):
+    """Simple logging"""
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] {message}")
+
+
+def normalize(raw):
+    """Trả về (chuỗi JSON chuẩn hóa hoặc None, có hợp lệ hay không)"""
+    if raw is None:
+        return None, True
+    if not isinstance(raw, str):
+        # Đã là JSON native (driver trả về dict/list)
+        return json.dumps(raw, ensure_ascii=False), True
+    try:
+        value = json.loads(raw)
+        if isinstance(value, str):
+            # Bị json.dumps hai lần
+            value = json.loads(value)
+    except ValueError:
+        return json.dumps({"raw": raw}, ensure_ascii=False), False
+    return json.dumps(value, ensure_ascii=False), True
+
+
+def convert_batches(conn_factory, source: str, target: str, batch_size: int, dry_run: bool, where: str = "") -> dict:
+    """Duyệt bảng theo keyset (id) từng batch, ghi giá trị chuẩn hóa vào cột target"""
+    counts = {"rows": 0, "rewritten": 0, "invalid": 0}
+    cast = "CAST(:data AS JSONB)" if engine.dialect.name == "postgresql" else ":data"
+    last_id = 0
+    while True:
+        with conn_factory() as conn:
+            rows = conn.execute(text(
+                f"SELECT id, {source} FROM bookings WHERE id > :last_id {where} ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).all()
+            if not rows:
+                break
+            updates = []
+            for row_id, raw in rows:
+                data, valid = normalize(raw)
+                counts["invalid"] += not valid
+                if source != target or data != raw:
+                    updates.append({"id": row_id, "data": data})
+            if updates and not dry_run:
+                conn.execute(text(f"UPDATE bookings SET {target} = {cast} WHERE id = :id"), updates)
+            counts["rows"] += len(rows)
+            counts["rewritten"] += len(updates)
+            last_id = rows[-1][0]
+        log(f"  ... {counts['rows']} rows scanned, {counts['rewritten']} rewritten")
+    return counts
+
+
+def add_generated_columns(conn):
+    existing = {column["name"] for column in inspect(conn).get_columns("bookings")}
+    for column in Booking.__table__.columns:
+        if column.computed is None or column.name in existing:
+            continue
+        conn.execute(text(
+            f"ALTER TABLE bookings ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)} "
+            f"GENERATED ALWAYS AS ({column.computed.sqltext}) STORED"
+        ))
+        log(f"🛠️ Added generated column bookings.{column.name}")
+
+
+def migrate_postgresql(batch_size: int, dry_run: bool) -> dict:
+    columns = {column["name"]: column for column in inspect(engine).get_columns("bookings")}
+    if columns["booking_data"]["type"].__class__.__name__ in ("JSONB", "JSON"):
+        log("booking_data is already JSON, skipping conversion")
+        counts = {"rows": 0, "rewritten": 0, "invalid": 0}
+    else:
+        if not dry_run:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE bookings ADD COLUMN IF NOT EXISTS {TEMP_COLUMN} JSONB"))
+        counts = convert_batches(engine.begin, "booking_data", TEMP_COLUMN, batch_size, dry_run)
+        if dry_run:
+            return counts
+        with engine.begin() as conn:
+            # Row ghi trong lúc chạy các batch: xử lý bù khi đã khóa bảng
+            conn.execute(text("LOCK TABLE bookings IN ACCESS EXCLUSIVE MODE"))
+            late = convert_batches(lambda: nullcontext(conn), "booking_data", TEMP_COLUMN, batch_size, dry_run,
+                                   where=f"AND {TEMP_COLUMN} IS NULL AND booking_data IS NOT NULL")
+            counts = {key: counts[key] + late[key] for key in counts}
+            conn.execute(text("ALTER TABLE bookings DROP COLUMN booking_data"))
+            conn.execute(text(f"ALTER TABLE bookings RENAME COLUMN {TEMP_COLUMN} TO booking_data"))
+            log("🔁 Swapped booking_data to JSONB")
+    if not dry_run:
+        with engine.begin() as conn:
+            add_generated_columns(conn)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm số row cần ghi lại")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    log(f"🚚 Migrating bookings.booking_data on {engine.dialect.name} (batch size {args.batch_size})")
+    if engine.dialect.name == "postgresql":
+        counts = migrate_postgresql(args.batch_size, args.dry_run)
+    else:
+        counts = convert_batches(engine.begin, "booking_data", "booking_data", args.batch_size, args.dry_run)
+    if not args.dry_run:
+        ensure_columns()
+        ensure_indexes()
+    log(f"✅ {counts['rows']} rows scanned, {counts['rewritten']} rewritten, {counts['invalid']} invalid "
+        f"({time.perf_counter() - started:.1f}s){' [dry run]' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,21 @@
 """
 Post-Startup Flow ID Sync - Runs after all services are ready
 """
-import requests
+import asyncio
 import os
-import time
-import json
-import re
 
-LANGFLOW_HOST = os.getenv("LANGFLOW_HOST", "http://langflow:8080")
-BACKEND_HOST = os.getenv("BACKEND_HOST", "http://travel_backend:8000")
+import httpx
 
-def log(message, level="INFO"):
-    """Enhanced logging"""
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    prefix = {
-        "INFO": "ℹ️",
-        "SUCCESS": "✅",
-        "WARNING": "⚠️",
-        "ERROR": "❌",
-        "SYNC": "🔄"
-    }.get(level, "📝")
-    
-    print(f"[{timestamp}] {prefix} {message}")
+from sync_engine import (
+    LANGFLOW_HOST, BACKEND_HOST, REQUEST_TIMEOUT,
+    SyncEngine, log, wait_for_healthy, retry_until, fetch_flows, pick_flow_id
+)
+
+FLOW_ID_FILE = "/app/data/flow_id.txt"
+VERIFY_TIMEOUT = float(os.getenv("SYNC_VERIFY_TIMEOUT", 15))
 
-def wait_for_services():
-    """Wait for all services to be ready"""
+async def wait_for_services(client):
+    """Wait for all services to be ready (health check song song, backoff + jitter)"""
     services = [
         ("Langflow", f"{LANGFLOW_HOST}/api/v1/health"),
         ("Backend", f"{BACKEND_HOST}/health")
@@ -33,64 +24,32 @@ def wait_for_services():
     
     log("Waiting for all services to be ready...")
     
-    all_ready = False
-    max_attempts = 60
-    attempt = 0
-    
-    while not all_ready and attempt < max_attempts:
-        ready_count = 0
-        
-        for service_name, health_url in services:
-            try:
-                response = requests.get(health_url, timeout=5)
-                if response.status_code == 200:
-                    ready_count += 1
-                else:
-                    log(f"{service_name} not ready (HTTP {response.status_code})", "WARNING")
-            except Exception as e:
-                log(f"{service_name} not ready: {e}", "WARNING")
-        
-        if ready_count == len(services):
-            all_ready = True
-            log("All services are ready!", "SUCCESS")
-        else:
-            attempt += 1
-            log(f"Waiting for services... ({ready_count}/{len(services)} ready, attempt {attempt}/{max_attempts})")
-            time.sleep(2)
-    
-    if not all_ready:
+    ready = await asyncio.gather(*(wait_for_healthy(client, name, url) for name, url in services))
+    if not all(ready):
         raise Exception("Services did not become ready within timeout")
+    log("All services are ready!", "SUCCESS")
 
-def get_current_flow_id():
+def get_stored_flow_id():
+    """Flow ID persistent từ uploader"""
+    try:
+        with open(FLOW_ID_FILE, 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+async def get_current_flow_id(client):
     """Get current Flow ID from Langflow"""
     try:
         log("Getting current Flow ID from Langflow...")
         
-        response = requests.get(f"{LANGFLOW_HOST}/api/v1/flows/", timeout=10)
-        response.raise_for_status()
-        flows = response.json()
-        
-        # Look for Travel Chatbot flow first
-        for flow in flows:
-            if flow.get('name') == 'Travel Chatbot':
-                flow_id = flow['id']
-                log(f"Found Travel Chatbot flow: {flow_id}", "SUCCESS")
-                return flow_id
-        
-        # Check persistent file from uploader
-        try:
-            with open("/app/data/flow_id.txt", 'r') as f:
-                stored_flow_id = f.read().strip()
-                if stored_flow_id:
-                    log(f"Using stored Flow ID from uploader: {stored_flow_id}", "SUCCESS")
-                    return stored_flow_id
-        except:
-            pass
+        flows, stored_flow_id = await asyncio.gather(
+            fetch_flows(client),
+            asyncio.to_thread(get_stored_flow_id)
+        )
         
-        # Use first available flow as fallback
-        if flows and len(flows) > 0:
-            flow_id = flows[0]['id']
-            log(f"Using first available flow: {flow_id} (Name: {flows[0].get('name', 'Unknown')})", "WARNING")
+        # Travel Chatbot flow first, then the uploader's persistent file, then first available
+        flow_id = pick_flow_id(flows, fallback=stored_flow_id)
+        if flow_id:
             return flow_id
             
         raise Exception("No flows found")
@@ -99,16 +58,15 @@ def get_current_flow_id():
         log(f"Failed to get Flow ID: {e}", "ERROR")
         return None
 
-def update_backend_via_api(flow_id):
+async def update_backend_via_api(client, flow_id):
     """Update backend Flow ID via API call"""
     try:
         log("Notifying backend of Flow ID via API...")
         
         # Try to call backend's flow ID update endpoint
-        response = requests.post(
+        response = await client.post(
             f"{BACKEND_HOST}/api/admin/update-flow-id",
-            json={"flow_id": flow_id},
-            timeout=10
+            json={"flow_id": flow_id}
         )
         
         if response.status_code == 200:
@@ -122,15 +80,14 @@ def update_backend_via_api(flow_id):
         log(f"Failed to update backend via API: {e}", "WARNING")
         return False
 
-def notify_frontend_via_backend(flow_id):
+async def notify_frontend_via_backend(client, flow_id):
     """Notify frontend of Flow ID change via backend broadcast"""
     try:
         log("Broadcasting Flow ID change to frontend...")
         
-        response = requests.post(
+        response = await client.post(
             f"{BACKEND_HOST}/api/admin/broadcast-flow-id",
-            json={"flow_id": flow_id},
-            timeout=10
+            json={"flow_id": flow_id}
         )
         
         if response.status_code == 200:
@@ -144,55 +101,56 @@ def notify_frontend_via_backend(flow_id):
         log(f"Failed to notify frontend: {e}", "WARNING")
         return False
 
-def verify_sync(flow_id):
+async def verify_sync(client, flow_id):
     """Verify that the sync was successful"""
-    try:
-        log("Verifying Flow ID sync...")
-        
-        # Check backend API
-        response = requests.get(f"{BACKEND_HOST}/api/chatbot/flow-id", timeout=10)
-        if response.status_code == 200:
-            backend_data = response.json()
-            backend_flow_id = backend_data.get('flow_id')
-            
-            if backend_flow_id == flow_id:
-                log("✅ Backend verification successful", "SUCCESS")
-                return True
-            else:
-                log(f"⚠️ Backend has different Flow ID: {backend_flow_id} vs {flow_id}", "WARNING")
-                return False
-        else:
-            log(f"❌ Backend verification failed: HTTP {response.status_code}", "ERROR")
-            return False
-            
-    except Exception as e:
-        log(f"Verification failed: {e}", "ERROR")
-        return False
+    log("Verifying Flow ID sync...")
+    last_seen = {}
+    
+    async def backend_has_flow_id():
+        # Các worker nhận Flow ID qua pub/sub: thử lại với backoff thay vì kiểm tra một lần
+        response = await client.get(f"{BACKEND_HOST}/api/chatbot/flow-id")
+        last_seen["status"] = response.status_code
+        last_seen["flow_id"] = response.json().get('flow_id') if response.status_code == 200 else None
+        return last_seen["flow_id"] == flow_id
+    
+    if await retry_until(backend_has_flow_id, timeout=VERIFY_TIMEOUT):
+        log("✅ Backend verification successful", "SUCCESS")
+        return True
+    if last_seen.get("status") == 200:
+        log(f"⚠️ Backend has different Flow ID: {last_seen['flow_id']} vs {flow_id}", "WARNING")
+    else:
+        log(f"❌ Backend verification failed: {last_seen.get('status', 'no response')}", "ERROR")
+    return False
 
-def perform_post_startup_sync():
+async def perform_post_startup_sync(client, engine):
     """Perform post-startup Flow ID synchronization"""
     log("Starting Post-Startup Flow ID Sync...", "SYNC")
     
     try:
         # Wait for services
-        wait_for_services()
+        async with engine.stage("Wait for services"):
+            await wait_for_services(client)
         
         # Get current Flow ID
-        current_flow_id = get_current_flow_id()
+        async with engine.stage("Resolve Flow ID"):
+            current_flow_id = await get_current_flow_id(client)
         if not current_flow_id:
             log("Cannot proceed without Flow ID", "ERROR")
             return False
         
         log(f"Current Flow ID: {current_flow_id}")
         
-        # Update backend via API
-        backend_updated = update_backend_via_api(current_flow_id)
-        
-        # Notify frontend via backend broadcast
-        frontend_notified = notify_frontend_via_backend(current_flow_id)
+        # Update backend + broadcast to frontend độc lập nhau: chạy song song
+        results = await engine.run_parallel("Propagate Flow ID", {
+            "Update backend via API": lambda: update_backend_via_api(client, current_flow_id),
+            "Broadcast to frontend": lambda: notify_frontend_via_backend(client, current_flow_id)
+        })
+        backend_updated = results["Update backend via API"]
+        frontend_notified = results["Broadcast to frontend"]
         
         # Verify sync
-        sync_verified = verify_sync(current_flow_id)
+        async with engine.stage("Verify sync"):
+            sync_verified = await verify_sync(client, current_flow_id)
         
         # Summary
         log("=" * 50)
@@ -214,24 +172,24 @@ def perform_post_startup_sync():
     finally:
         log("=" * 50)
 
+async def run():
+    engine = SyncEngine("Post-Startup Flow ID Sync")
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        success = await perform_post_startup_sync(client, engine)
+    engine.report()
+    return success
+
 def main():
     """Main execution"""
     try:
-        # Add initial delay to ensure all services are fully started
-        log("Waiting 10 seconds for services to fully initialize...")
-        time.sleep(10)
-        
-        success = perform_post_startup_sync()
+        # Không còn sleep cố định: health check với backoff chờ đúng lúc service sẵn sàng
+        success = asyncio.run(run())
         
         if success:
             log("Post-startup sync completed successfully!", "SUCCESS")
         else:
             log("Post-startup sync completed with warnings", "WARNING")
         
-        # Keep container running for a bit for debugging
-        log("Sync completed. Container will exit in 5 seconds...")
-        time.sleep(5)
-        
     except Exception as e:
         log(f"Fatal error: {e}", "ERROR")
         exit(1)
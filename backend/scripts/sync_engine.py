@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Async Flow Sync Engine - Shared by flow_sync_manager.py and post_startup_sync.py
+
+- Chờ health check bằng exponential backoff + jitter thay vì sleep cố định
+- Chạy các task độc lập song song (asyncio.gather)
+- Ghi thời gian từng stage/task để in bảng breakdown cuối cùng
+"""
+import asyncio
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+LANGFLOW_HOST = os.getenv("LANGFLOW_HOST", "http://langflow:8080")
+BACKEND_HOST = os.getenv("BACKEND_HOST", "http://travel_backend:8000")
+HEALTH_TIMEOUT = float(os.getenv("SYNC_HEALTH_TIMEOUT", 120))
+BACKOFF_BASE = float(os.getenv("SYNC_BACKOFF_BASE", 0.25))
+BACKOFF_MAX = float(os.getenv("SYNC_BACKOFF_MAX", 5.0))
+REQUEST_TIMEOUT = float(os.getenv("SYNC_REQUEST_TIMEOUT", 10))
+
+def log(message, level="INFO"):
+    """Enhanced logging"""
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    prefix = {
+        "INFO": "ℹ️",
+        "SUCCESS": "✅",
+        "WARNING": "⚠️",
+        "ERROR": "❌",
+        "SYNC": "🔄",
+        "TIME": "⏱️"
+    }.get(level, "📝")
+
+    print(f"[{timestamp}] {prefix} {message}")
+
+def backoff_delays(base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX):
+    """Exponential backoff với full jitter: uniform(0, min(cap, base * 2^n))"""
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * (2 ** attempt)))
+        attempt += 1
+
+async def retry_until(check: Callable[[], Awaitable[bool]], timeout: float = HEALTH_TIMEOUT,
+                      base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> bool:
+    """Gọi check() tới khi trả True hoặc hết timeout (giây), chờ theo backoff giữa các lần"""
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays(base, cap):
+        try:
+            if await check():
+                return True
+        except Exception:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+
+async def wait_for_healthy(client: httpx.AsyncClient, name: str, url: str,
+                           timeout: float = HEALTH_TIMEOUT) -> bool:
+    """Chờ endpoint health trả 200"""
+    attempts = 0
+
+    async def check():
+        nonlocal attempts
+        attempts += 1
+        response = await client.get(url, timeout=5)
+        return response.status_code == 200
+
+    started = time.perf_counter()
+    ready = await retry_until(check, timeout)
+    elapsed = time.perf_counter() - started
+    if ready:
+        log(f"{name} is ready after {elapsed:.2f}s ({attempts} attempts)", "SUCCESS")
+    else:
+        log(f"{name} not ready within {timeout:.0f}s ({attempts} attempts)", "ERROR")
+    return ready
+
+class SyncEngine:
+    """Chạy pipeline sync theo stage; trong một stage các task độc lập chạy song song"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.timings: List[Tuple[str, float, Optional[bool]]] = []
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        """Đo thời gian một stage; task con chạy trong stage được liệt kê ngay dưới nó"""
+        index = len(self.timings)
+        self.timings.append((name, 0.0, None))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[index] = (name, time.perf_counter() - started, None)
+
+    async def _timed(self, name: str, task: Callable[[], Awaitable[bool]]) -> bool:
+        started = time.perf_counter()
+        try:
+            ok = bool(await task())
+            if not ok:
+                log(f"Task failed: {name}", "WARNING")
+        except Exception as e:
+            log(f"Task error: {name} - {e}", "ERROR")
+            ok = False
+        self.timings.append((f"  {name}", time.perf_counter() - started, ok))
+        return ok
+
+    async def run_parallel(self, stage_name: str, tasks: Dict[str, Callable[[], Awaitable[bool]]]) -> Dict[str, bool]:
+        """Chạy các task độc lập đồng thời; lỗi của một task không hủy các task khác"""
+        log(f"Executing {len(tasks)} tasks in parallel: {', '.join(tasks)}", "SYNC")
+        async with self.stage(stage_name):
+            results = await asyncio.gather(*(self._timed(name, task) for name, task in tasks.items()))
+        return dict(zip(tasks, results))
+
+    def breakdown(self) -> Dict[str, float]:
+        """Thời gian (ms) từng stage/task, dùng cho status file"""
+        return {name.strip(): round(seconds * 1000, 1) for name, seconds, _ in self.timings}
+
+    def report(self):
+        """In bảng thời gian từng stage"""
+        total = time.perf_counter() - self.started
+        log("=" * 50, "INFO")
+        log(f"{self.name} timing breakdown:", "TIME")
+        for name, seconds, ok in self.timings:
+            status = "" if ok is None else (" ✓" if ok else " ✗")
+            log(f"{name:<32} {seconds * 1000:>9.1f} ms{status}", "TIME")
+        log(f"{'Total':<32} {total * 1000:>9.1f} ms", "TIME")
+        log("=" * 50, "INFO")
+
+async def fetch_flows(client: httpx.AsyncClient) -> list:
+    """Danh sách flow trên Langflow"""
+    response = await client.get(f"{LANGFLOW_HOST}/api/v1/flows/", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def pick_flow_id(flows: list, fallback: Optional[str] = None) -> Optional[str]:
+    """Ưu tiên flow 'Travel Chatbot', rồi tới fallback, cuối cùng là flow đầu tiên"""
+    for flow in flows:
+        if flow.get('name') == 'Travel Chatbot':
+            log(f"Found Travel Chatbot flow in Langflow: {flow['id']}", "SUCCESS")
+            return flow['id']
+    if fallback:
+        log(f"Using stored Flow ID from uploader: {fallback}", "SUCCESS")
+        return fallback
+    if flows:
+        log(f"Using first available flow: {flows[0]['id']} (Name: {flows[0].get('name', 'Unknown')})", "WARNING")
+        return flows[0]['id']
+    return None
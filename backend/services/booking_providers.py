@@ -0,0 +1,128 @@
+import asyncio
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class BookingProvider(ABC):
+    """Plug-in cho một nhà cung cấp (hãng bay, aggregator, khách sạn, đường sắt...).
+
+    Provider khai báo các loại tìm kiếm hỗ trợ (flights, hotels, trains) và trả
+    về danh sách offer theo đúng format của BookingService. Ghi danh bằng
+    booking_service.register_provider(provider).
+    """
+
+    name: str = "provider"
+    kinds: Set[str] = set()
+
+    def supports(self, kind: str) -> bool:
+        return kind in self.kinds
+
+    @abstractmethod
+    async def search(self, kind: str, request) -> List[Dict[str, Any]]:
+        """Trả về danh sách offer; raise exception nếu provider lỗi"""
+
+
+class StandInProvider(BookingProvider):
+    """Provider giả lập chạy local với độ trễ cấu hình được (dùng khi chưa có API thật
+    và để benchmark fan-out offline).
+
+    offers: {kind: [offer template]}; các field origin/destination/location được
+    điền từ request. Độ trễ mỗi lần gọi = latency_ms + random(0, jitter_ms)
+    (mặc định 0, chỉ đặt trong benchmark/test), failure_rate là xác suất
+    provider raise lỗi.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        offers: Dict[str, List[Dict[str, Any]]],
+        latency_ms: Optional[float] = None,
+        jitter_ms: Optional[float] = None,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.name = name
+        self.offers = offers
+        self.kinds = set(offers)
+        self.latency_ms = float(os.getenv("BOOKING_STANDIN_LATENCY_MS", 0)) if latency_ms is None else latency_ms
+        self.jitter_ms = float(os.getenv("BOOKING_STANDIN_JITTER_MS", 0)) if jitter_ms is None else jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    async def search(self, kind: str, request) -> List[Dict[str, Any]]:
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+        if self._random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.name} unavailable")
+
+        fields = {
+            "origin": getattr(request, "origin", None),
+            "destination": getattr(request, "destination", None),
+            "location": getattr(request, "location", None),
+            "class": getattr(request, "class_type", None)
+        }
+        results = []
+        for template in self.offers.get(kind, []):
+            offer = dict(template)
+            for field, value in fields.items():
+                if field in offer and offer[field] is None:
+                    offer[field] = value
+            offer["provider"] = self.name
+            results.append(offer)
+        return results
+
+
+def _flight(id, airline, departure, arrival, price, duration):
+    return {"id": id, "airline": airline, "origin": None, "destination": None, "departure_time": departure,
+            "arrival_time": arrival, "price": price, "class": None, "duration": duration}
+
+
+def _hotel(id, name, rating, price, amenities, image):
+    return {"id": id, "name": name, "location": None, "rating": rating, "price_per_night": price,
+            "amenities": amenities, "image_url": image}
+
+
+def _train(id, departure, arrival, price, seat_class):
+    return {"id": id, "name": "Thống Nhất Express", "origin": None, "destination": None, "departure_time": departure,
+            "arrival_time": arrival, "price": price, "class": seat_class, "duration": "10h 30m"}
+
+
+def default_standin_providers() -> List[StandInProvider]:
+    """Bộ provider giả lập mặc định: hãng bay, một aggregator trùng offer với hãng,
+    hai kênh khách sạn và đường sắt"""
+    return [
+        StandInProvider("vietnam_airlines", {"flights": [
+            _flight("VN123", "Vietnam Airlines", "08:00", "10:30", 2500000, "2h 30m")
+        ]}),
+        StandInProvider("vietjet", {"flights": [
+            _flight("VJ456", "VietJet Air", "14:00", "16:45", 1800000, "2h 45m")
+        ]}),
+        StandInProvider("bamboo", {"flights": [
+            _flight("QH789", "Bamboo Airways", "18:15", "20:25", 2100000, "2h 10m")
+        ]}),
+        # Aggregator bán lại vé của các hãng với giá khác
+        StandInProvider("flight_aggregator", {"flights": [
+            _flight("VN123", "Vietnam Airlines", "08:00", "10:30", 2450000, "2h 30m"),
+            _flight("VJ456", "VietJet Air", "14:00", "16:45", 1850000, "2h 45m")
+        ]}),
+        StandInProvider("hotel_channel_a", {"hotels": [
+            _hotel("HOTEL001", "Grand Hotel Saigon", 4.5, 1200000, ["WiFi", "Pool", "Gym", "Restaurant"],
+                   "https://example.com/hotel1.jpg"),
+            _hotel("HOTEL002", "Riverside Resort", 4.2, 800000, ["WiFi", "Pool", "Spa"],
+                   "https://example.com/hotel2.jpg")
+        ]}),
+        StandInProvider("hotel_channel_b", {"hotels": [
+            _hotel("HOTEL002", "Riverside Resort", 4.2, 760000, ["WiFi", "Pool", "Spa"],
+                   "https://example.com/hotel2.jpg"),
+            _hotel("HOTEL003", "Old Quarter Boutique", 4.0, 650000, ["WiFi", "Breakfast"],
+                   "https://example.com/hotel3.jpg")
+        ]}),
+        StandInProvider("vietnam_railways", {"trains": [
+            _train("SE1", "19:30", "06:00+1", 850000, "Soft sleeper"),
+            _train("SE3", "22:00", "08:30+1", 650000, "Hard seat")
+        ]})
+    ]
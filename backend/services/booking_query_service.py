@@ -0,0 +1,71 @@
+from typing import Dict, Any, Optional
+from pydantic_core import to_json
+from sqlalchemy import select, cast, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Booking
+
+# Các cột vô hướng của BookingResponse (booking_data được ghép riêng)
+_SUMMARY_COLUMNS = (
+    Booking.id, Booking.booking_reference, Booking.status, Booking.total_amount,
+    Booking.booking_type, Booking.version, Booking.created_at
+)
+
+class BookingQueryService:
+    """Danh sách booking dạng JSON dựng sẵn.
+
+    booking_data được đọc nguyên văn dưới dạng text JSON từ database và ghép
+    thẳng vào response, không json.loads rồi validate rồi json.dumps lại từng
+    row như khi trả ORM object qua response_model. Kết quả giống hệt
+    BookingResponse.
+    """
+
+    @staticmethod
+    def _render_row(row) -> bytes:
+        summary = to_json({
+            "id": row.id,
+            "booking_reference": row.booking_reference,
+            "status": row.status,
+            "total_amount": float(row.total_amount or 0),
+            "booking_type": row.booking_type,
+            "version": row.version,
+            "created_at": row.created_at
+        })
+        return b"".join((summary[:-1], b',"booking_data":', (row.booking_data or "null").encode(), b"}"))
+
+    async def list_json(
+        self,
+        db: AsyncSession,
+        user_id: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> bytes:
+        """Trả về mảng JSON (bytes) các booking, mới nhất trước khi lọc theo user.
+
+        filters: provider, destination, travel_date_from, travel_date_to — lọc trên
+        các cột sinh có index, không phải parse booking_data.
+        """
+        query = select(*_SUMMARY_COLUMNS, cast(Booking.booking_data, Text).label("booking_data"))
+        if user_id is not None:
+            query = query.where(Booking.user_id == user_id).order_by(Booking.created_at.desc(), Booking.id.desc())
+        else:
+            query = query.order_by(Booking.id)
+        filters = filters or {}
+        if filters.get("provider"):
+            query = query.where(Booking.provider == filters["provider"])
+        if filters.get("destination"):
+            query = query.where(Booking.destination == filters["destination"])
+        if filters.get("travel_date_from"):
+            query = query.where(Booking.travel_date >= filters["travel_date_from"])
+        if filters.get("travel_date_to"):
+            query = query.where(Booking.travel_date <= filters["travel_date_to"])
+        query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+
+        rows = (await db.execute(query)).all()
+        return b"[" + b",".join(self._render_row(row) for row in rows) + b"]"
+
+# Global instance
+booking_query_service = BookingQueryService()
@@ -1,8 +1,16 @@
+import asyncio
 import httpx
 import os
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
+from models.schemas import FlightSearchRequest, HotelSearchRequest, TrainSearchRequest
+from services.booking_providers import BookingProvider, default_standin_providers
+from services.hotel_inventory import hotel_inventory, InventoryHotelProvider
+from services.route_planner import route_planner, TimetableProvider
+from services.search_cache_service import search_cache_service
+
 load_dotenv()
 
 class BookingService:
@@ -10,42 +18,140 @@ class BookingService:
         self.flight_api_key = os.getenv("FLIGHT_API_KEY")
         self.hotel_api_key = os.getenv("HOTEL_API_KEY")
         self.train_api_key = os.getenv("TRAIN_API_KEY")
-    
-    async def search_flights(self, request) -> Dict[str, Any]:
-        """Search for flights - Mock implementation"""
-        # This is a mock implementation
-        # In production, you would integrate with real flight APIs like Amadeus, Skyscanner, etc.
+        # Deadline chung cho một lần fan-out; provider trả lời sau deadline bị bỏ qua
+        self.search_deadline = int(os.getenv("BOOKING_SEARCH_DEADLINE_MS", 1500)) / 1000
+        self.max_results = int(os.getenv("BOOKING_SEARCH_MAX_RESULTS", 50))
+        self.providers: List[BookingProvider] = []
         
-        if not self.flight_api_key:
-            return {
-                "flights": [
-                    {
-                        "id": "VN123",
-                        "airline": "Vietnam Airlines",
-                        "origin": request.origin,
-                        "destination": request.destination,
-                        "departure_time": "08:00",
-                        "arrival_time": "10:30",
-                        "price": 2500000,
-                        "class": request.class_type,
-                        "duration": "2h 30m"
-                    },
-                    {
-                        "id": "VJ456",
-                        "airline": "VietJet Air",
-                        "origin": request.origin,
-                        "destination": request.destination,
-                        "departure_time": "14:00",
-                        "arrival_time": "16:45",
-                        "price": 1800000,
-                        "class": request.class_type,
-                        "duration": "2h 45m"
-                    }
-                ]
+        # Chưa có API thật: dùng provider giả lập cho các loại chưa cấu hình key
+        if os.getenv("BOOKING_STANDIN_PROVIDERS", "True").lower() == "true":
+            configured = {
+                "flights": bool(self.flight_api_key),
+                "hotels": bool(self.hotel_api_key),
+                "trains": bool(self.train_api_key)
             }
+            for provider in default_standin_providers():
+                if not any(configured[kind] for kind in provider.kinds):
+                    self.register_provider(provider)
+        
+        # Kho khách sạn local (load trong lifespan từ HOTEL_INVENTORY_PATH)
+        if os.getenv("HOTEL_INVENTORY_ENABLED", "True").lower() == "true":
+            self.register_provider(InventoryHotelProvider(hotel_inventory))
+        
+        # Chuyến bay/tàu có nối chuyến từ thời gian biểu local (load trong lifespan từ TIMETABLE_PATH)
+        if os.getenv("ROUTE_PLANNER_ENABLED", "True").lower() == "true":
+            self.register_provider(TimetableProvider(route_planner))
+    
+    def register_provider(self, provider: BookingProvider):
+        self.providers.append(provider)
+    
+    async def _timed_search(self, provider: BookingProvider, kind: str, request) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        results = await provider.search(kind, request)
+        return results, (time.perf_counter() - start) * 1000
+    
+    async def fan_out(self, kind: str, request) -> Dict[str, Any]:
+        """Gọi song song mọi provider hỗ trợ `kind` trong BOOKING_SEARCH_DEADLINE_MS.
+        
+        Hết deadline thì dùng những kết quả đã về (partial=True), hủy các lời gọi
+        còn lại, rồi gộp trùng và xếp hạng các offer.
+        """
+        providers = [provider for provider in self.providers if provider.supports(kind)]
+        if not providers:
+            return {"error": f"{kind.rstrip('s').capitalize()} search not implemented yet"}
+        
+        tasks = {asyncio.ensure_future(self._timed_search(p, kind, request)): p for p in providers}
+        done, pending = await asyncio.wait(tasks, timeout=self.search_deadline)
+        for task in pending:
+            task.cancel()
+        
+        offers = []
+        report = {}
+        for task, provider in tasks.items():
+            if task in pending:
+                report[provider.name] = {"status": "timeout"}
+            elif task.exception() is not None:
+                report[provider.name] = {"status": "error", "error": str(task.exception())}
+            else:
+                results, latency_ms = task.result()
+                offers.extend(results)
+                report[provider.name] = {"status": "ok", "count": len(results), "latency_ms": round(latency_ms, 1)}
+        
+        if not any(entry["status"] == "ok" for entry in report.values()):
+            return {"error": "No booking provider responded in time", "providers": report}
+        
+        merged = self._dedupe(kind, offers)
+        if kind == "hotels":
+            ranked = self._filter_hotels(merged, request)[:min(request.limit, self.max_results)]
+        else:
+            ranked = self._rank(kind, merged)[:self.max_results]
+        return {
+            kind: ranked,
+            "providers": report,
+            "partial": any(entry["status"] != "ok" for entry in report.values())
+        }
+    
+    @staticmethod
+    def _offer_key(kind: str, offer: Dict[str, Any]) -> Tuple:
+        if kind == "flights":
+            return (str(offer.get("airline", "")).casefold(), offer.get("id"), offer.get("departure_time"))
+        if kind == "trains":
+            return (offer.get("id"), offer.get("departure_time"), offer.get("class"))
+        return (offer.get("id") or str(offer.get("name", "")).casefold(),)
+    
+    @staticmethod
+    def _price(kind: str, offer: Dict[str, Any]) -> float:
+        return offer.get("price_per_night" if kind == "hotels" else "price") or float("inf")
+    
+    def _dedupe(self, kind: str, offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cùng một offer từ nhiều provider: giữ giá rẻ nhất, ghi lại mọi nguồn"""
+        merged: Dict[Tuple, Dict[str, Any]] = {}
+        for offer in offers:
+            key = self._offer_key(kind, offer)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = {**offer, "sources": [offer.get("provider")]}
+                continue
+            sources = current["sources"] + [offer.get("provider")]
+            if self._price(kind, offer) < self._price(kind, current):
+                current = {**offer}
+            current["sources"] = sources
+            merged[key] = current
+        return list(merged.values())
+    
+    def _rank(self, kind: str, offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rẻ nhất trước; khách sạn cùng giá thì rating cao hơn trước"""
+        return sorted(offers, key=lambda offer: (self._price(kind, offer), -(offer.get("rating") or 0)))
+    
+    def _filter_hotels(self, offers: List[Dict[str, Any]], request) -> List[Dict[str, Any]]:
+        """Áp bộ lọc và thứ tự của HotelSearchRequest lên offer đã gộp từ mọi provider
+        (provider ngoài có thể bỏ qua bộ lọc)"""
+        required = {amenity.strip().casefold() for amenity in request.amenities}
+        matched = [
+            offer for offer in offers
+            if (request.min_price is None or offer["price_per_night"] >= request.min_price)
+            and (request.max_price is None or offer["price_per_night"] <= request.max_price)
+            and (request.min_rating is None or (offer.get("rating") or 0) >= request.min_rating)
+            and required <= {amenity.casefold() for amenity in offer.get("amenities", [])}
+        ]
+        ranked = self._rank("hotels", matched)
+        if request.sort_by == "price_desc":
+            ranked.reverse()
+        elif request.sort_by == "rating_desc":
+            ranked.sort(key=lambda offer: -(offer.get("rating") or 0))
+        return ranked
+    
+    async def search(self, provider: str, request) -> Dict[str, Any]:
+        """Tìm kiếm qua cache kết quả (provider: flights, hotels, trains).
         
-        # Real API implementation would go here
-        return {"error": "Flight search not implemented yet"}
+        Trả về {"data", "cache", "age"}; search_flights/search_hotels/search_trains
+        luôn gọi thẳng provider.
+        """
+        return await search_cache_service.search(provider, request)
+    
+    async def search_flights(self, request) -> Dict[str, Any]:
+        """Search for flights across all registered providers"""
+        return await self.fan_out("flights", request)
     
     async def book_flight(self, request) -> Dict[str, Any]:
         """Book a flight - Mock implementation"""
@@ -58,32 +164,8 @@ class BookingService:
         }
     
     async def search_hotels(self, request) -> Dict[str, Any]:
-        """Search for hotels - Mock implementation"""
-        if not self.hotel_api_key:
-            return {
-                "hotels": [
-                    {
-                        "id": "HOTEL001",
-                        "name": "Grand Hotel Saigon",
-                        "location": request.location,
-                        "rating": 4.5,
-                        "price_per_night": 1200000,
-                        "amenities": ["WiFi", "Pool", "Gym", "Restaurant"],
-                        "image_url": "https://example.com/hotel1.jpg"
-                    },
-                    {
-                        "id": "HOTEL002",
-                        "name": "Riverside Resort",
-                        "location": request.location,
-                        "rating": 4.2,
-                        "price_per_night": 800000,
-                        "amenities": ["WiFi", "Pool", "Spa"],
-                        "image_url": "https://example.com/hotel2.jpg"
-                    }
-                ]
-            }
-        
-        return {"error": "Hotel search not implemented yet"}
+        """Search for hotels across all registered providers"""
+        return await self.fan_out("hotels", request)
     
     async def book_hotel(self, request) -> Dict[str, Any]:
         """Book a hotel - Mock implementation"""
@@ -96,36 +178,8 @@ class BookingService:
         }
     
     async def search_trains(self, request) -> Dict[str, Any]:
-        """Search for trains - Mock implementation"""
-        if not self.train_api_key:
-            return {
-                "trains": [
-                    {
-                        "id": "SE1",
-                        "name": "Thống Nhất Express",
-                        "origin": request.origin,
-                        "destination": request.destination,
-                        "departure_time": "19:30",
-                        "arrival_time": "06:00+1",
-                        "price": 850000,
-                        "class": "Soft sleeper",
-                        "duration": "10h 30m"
-                    },
-                    {
-                        "id": "SE3",
-                        "name": "Thống Nhất Express",
-                        "origin": request.origin,
-                        "destination": request.destination,
-                        "departure_time": "22:00",
-                        "arrival_time": "08:30+1",
-                        "price": 650000,
-                        "class": "Hard seat",
-                        "duration": "10h 30m"
-                    }
-                ]
-            }
-        
-        return {"error": "Train search not implemented yet"}
+        """Search for trains across all registered providers"""
+        return await self.fan_out("trains", request)
     
     async def book_train(self, request) -> Dict[str, Any]:
         """Book a train - Mock implementation"""
@@ -138,4 +192,9 @@ class BookingService:
         }
 
 # Global instance
-booking_service = BookingService()
\ No newline at end of file
+booking_service = BookingService()
+
+# Cache kết quả tìm kiếm gọi lại provider qua global instance khi refresh
+search_cache_service.register_provider("flights", FlightSearchRequest, booking_service.search_flights)
+search_cache_service.register_provider("hotels", HotelSearchRequest, booking_service.search_hotels)
+search_cache_service.register_provider("trains", TrainSearchRequest, booking_service.search_trains)
\ No newline at end of file
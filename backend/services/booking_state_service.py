@@ -0,0 +1,88 @@
+import os
+from typing import Dict, Any, Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models.models import Booking
+
+load_dotenv()
+
+# Trạng thái hiện tại -> các trạng thái được phép chuyển sang
+BOOKING_TRANSITIONS: Dict[str, Set[str]] = {
+    "pending": {"confirmed", "cancelled"},
+    "confirmed": {"cancelled"},
+    "cancelled": set()
+}
+
+class BookingStateService:
+    """Chuyển trạng thái booking bằng compare-and-set trên cột version.
+
+    UPDATE chỉ khớp khi version và trạng thái vẫn như lúc đọc, nên hai request
+    hủy/xác nhận song song không ghi đè nhau: một bên thắng, bên kia đọc lại
+    trạng thái mới và nhận lỗi tương ứng. Không cần SELECT ... FOR UPDATE nên
+    chạy được cả trên SQLite.
+    """
+
+    def __init__(self):
+        self.max_retries = int(os.getenv("BOOKING_TRANSITION_MAX_RETRIES", 3))
+        self.stats = {
+            "transitions": 0,
+            "cas_conflicts": 0,
+            "rejected": 0
+        }
+
+    async def transition(
+        self,
+        db: AsyncSession,
+        booking_id: int,
+        user_id: int,
+        to_status: str,
+        expected_version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Trả về {"booking"} khi thành công, hoặc {"error", "reason": not_found |
+        invalid_transition | version_conflict}.
+
+        expected_version (vd. từ header If-Match): chỉ chuyển khi booking chưa bị
+        sửa kể từ lần client đọc.
+        """
+        for _ in range(self.max_retries):
+            booking = (await db.execute(select(Booking).where(
+                Booking.id == booking_id,
+                Booking.user_id == user_id
+            ).execution_options(populate_existing=True))).scalars().first()
+            if booking is None:
+                return {"error": "Booking not found", "reason": "not_found"}
+            if expected_version is not None and booking.version != expected_version:
+                self.stats["rejected"] += 1
+                return {"error": f"Booking was modified (current version {booking.version})",
+                        "reason": "version_conflict", "booking": booking}
+            if to_status not in BOOKING_TRANSITIONS.get(booking.status, set()):
+                self.stats["rejected"] += 1
+                return {"error": f"Booking already {booking.status}" if booking.status == to_status
+                        else f"Cannot change booking from {booking.status} to {to_status}",
+                        "reason": "invalid_transition", "booking": booking}
+
+            result = await db.execute(update(Booking).where(
+                Booking.id == booking_id,
+                Booking.version == booking.version,
+                Booking.status == booking.status
+            ).values(status=to_status, version=Booking.version + 1, updated_at=func.now()))
+            await db.commit()
+            if result.rowcount == 1:
+                self.stats["transitions"] += 1
+                # Đồng bộ object đã load mà không đánh dấu dirty
+                set_committed_value(booking, "status", to_status)
+                set_committed_value(booking, "version", booking.version + 1)
+                return {"booking": booking}
+            # Request khác đã đổi booking giữa lúc đọc và lúc ghi: đọc lại rồi thử lại
+            self.stats["cas_conflicts"] += 1
+
+        return {"error": "Booking is being modified concurrently, please retry", "reason": "version_conflict"}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats}
+
+# Global instance
+booking_state_service = BookingStateService()
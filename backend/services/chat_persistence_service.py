@@ -0,0 +1,156 @@
+import asyncio
+import os
+from typing import Dict, Any, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from config.database import AsyncSessionLocal
+from models.models import ChatMessage
+
+load_dotenv()
+
+class ChatMessageWriter:
+    """Write-behind cho ChatMessage: gom các row vào queue và bulk insert theo lô.
+
+    Worker flush khi đủ CHAT_WRITE_BATCH_SIZE row hoặc sau CHAT_WRITE_FLUSH_INTERVAL_MS
+    kể từ row đầu tiên của lô. Queue có giới hạn: khi đầy, enqueue chờ tối đa
+    CHAT_WRITE_ENQUEUE_TIMEOUT giây (backpressure) rồi ghi thẳng xuống DB.
+    Khi worker chưa chạy (scripts, tests không có lifespan) row được ghi ngay.
+    Lỗi tạm thời (database is locked, mất kết nối) được thử lại tối đa
+    CHAT_WRITE_MAX_RETRIES lần với backoff tăng dần; chỉ bỏ lô khi hết lượt thử.
+    """
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.batch_size = int(os.getenv("CHAT_WRITE_BATCH_SIZE", 100))
+        self.flush_interval = int(os.getenv("CHAT_WRITE_FLUSH_INTERVAL_MS", 200)) / 1000
+        self.max_queue_size = int(os.getenv("CHAT_WRITE_QUEUE_SIZE", 10000))
+        self.enqueue_timeout = float(os.getenv("CHAT_WRITE_ENQUEUE_TIMEOUT", 2.0))
+        self.max_retries = int(os.getenv("CHAT_WRITE_MAX_RETRIES", 3))
+        self.retry_backoff = int(os.getenv("CHAT_WRITE_RETRY_BACKOFF_MS", 100)) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "direct_writes": 0,
+            "retries": 0,
+            "failed": 0
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+        print(f"✅ Chat message writer started (batch={self.batch_size}, interval={self.flush_interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        """Dừng worker và flush toàn bộ row còn trong queue"""
+        if not self.is_running:
+            return
+        await self._queue.put(None)
+        await self._worker
+        # Row được enqueue sau sentinel
+        remaining = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                remaining.append(row)
+        if remaining:
+            await self._flush(remaining)
+        self._worker = None
+        print(f"🛑 Chat message writer stopped ({self.stats['flushed']} rows flushed)")
+
+    async def enqueue_exchange(self, session_pk: int, message: str, response_text: str):
+        """Lưu tin nhắn của user và câu trả lời của bot"""
+        await self.enqueue([
+            {"session_id": session_pk, "message": message, "response": response_text, "is_user": True},
+            {"session_id": session_pk, "message": response_text, "response": None, "is_user": False}
+        ])
+
+    async def enqueue(self, rows: List[Dict[str, Any]]):
+        if not self.is_running:
+            self.stats["direct_writes"] += len(rows)
+            await self._flush(rows)
+            return
+
+        for i, row in enumerate(rows):
+            try:
+                await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+                self.stats["enqueued"] += 1
+            except asyncio.TimeoutError:
+                print("⚠️ Chat write queue is full, writing directly")
+                self.stats["direct_writes"] += len(rows) - i
+                await self._flush(rows[i:])
+                return
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            row = await self._queue.get()
+            if row is None:
+                return
+
+            batch = [row]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        return isinstance(error, OperationalError) or (
+            isinstance(error, DBAPIError) and error.connection_invalidated
+        )
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(ChatMessage), rows)
+                    await db.commit()
+                self.stats["flushed"] += len(rows)
+                self.stats["batches"] += 1
+                return
+            except Exception as e:
+                if attempt < self.max_retries and self._is_transient(e):
+                    self.stats["retries"] += 1
+                    delay = self.retry_backoff * 2 ** attempt
+                    print(f"⚠️ Persisting {len(rows)} chat messages failed, retrying in {delay * 1000:.0f}ms: {e}")
+                    await asyncio.sleep(delay)
+                    continue
+                self.stats["failed"] += len(rows)
+                print(f"❌ Failed to persist {len(rows)} chat messages after {attempt + 1} attempts: {e}")
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.is_running,
+            "queue_size": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_size": self.max_queue_size
+        }
+
+# Global instance
+chat_message_writer = ChatMessageWriter()
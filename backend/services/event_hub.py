@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from typing import Dict, Any, Optional, Set
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format một Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class Subscriber:
+    """Một kết nối SSE: queue có giới hạn, None trong queue nghĩa là đóng stream"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+class EventHub:
+    """Fan-out sự kiện server-push (SSE) tới các client đang kết nối trên worker này.
+
+    Mỗi sự kiện được encode một lần rồi put_nowait vào queue có giới hạn của
+    từng kết nối, nên publish không bao giờ chờ client chậm. Kết nối có queue
+    đầy (client không đọc kịp, socket bị nghẽn) bị ngắt; EventSource tự kết nối
+    lại và nhận snapshot mới. Heartbeat là một timer chung cho cả hub (comment
+    SSE), giữ kết nối qua proxy và phát hiện client chết mà không cần mỗi kết
+    nối một timer.
+    """
+
+    def __init__(self):
+        self.queue_size = int(os.getenv("EVENT_HUB_QUEUE_SIZE", 16))
+        self.max_subscribers = int(os.getenv("EVENT_HUB_MAX_SUBSCRIBERS", 10000))
+        self.heartbeat_interval = float(os.getenv("EVENT_HUB_HEARTBEAT_SECONDS", 15))
+        self.retry_ms = int(os.getenv("EVENT_HUB_RETRY_MS", 3000))
+        self.subscribers: Set[Subscriber] = set()
+        self.stats = {
+            "published": 0,
+            "delivered": 0,
+            "evicted": 0,
+            "rejected": 0,
+            "peak_subscribers": 0
+        }
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """Đăng ký một kết nối mới; None khi đã đủ max_subscribers"""
+        if len(self.subscribers) >= self.max_subscribers:
+            self.stats["rejected"] += 1
+            return None
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        self.stats["peak_subscribers"] = max(self.stats["peak_subscribers"], len(self.subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _close(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        # Bỏ các frame chưa gửi, để lại sentinel đóng stream
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def _evict(self, subscriber: Subscriber):
+        subscriber.evicted = True
+        self._close(subscriber)
+        self.stats["evicted"] += 1
+
+    def _fan_out(self, frame: str) -> int:
+        delivered = 0
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._evict(subscriber)
+        return delivered
+
+    def publish(self, event: str, data: Dict[str, Any]) -> int:
+        """Gửi sự kiện tới mọi kết nối; trả về số kết nối đã nhận"""
+        delivered = self._fan_out(format_sse(event, data))
+        self.stats["published"] += 1
+        self.stats["delivered"] += delivered
+        return delivered
+
+    async def stream(self, subscriber: Subscriber, snapshot: Optional[str] = None):
+        """Generator cho StreamingResponse: frame retry + snapshot, rồi các sự kiện
+        tới khi bị evict hoặc client ngắt kết nối"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            if snapshot is not None:
+                yield snapshot
+            while True:
+                frame = await subscriber.queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def run_heartbeat_loop(self):
+        """Heartbeat định kỳ cho mọi kết nối (chạy trong lifespan)"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self._fan_out(": heartbeat\n\n")
+
+    def close_all(self):
+        """Đóng mọi stream (khi shutdown)"""
+        for subscriber in list(self.subscribers):
+            self._close(subscriber)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "subscribers": len(self.subscribers),
+            "queue_size": self.queue_size,
+            "max_subscribers": self.max_subscribers,
+            "heartbeat_interval": self.heartbeat_interval
+        }
+
+# Global instance
+event_hub = EventHub()
@@ -1,20 +1,75 @@
 import asyncio
 import json
 import os
-from typing import Optional
+import socket
+import time
+import uuid
+from typing import Optional, Callable, Awaitable, Dict, Any
 from datetime import datetime
+from dotenv import load_dotenv
+
+from config.redis_client import redis_client
+from services.langflow_service import langflow_service
+from services.event_hub import event_hub
+from services.flow_warmup_service import flow_warmup_service
+
+try:
+    # inotify trên Linux; đi kèm uvicorn[standard]
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+load_dotenv()
 
 class FlowIdBroadcastService:
-    """Service để broadcast Flow ID changes"""
-    
-    def __init__(self):
-        self.flow_id_file = "/app/data/flow_id.txt"
-        self.notification_file = "/app/data/flow_id_changed.json"
+    """Đồng bộ Flow ID giữa các worker/replica qua Redis pub/sub.
+
+    Worker nhận /api/admin/update-flow-id ghi Flow ID vào một key Redis và
+    publish lên channel. Mọi worker subscribe trong lifespan và đổi flow ID của
+    LangflowService ngay khi nhận message. Sau mỗi lần (re)subscribe, worker đọc
+    key để không lỡ thay đổi xảy ra lúc mất kết nối. Khi Redis không kết nối
+    được thì theo dõi file flow_id.txt làm fallback: inotify qua watchfiles nếu
+    có, nếu không thì stat định kỳ trong thread.
+    """
+
+    def __init__(self, apply_flow_id: Optional[Callable[[str], Awaitable[None]]] = None, redis=None):
+        self.flow_id_file = os.getenv("FLOW_ID_FILE", "/app/data/flow_id.txt")
+        self.notification_file = os.path.join(os.path.dirname(self.flow_id_file), "flow_id_changed.json")
+        self.channel = os.getenv("FLOW_ID_CHANNEL", "travel:flow_id")
+        self.redis_key = f"{self.channel}:current"
+        self.reconnect_delay = float(os.getenv("FLOW_ID_RECONNECT_DELAY", 1.0))
+        self.max_reconnect_delay = float(os.getenv("FLOW_ID_MAX_RECONNECT_DELAY", 30.0))
+        self.file_poll_interval = float(os.getenv("FLOW_ID_FILE_POLL_INTERVAL", 5.0))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.apply_flow_id = apply_flow_id or self._apply_locally
+        self.redis = redis or redis_client
         self.current_flow_id: Optional[str] = None
         self.is_running = False
-        
+        self.mode = "stopped"  # pubsub | file | stopped
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._file_task: Optional[asyncio.Task] = None
+        self._latency_total_ms = 0.0
+        self._latency_count = 0
+        self.stats = {
+            "published": 0,
+            "received": 0,
+            "applied": 0,
+            "fallback_activations": 0,
+            "last_propagation_ms": None,
+            "max_propagation_ms": 0.0
+        }
+
+    @staticmethod
+    async def _apply_locally(flow_id: str):
+        # Cache câu trả lời nằm trên Redis dùng chung: worker publish đã xóa rồi
+        await langflow_service.set_flow_id(flow_id, invalidate_cache=False)
+        # Đẩy tới các browser đang kết nối SSE vào worker này
+        event_hub.publish("flow_id", {"flow_id": flow_id})
+        # Flow mới: warm-up trước khi người dùng gửi request đầu tiên
+        flow_warmup_service.schedule("flow_change")
+
     def get_stored_flow_id(self) -> Optional[str]:
-        """Lấy Flow ID từ file persistent"""
+        """Lấy Flow ID từ file persistent (blocking, gọi qua asyncio.to_thread trong event loop)"""
         try:
             if os.path.exists(self.flow_id_file):
                 with open(self.flow_id_file, 'r') as f:
@@ -23,21 +78,7 @@ class FlowIdBroadcastService:
         except Exception as e:
             print(f"⚠️ Error reading flow ID file: {e}")
         return None
-    
-    def check_for_changes(self) -> bool:
-        """Kiểm tra xem Flow ID có thay đổi không"""
-        stored_flow_id = self.get_stored_flow_id()
-        if stored_flow_id and stored_flow_id != self.current_flow_id:
-            old_flow_id = self.current_flow_id
-            self.current_flow_id = stored_flow_id
-            
-            print(f"🔄 Flow ID changed: {old_flow_id} -> {stored_flow_id}")
-            
-            # Tạo notification
-            self.create_notification(old_flow_id, stored_flow_id)
-            return True
-        return False
-    
+
     def create_notification(self, old_id: Optional[str], new_id: str):
         """Tạo notification file"""
         try:
@@ -47,45 +88,156 @@ class FlowIdBroadcastService:
                 "new_flow_id": new_id,
                 "message": f"Flow ID updated from {old_id} to {new_id}"
             }
-            
+
             with open(self.notification_file, 'w') as f:
                 json.dump(notification_data, f, indent=2)
-                
+
             print(f"📢 Created notification: {self.notification_file}")
-            
+
         except Exception as e:
             print(f"⚠️ Error creating notification: {e}")
-    
-    async def start_monitoring(self, check_interval: int = 5):
-        """Bắt đầu monitoring Flow ID changes"""
-        if self.is_running:
+
+    async def _swap(self, flow_id: str, via: str):
+        """Đổi Flow ID của worker này (một phép gán trên event loop, không có trạng thái trung gian)"""
+        if not flow_id or flow_id == self.current_flow_id:
+            return False
+        old_flow_id = self.current_flow_id
+        self.current_flow_id = flow_id
+        await self.apply_flow_id(flow_id)
+        self.stats["applied"] += 1
+        print(f"🔄 Flow ID changed via {via}: {old_flow_id} -> {flow_id}")
+        await asyncio.to_thread(self.create_notification, old_flow_id, flow_id)
+        return True
+
+    async def publish(self, flow_id: str, source: str = "admin") -> Dict[str, Any]:
+        """Lưu Flow ID vào Redis và publish cho mọi worker; trả về số subscriber đã nhận"""
+        message = json.dumps({
+            "flow_id": flow_id,
+            "source": source,
+            "origin": self.worker_id,
+            "published_at": time.time()
+        })
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.set(self.redis_key, flow_id)
+                pipe.publish(self.channel, message)
+                _, receivers = await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Flow ID publish failed, workers fall back to the flow ID file: {e}")
+            return {"published": False, "error": str(e)}
+        self.stats["published"] += 1
+        return {"published": True, "receivers": receivers}
+
+    async def broadcast_flow_id_change(self, flow_id: str) -> Dict[str, Any]:
+        """Broadcast Flow ID tới mọi worker"""
+        return await self.publish(flow_id, source="broadcast")
+
+    async def _handle_message(self, data: str):
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            print(f"⚠️ Ignoring malformed flow ID message: {data!r}")
             return
-            
-        self.is_running = True
-        print(f"🔍 Starting Flow ID monitoring (interval: {check_interval}s)")
-        
-        # Initialize current flow ID
-        self.current_flow_id = self.get_stored_flow_id()
-        print(f"📋 Initial Flow ID: {self.current_flow_id}")
-        
+        self.stats["received"] += 1
+        if await self._swap(payload.get("flow_id"), f"pubsub from {payload.get('origin')}"):
+            latency_ms = (time.time() - payload.get("published_at", time.time())) * 1000
+            self._latency_total_ms += latency_ms
+            self._latency_count += 1
+            self.stats["last_propagation_ms"] = round(latency_ms, 3)
+            self.stats["max_propagation_ms"] = round(max(self.stats["max_propagation_ms"], latency_ms), 3)
+
+    async def _subscribe_loop(self):
+        delay = self.reconnect_delay
         while self.is_running:
+            pubsub = self.redis.pubsub()
             try:
-                self.check_for_changes()
-                await asyncio.sleep(check_interval)
+                await pubsub.subscribe(self.channel)
+                # Đã subscribe: thay đổi trong lúc mất kết nối nằm ở key
+                await self._swap(await self.redis.get(self.redis_key), "redis key")
+                if self._file_task is not None:
+                    self._file_task.cancel()
+                    self._file_task = None
+                    print("✅ Flow ID pub/sub reconnected, file watch stopped")
+                self.mode = "pubsub"
+                delay = self.reconnect_delay
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._handle_message(message["data"])
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                print(f"❌ Error during monitoring: {e}")
-                await asyncio.sleep(check_interval)
-    
+                if self._file_task is None:
+                    print(f"⚠️ Flow ID pub/sub unavailable ({e}), watching {self.flow_id_file} instead")
+                    self.stats["fallback_activations"] += 1
+                    self.mode = "file"
+                    self._file_task = asyncio.create_task(self._watch_file())
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _check_file(self):
+        await self._swap(await asyncio.to_thread(self.get_stored_flow_id), "file")
+
+    async def _watch_file(self):
+        """Fallback khi không có Redis: theo dõi file Flow ID (không block event loop)"""
+        await self._check_file()
+        directory = os.path.dirname(self.flow_id_file)
+        if awatch is not None and os.path.isdir(directory):
+            target = os.path.abspath(self.flow_id_file)
+            async for changes in awatch(directory):
+                if any(os.path.abspath(path) == target for _, path in changes):
+                    await self._check_file()
+            return
+        last_mtime = None
+        while True:
+            try:
+                mtime = (await asyncio.to_thread(os.stat, self.flow_id_file)).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != last_mtime:
+                last_mtime = mtime
+                await self._check_file()
+            await asyncio.sleep(self.file_poll_interval)
+
+    async def start_monitoring(self):
+        """Đọc Flow ID ban đầu và subscribe channel ở background (gọi trong lifespan)"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.current_flow_id = await asyncio.to_thread(self.get_stored_flow_id)
+        print(f"🔍 Starting Flow ID sync on channel {self.channel} (initial: {self.current_flow_id})")
+        self._subscriber_task = asyncio.create_task(self._subscribe_loop())
+
     def stop_monitoring(self):
         """Dừng monitoring"""
         self.is_running = False
+        for task in (self._subscriber_task, self._file_task):
+            if task is not None:
+                task.cancel()
+        self._subscriber_task = self._file_task = None
+        self.mode = "stopped"
         print("🛑 Flow ID monitoring stopped")
-    
+
     def get_current_flow_id(self) -> Optional[str]:
         """Lấy Flow ID hiện tại"""
         if not self.current_flow_id:
             self.current_flow_id = self.get_stored_flow_id()
         return self.current_flow_id
 
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "avg_propagation_ms": round(self._latency_total_ms / self._latency_count, 3) if self._latency_count else None,
+            "mode": self.mode,
+            "channel": self.channel,
+            "worker_id": self.worker_id,
+            "current_flow_id": self.current_flow_id,
+            "file_watch": "inotify" if awatch is not None else "polling"
+        }
+
 # Global instance
 flow_id_broadcast_service = FlowIdBroadcastService()
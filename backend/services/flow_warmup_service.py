@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+from config.redis_client import redis_client
+from services.langflow_service import langflow_service
+
+load_dotenv()
+
+class FlowWarmupService:
+    """Warm-up và keep-warm cho flow Langflow.
+
+    Lần chạy đầu tiên sau khi Langflow khởi động lại hoặc flow được upload phải
+    khởi tạo component, load tool (search_google, fetch) và model client. Warm-up
+    gửi vài lần chạy tổng hợp tới flow hiện tại ngay trong lifespan (và sau mỗi
+    lần đổi Flow ID) để chi phí đó không rơi vào request của người dùng; /health
+    báo chưa ready trong lúc warm-up đầu tiên. Keep-warm ping một lần mỗi
+    interval nếu flow không có request nào trong khoảng đó.
+
+    Mọi worker dùng chung một Langflow nên chỉ worker giành được lease Redis
+    (SET NX, theo Flow ID và theo interval keep-warm) mới chạy; Redis lỗi thì
+    worker tự warm-up như khi chạy một mình. Lease warm-up được trả ngay khi
+    xong (nên Langflow khởi động lại với cùng Flow ID vẫn được warm-up lại);
+    worker thua lúc khởi động poll lease và chỉ báo ready khi lease được trả
+    hoặc hết timeout. Mỗi lần chạy dùng session ID mới để memory của Agent
+    không phình theo các tin nhắn tổng hợp.
+    """
+
+    def __init__(self, langflow=None, redis=None):
+        self.langflow = langflow or langflow_service
+        self.redis = redis or redis_client
+        self.enabled = os.getenv("FLOW_WARMUP_ENABLED", "true").lower() == "true"
+        self.runs = int(os.getenv("FLOW_WARMUP_RUNS", 2))
+        self.message = os.getenv("FLOW_WARMUP_MESSAGE", "Gợi ý giúp tôi một địa điểm du lịch ở Đà Nẵng")
+        self.timeout = float(os.getenv("FLOW_WARMUP_TIMEOUT_SECONDS", 90))
+        self.keep_warm_interval = float(os.getenv("FLOW_KEEP_WARM_INTERVAL_SECONDS", 300))
+        self.lease_poll_interval = float(os.getenv("FLOW_WARMUP_LEASE_POLL_SECONDS", 0.5))
+        self.lease_prefix = "langflow:warmup"
+        self.worker_id = uuid.uuid4().hex
+        self.warming = False
+        self.warmed_flow_id: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "warmups": 0,
+            "failures": 0,
+            "keep_warm_pings": 0,
+            "skipped": 0,
+            "last_warmup_at": None,
+            "last_warmup_ms": None,
+            "last_runs": [],
+            "last_error": None
+        }
+
+    @property
+    def ready(self) -> bool:
+        """False chỉ trong lúc warm-up lúc khởi động đang chạy"""
+        return not self.warming
+
+    @staticmethod
+    def _new_session_id() -> str:
+        return f"warmup-{uuid.uuid4().hex[:8]}"
+
+    async def _acquire_lease(self, name: str, seconds: float) -> bool:
+        """True nếu worker này được chạy; Redis lỗi thì tự chạy"""
+        try:
+            return bool(await self.redis.set(f"{self.lease_prefix}:{name}", self.worker_id,
+                                             nx=True, px=max(1, int(seconds * 1000))))
+        except Exception as e:
+            print(f"⚠️ Warm-up lease unavailable, warming locally: {e}")
+            return True
+
+    async def _release_lease(self, name: str):
+        """Trả lease nếu worker này vẫn đang giữ"""
+        key = f"{self.lease_prefix}:{name}"
+        try:
+            if await self.redis.get(key) == self.worker_id:
+                await self.redis.delete(key)
+        except Exception as e:
+            print(f"⚠️ Could not release warm-up lease: {e}")
+
+    async def _wait_for_lease(self, name: str):
+        """Chờ worker giữ lease warm-up xong (lease được trả hoặc hết hạn), tối đa timeout"""
+        key = f"{self.lease_prefix}:{name}"
+        deadline = time.monotonic() + self.timeout
+        try:
+            while time.monotonic() < deadline and await self.redis.exists(key):
+                await asyncio.sleep(self.lease_poll_interval)
+        except Exception as e:
+            print(f"⚠️ Could not poll warm-up lease: {e}")
+
+    async def _run(self, reason: str):
+        try:
+            flow_id = await self.langflow.get_flow_id()
+        except Exception:
+            flow_id = None  # Lỗi sẽ được ghi nhận trong lần warm-up bên dưới
+        if flow_id is not None and not await self._acquire_lease(flow_id, self.timeout):
+            self.stats["skipped"] += 1
+            print(f"⏭️ Flow {flow_id} is being warmed up by another worker ({reason})")
+            try:
+                # Lúc khởi động: chưa ready cho tới khi worker kia warm-up xong
+                if self.warming:
+                    await self._wait_for_lease(flow_id)
+            finally:
+                self.warming = False
+            return
+        try:
+            await self._warm(reason)
+        finally:
+            if flow_id is not None:
+                await self._release_lease(flow_id)
+
+    async def _warm(self, reason: str):
+        started = time.perf_counter()
+        runs = []
+
+        async def run_all():
+            # Chạy tuần tự: lần đầu gánh cold start, các lần sau đo latency khi đã warm
+            for _ in range(self.runs):
+                runs.append(await self.langflow.warm_run(self.message, self._new_session_id()))
+
+        try:
+            # timeout cho cả lần warm-up, nằm trong cửa sổ healthcheck của Docker
+            await asyncio.wait_for(run_all(), self.timeout)
+            self.warmed_flow_id = runs[-1]["flow_id"] if runs else self.warmed_flow_id
+            self.stats["warmups"] += 1
+            self.stats["last_error"] = None
+            latencies = ", ".join(f"{run['latency_ms']:.0f}ms{' (cold)' if run['cold'] else ''}" for run in runs)
+            print(f"🔥 Flow warmed up ({reason}): {self.warmed_flow_id} [{latencies}]")
+        except Exception as e:
+            # Langflow lỗi không giữ backend ở trạng thái chưa ready mãi
+            self.stats["failures"] += 1
+            self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Flow warm-up failed ({reason}): {self.stats['last_error']}")
+        finally:
+            self.stats["last_warmup_at"] = datetime.utcnow().isoformat()
+            self.stats["last_warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.stats["last_runs"] = runs
+            self.warming = False
+
+    def start(self):
+        """Bắt đầu warm-up lúc khởi động ở background (gọi trong lifespan); /health chưa ready tới khi xong"""
+        if not self.enabled or self.runs <= 0:
+            return
+        self.warming = True
+        self._task = asyncio.create_task(self._run("startup"))
+
+    def schedule(self, reason: str = "flow_change"):
+        """Warm-up lại sau khi đổi Flow ID (không ảnh hưởng /health)"""
+        if not self.enabled or self.runs <= 0:
+            return
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(reason))
+
+    async def run_keep_warm_loop(self):
+        """Ping flow khi không có request nào trong một interval (chạy trong lifespan)"""
+        if not self.enabled or self.keep_warm_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.keep_warm_interval)
+            idle = self.langflow.seconds_since_last_run()
+            if idle is not None and idle < self.keep_warm_interval:
+                continue
+            if self._task is not None and not self._task.done():
+                continue
+            try:
+                # Một ping mỗi interval cho mọi worker
+                if not await self._acquire_lease(f"keep_warm:{await self.langflow.get_flow_id()}",
+                                                 self.keep_warm_interval):
+                    continue
+                run = await asyncio.wait_for(self.langflow.warm_run(self.message, self._new_session_id()),
+                                             self.timeout)
+                self.stats["keep_warm_pings"] += 1
+                print(f"🔥 Keep-warm ping: {run['latency_ms']:.0f}ms{' (cold)' if run['cold'] else ''}")
+            except Exception as e:
+                self.stats["last_error"] = f"{type(e).__name__}: {e}"
+                print(f"⚠️ Keep-warm ping failed: {self.stats['last_error']}")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.warming = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "warming": self.warming,
+            "warmed_flow_id": self.warmed_flow_id,
+            "keep_warm_interval": self.keep_warm_interval,
+            "latency": self.langflow.get_latency_stats()
+        }
+
+# Global instance
+flow_warmup_service = FlowWarmupService()
@@ -0,0 +1,180 @@
+"""Gộp dự báo 3 giờ/lần của OpenWeatherMap thành dự báo theo ngày.
+
+Nhóm theo ngày địa phương của thành phố (offset `city.timezone` của API thay vì
+múi giờ của server) và tính min/max/trung bình nhiệt độ, điều kiện thời tiết
+chiếm ưu thế và tổng lượng mưa của mỗi ngày.
+
+Một forecast (~40 mốc) được gộp bằng vòng lặp Python thuần (aggregate_daily):
+ở kích thước này chi phí cố định của NumPy lớn hơn phần tính toán. NumPy chỉ
+dùng khi gộp cả lô lớn trong một lượt (aggregate_daily_batch), nơi benchmark
+cho thấy nó nhanh hơn (xem benchmarks/bench_forecast_aggregation.py).
+"""
+from datetime import date, timedelta
+from operator import itemgetter
+from typing import Dict, Any, List
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+EPOCH = date(1970, 1, 1)
+
+# Từ khoảng số forecast này gộp cả lô bằng NumPy mới nhanh hơn gọi aggregate_daily từng forecast
+BATCH_MIN_FORECASTS = 16
+
+# Thứ tự cột trong ma trận số sau khi parse
+_DT, _TEMP, _TEMP_MIN, _TEMP_MAX, _HUMIDITY, _WIND, _PRECIP, _CONDITION, _FORECAST = range(9)
+
+
+def _parse(forecasts: List[Dict[str, Any]]):
+    """Parse mọi mốc của các forecast thành một ma trận (n, 9) và bảng nhãn điều kiện.
+
+    Điều kiện thời tiết được mã hóa thành số nguyên (theo thứ tự chữ cái, để kết
+    quả không phụ thuộc vào các forecast khác trong lô) để đếm bằng bincount.
+    Icon ngày/đêm (01d/01n) của cùng một điều kiện được tính chung và trả về icon ban ngày.
+    """
+    index: Dict[str, int] = {}
+    icons: List[str] = []
+    # Danh sách phẳng + fromiter nhanh hơn nhiều so với np.array trên list các tuple
+    values: List[float] = []
+    extend = values.extend
+    for forecast_id, forecast_data in enumerate(forecasts):
+        offset = (forecast_data.get("city") or {}).get("timezone", 0)
+        for item in forecast_data.get("list") or []:
+            main = item["main"]
+            weather = item["weather"][0]
+            code = index.setdefault(weather["description"], len(index))
+            if code == len(icons):
+                icons.append(weather["icon"][:2] + "d")
+            # rain/snow chỉ có mặt khi có mưa/tuyết, tính theo mm trong 3 giờ
+            precipitation = (item.get("rain") or {}).get("3h", 0.0) + (item.get("snow") or {}).get("3h", 0.0)
+            extend((
+                item["dt"] + offset, main.get("temp", main["temp_max"]), main["temp_min"], main["temp_max"],
+                main["humidity"], item["wind"]["speed"], precipitation, code, forecast_id
+            ))
+    matrix = np.fromiter(values, dtype=np.float64, count=len(values)).reshape(-1, 9)
+    labels = sorted(zip(index, icons))
+    if labels:
+        rank = np.empty(len(labels), dtype=np.float64)
+        rank[[index[description] for description, _ in labels]] = np.arange(len(labels))
+        matrix[:, _CONDITION] = rank[matrix[:, _CONDITION].astype(np.int64)]
+    return matrix, labels
+
+
+def aggregate_daily_batch(forecasts: List[Dict[str, Any]], max_days: int = 5) -> List[List[Dict[str, Any]]]:
+    """Tổng hợp theo ngày cho nhiều forecast cùng lúc, trả về danh sách theo thứ tự đầu vào"""
+    if len(forecasts) < BATCH_MIN_FORECASTS:
+        return [aggregate_daily(forecast_data, max_days) for forecast_data in forecasts]
+    return _aggregate_daily_numpy(forecasts, max_days)
+
+
+def _aggregate_daily_numpy(forecasts: List[Dict[str, Any]], max_days: int) -> List[List[Dict[str, Any]]]:
+    results: List[List[Dict[str, Any]]] = [[] for _ in forecasts]
+    matrix, labels = _parse(forecasts)
+    if matrix.shape[0] == 0:
+        return results
+
+    local_day = np.floor_divide(matrix[:, _DT], SECONDS_PER_DAY).astype(np.int64)
+    forecast_ids = matrix[:, _FORECAST].astype(np.int64)
+    order = np.lexsort((matrix[:, _DT], forecast_ids))
+    matrix, local_day, forecast_ids = matrix[order], local_day[order], forecast_ids[order]
+
+    # Vị trí bắt đầu của mỗi nhóm (forecast, ngày) trong mảng đã sắp xếp
+    boundary = (local_day[1:] != local_day[:-1]) | (forecast_ids[1:] != forecast_ids[:-1])
+    starts = np.flatnonzero(np.r_[True, boundary])
+    counts = np.diff(np.r_[starts, local_day.size])
+    groups = starts.size
+
+    temp_min = np.minimum.reduceat(matrix[:, _TEMP_MIN], starts)
+    temp_max = np.maximum.reduceat(matrix[:, _TEMP_MAX], starts)
+    sums = np.add.reduceat(matrix[:, [_TEMP, _HUMIDITY, _PRECIP]], starts, axis=0)
+    temp_mean = sums[:, 0] / counts
+    humidity = sums[:, 1] / counts
+    precipitation = sums[:, 2]
+    wind_speed = np.maximum.reduceat(matrix[:, _WIND], starts)
+
+    # Điều kiện chiếm ưu thế: mode trong ngày (hòa thì lấy theo thứ tự chữ cái)
+    group = np.repeat(np.arange(groups), counts)
+    histogram = np.bincount(group * len(labels) + matrix[:, _CONDITION].astype(np.int64),
+                            minlength=groups * len(labels))
+    dominant = histogram.reshape(groups, len(labels)).argmax(axis=1)
+
+    dates = local_day[starts].astype("datetime64[D]").astype(str).tolist()
+    owners = forecast_ids[starts].tolist()
+    columns = zip(
+        owners, dates, np.round(temp_min, 2).tolist(), np.round(temp_max, 2).tolist(),
+        np.round(temp_mean, 2).tolist(), dominant.tolist(), np.round(humidity).astype(int).tolist(),
+        np.round(wind_speed, 2).tolist(), np.round(precipitation, 2).tolist()
+    )
+    for owner, date, t_min, t_max, t_mean, condition, hum, wind, precip in columns:
+        daily = results[owner]
+        if len(daily) >= max_days:
+            continue
+        description, icon = labels[condition]
+        daily.append({
+            "date": date,
+            "temp_min": t_min,
+            "temp_max": t_max,
+            "temp_mean": t_mean,
+            "description": description,
+            "icon": icon,
+            "humidity": hum,
+            "wind_speed": wind,
+            "precipitation": precip
+        })
+    return results
+
+
+def aggregate_daily(forecast_data: Dict[str, Any], max_days: int = 5) -> List[Dict[str, Any]]:
+    """Tổng hợp dự báo của một thành phố theo ngày địa phương (Python thuần, cùng kết quả với bản NumPy)"""
+    offset = (forecast_data.get("city") or {}).get("timezone", 0)
+    # day -> [temp_min, temp_max, tổng temp, tổng humidity, wind max, tổng mưa, số mốc, đếm điều kiện, icon]
+    days: Dict[int, list] = {}
+    # API trả về theo thứ tự thời gian; timsort trên list đã sắp xếp chỉ tốn O(n)
+    for item in sorted(forecast_data.get("list") or [], key=itemgetter("dt")):
+        main = item["main"]
+        weather = item["weather"][0]
+        description = weather["description"]
+        temp_min, temp_max, humidity = main["temp_min"], main["temp_max"], main["humidity"]
+        wind = item["wind"]["speed"]
+        precipitation = (item.get("rain") or {}).get("3h", 0.0) + (item.get("snow") or {}).get("3h", 0.0)
+        day = (item["dt"] + offset) // SECONDS_PER_DAY
+        bucket = days.get(day)
+        if bucket is None:
+            if len(days) == max_days:
+                break
+            days[day] = [temp_min, temp_max, main.get("temp", temp_max), humidity, wind, precipitation, 1,
+                         {description: 1}, {description: weather["icon"]}]
+            continue
+        if temp_min < bucket[0]:
+            bucket[0] = temp_min
+        if temp_max > bucket[1]:
+            bucket[1] = temp_max
+        if wind > bucket[4]:
+            bucket[4] = wind
+        bucket[2] += main.get("temp", temp_max)
+        bucket[3] += humidity
+        bucket[5] += precipitation
+        bucket[6] += 1
+        conditions = bucket[7]
+        if description in conditions:
+            conditions[description] += 1
+        else:
+            conditions[description] = 1
+            bucket[8][description] = weather["icon"]
+
+    daily = []
+    for day, (t_min, t_max, t_sum, h_sum, wind, precip, count, conditions, icons) in days.items():
+        # Mode trong ngày, hòa thì lấy theo thứ tự chữ cái (như bản NumPy)
+        description = min(conditions, key=lambda name: (-conditions[name], name))
+        daily.append({
+            "date": (EPOCH + timedelta(days=day)).isoformat(),
+            "temp_min": round(t_min, 2),
+            "temp_max": round(t_max, 2),
+            "temp_mean": round(t_sum / count, 2),
+            "description": description,
+            "icon": icons[description][:2] + "d",
+            "humidity": round(h_sum / count),
+            "wind_speed": round(wind, 2),
+            "precipitation": round(precip, 2)
+        })
+    return daily
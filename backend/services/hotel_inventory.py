@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from datetime import date
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from dotenv import load_dotenv
+
+import numpy as np
+
+from services.booking_providers import BookingProvider
+
+load_dotenv()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+DEFAULT_INVENTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hotels.json")
+
+SORT_OPTIONS = ("price_asc", "price_desc", "rating_desc")
+
+
+def normalize_city(city: str) -> str:
+    """'Đà Nẵng', 'da nang' và 'DA  NANG' cùng trỏ tới một thành phố"""
+    text = unicodedata.normalize("NFD", city.replace("đ", "d").replace("Đ", "D"))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip(" ,.")
+
+
+class _CityIndex:
+    """Các mảng cột của một thành phố, sắp xếp theo giá tăng dần"""
+
+    def __init__(self, rows: np.ndarray, prices, ratings, amenity_masks, rooms, max_guests, bitmaps):
+        order = np.argsort(prices[rows], kind="stable")
+        self.rows = rows[order]
+        self.prices = prices[self.rows]
+        self.ratings = ratings[self.rows]
+        self.amenity_masks = amenity_masks[self.rows]
+        self.rooms = rooms[self.rows]
+        self.max_guests = max_guests[self.rows]
+        # Copy liền bộ nhớ theo thứ tự giá để lọc availability không phải gather
+        self.bitmaps = np.ascontiguousarray(bitmaps[self.rows])
+
+
+class HotelInventory:
+    """Chỉ mục khách sạn trong bộ nhớ cho tìm kiếm theo thành phố, giá, hạng sao,
+    tiện nghi và ngày ở.
+
+    Mỗi thành phố giữ các mảng NumPy sắp theo giá (khoảng giá = hai lần
+    searchsorted), tiện nghi là bitset uint64 (tối đa 64 loại) và phòng trống
+    theo ngày là bitmap uint64 tính từ ngày load trong HOTEL_INVENTORY_HORIZON_DAYS
+    ngày. Một truy vấn chỉ gồm vài phép so sánh vector trên lát cắt theo giá
+    của một thành phố. Khi sang ngày mới, bitmap được dựng lại từ các record đã
+    load (roll_forward) để horizon luôn tính từ hôm nay.
+    """
+
+    def __init__(self, horizon_days: Optional[int] = None):
+        self.horizon_days = horizon_days or int(os.getenv("HOTEL_INVENTORY_HORIZON_DAYS", 365))
+        self.words = (self.horizon_days + 63) // 64
+        self.base_date = date.today()
+        # base_date truyền vào build() cố định (test/benchmark): không roll forward
+        self._pinned_base = False
+        self._records: List[Dict[str, Any]] = []
+        self._rollover: Optional[asyncio.Future] = None
+        self.hotels: List[Dict[str, Any]] = []
+        self.cities: Dict[str, _CityIndex] = {}
+        self.amenity_bits: Dict[str, int] = {}
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        """Đã sang ngày mới so với ngày dựng bitmap"""
+        return self.is_loaded and not self._pinned_base and date.today() != self.base_date
+
+    def _amenity_mask(self, amenities: Iterable[str], register: Optional[Dict[str, int]] = None) -> Optional[int]:
+        """register: bảng bit đang dựng trong build(), tiện nghi mới được thêm vào đó"""
+        amenity_bits = self.amenity_bits if register is None else register
+        mask = 0
+        for amenity in amenities:
+            key = amenity.strip().casefold()
+            bit = amenity_bits.get(key)
+            if bit is None:
+                if register is None:
+                    return None  # Tiện nghi chưa từng xuất hiện: không khách sạn nào khớp
+                if len(amenity_bits) >= 64:
+                    raise ValueError("Hotel inventory supports at most 64 distinct amenities")
+                bit = amenity_bits[key] = len(amenity_bits)
+            mask |= 1 << bit
+        return mask
+
+    def _day_offset(self, value: str, base_date: Optional[date] = None) -> int:
+        return (date.fromisoformat(value) - (base_date or self.base_date)).days
+
+    def _availability_bitmaps(self, records: List[Dict[str, Any]], base_date: date) -> np.ndarray:
+        """Bitmap (n, words) phòng trống theo ngày: mặc định còn phòng mọi ngày trong
+        horizon, trừ blackout_dates và ngoài khoảng available_from/available_to nếu có"""
+        n = len(records)
+        days = np.ones((n, self.words * 64), dtype=bool)
+        days[:, self.horizon_days:] = False
+        blackout_rows, blackout_days = [], []
+        for row, record in enumerate(records):
+            if record.get("available_from"):
+                days[row, :max(0, self._day_offset(record["available_from"], base_date))] = False
+            if record.get("available_to"):
+                days[row, max(0, self._day_offset(record["available_to"], base_date) + 1):] = False
+            for blackout in record.get("blackout_dates") or []:
+                blackout_rows.append(row)
+                blackout_days.append(self._day_offset(blackout, base_date))
+        if blackout_rows:
+            rows, offsets = np.array(blackout_rows), np.array(blackout_days)
+            inside = (offsets >= 0) & (offsets < self.horizon_days)
+            days[rows[inside], offsets[inside]] = False
+        return np.packbits(days, axis=1, bitorder="little").view(np.uint64).reshape(n, self.words)
+
+    def build(self, records: Iterable[Dict[str, Any]], base_date: Optional[date] = None):
+        """Dựng lại toàn bộ index từ các record (JSON file hoặc row của một bảng)"""
+        started = time.perf_counter()
+        pinned = base_date is not None
+        base_date = base_date or date.today()
+        # Dựng vào biến cục bộ rồi gán một lượt: search đang chạy không thấy index dở dang
+        amenity_bits: Dict[str, int] = {}
+        hotels, city_keys = [], []
+        room_counts, guest_limits, amenity_masks = [], [], []
+        records = list(records)
+        for record in records:
+            hotel = {
+                "id": str(record["id"]),
+                "name": record["name"],
+                "location": record["city"],
+                "rating": float(record.get("rating", 0)),
+                "price_per_night": float(record["price_per_night"]),
+                "amenities": list(record.get("amenities") or []),
+                "image_url": record.get("image_url")
+            }
+            hotels.append(hotel)
+            city_keys.append(normalize_city(record["city"]))
+            room_counts.append(int(record.get("rooms", 1)))
+            guest_limits.append(int(record.get("max_guests_per_room", 2)))
+            amenity_masks.append(self._amenity_mask(hotel["amenities"], register=amenity_bits))
+
+        n = len(hotels)
+        prices = np.fromiter((h["price_per_night"] for h in hotels), dtype=np.float64, count=n)
+        ratings = np.fromiter((h["rating"] for h in hotels), dtype=np.float32, count=n)
+        rooms = np.array(room_counts, dtype=np.int32)
+        max_guests = np.array(guest_limits, dtype=np.int32)
+        masks = np.array(amenity_masks, dtype=np.uint64).reshape(n)
+        bitmap_matrix = self._availability_bitmaps(records, base_date)
+
+        city_rows: Dict[str, List[int]] = {}
+        for row, city in enumerate(city_keys):
+            city_rows.setdefault(city, []).append(row)
+        cities = {
+            city: _CityIndex(np.array(rows, dtype=np.int64), prices, ratings, masks, rooms, max_guests, bitmap_matrix)
+            for city, rows in city_rows.items()
+        }
+        self.hotels, self.cities, self.amenity_bits = hotels, cities, amenity_bits
+        self.base_date = base_date
+        self._pinned_base = pinned
+        self._records = records
+        self.loaded_at = time.time()
+        print(f"🏨 Hotel inventory indexed {n} hotels in {len(self.cities)} cities "
+              f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def load_file(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            self.build(json.load(f))
+
+    async def load_file_async(self, path: str):
+        # Parse + build chạy ngoài event loop
+        await asyncio.to_thread(self.load_file, path)
+
+    async def roll_forward(self):
+        """Dựng lại bitmap theo ngày hôm nay ở ngoài event loop; các request cùng
+        phát hiện sang ngày mới chờ chung một lần dựng"""
+        if self._rollover is None or self._rollover.done():
+            self._rollover = asyncio.ensure_future(asyncio.to_thread(self.build, self._records))
+        await asyncio.shield(self._rollover)
+
+    def _night_mask(self, start: int, end: int) -> Tuple[int, int, np.ndarray]:
+        """Mask các word bitmap phủ các đêm [start, end)"""
+        first_word, last_word = start // 64, (end - 1) // 64
+        bits = np.zeros((last_word - first_word + 1) * 64, dtype=bool)
+        bits[start - first_word * 64:end - first_word * 64] = True
+        return first_word, last_word + 1, np.packbits(bits, bitorder="little").view(np.uint64)
+
+    def search(
+        self,
+        city: str,
+        check_in: str,
+        check_out: str,
+        rooms: int = 1,
+        guests: int = 1,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+        amenities: Optional[List[str]] = None,
+        sort_by: str = "price_asc",
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Trả về (tổng số khách sạn khớp, trang kết quả)"""
+        if sort_by not in SORT_OPTIONS:
+            raise ValueError(f"sort_by must be one of {', '.join(SORT_OPTIONS)}")
+        start, end = self._day_offset(check_in), self._day_offset(check_out)
+        if end <= start:
+            raise ValueError("check_out must be after check_in")
+        index = self.cities.get(normalize_city(city))
+        required = self._amenity_mask(amenities or [])
+        if index is None or required is None or start < 0 or end > self.horizon_days:
+            return 0, []
+
+        # Khoảng giá: lát cắt liên tục trên mảng đã sắp xếp
+        lo = 0 if min_price is None else int(np.searchsorted(index.prices, min_price, side="left"))
+        hi = index.prices.size if max_price is None else int(np.searchsorted(index.prices, max_price, side="right"))
+        if lo >= hi:
+            return 0, []
+
+        keep = index.rooms[lo:hi] >= rooms
+        if guests > 1:
+            keep &= index.max_guests[lo:hi] * rooms >= guests
+        if min_rating is not None:
+            keep &= index.ratings[lo:hi] >= min_rating
+        if required:
+            required_mask = np.uint64(required)
+            keep &= (index.amenity_masks[lo:hi] & required_mask) == required_mask
+        # Bitmap ngày ở chỉ kiểm tra trên các khách sạn đã qua những bộ lọc rẻ hơn
+        matches = np.flatnonzero(keep) + lo
+        first_word, last_word, night_mask = self._night_mask(start, end)
+        window = index.bitmaps[matches, first_word:last_word]
+        matches = matches[((window & night_mask) == night_mask).all(axis=1)]
+        if sort_by == "price_desc":
+            matches = matches[::-1]
+        elif sort_by == "rating_desc":
+            # Hạng sao giảm dần, cùng hạng thì rẻ hơn trước (matches đã theo giá tăng)
+            matches = matches[np.argsort(-index.ratings[matches], kind="stable")]
+
+        page = index.rows[matches[offset:offset + limit]]
+        return int(matches.size), [dict(self.hotels[row]) for row in page.tolist()]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.is_loaded,
+            "hotels": len(self.hotels),
+            "cities": len(self.cities),
+            "amenities": len(self.amenity_bits),
+            "horizon_days": self.horizon_days,
+            "base_date": self.base_date.isoformat()
+        }
+
+
+class InventoryHotelProvider(BookingProvider):
+    """Provider khách sạn đọc từ chỉ mục trong bộ nhớ"""
+
+    name = "hotel_inventory"
+    kinds = {"hotels"}
+
+    def __init__(self, inventory: HotelInventory):
+        self.inventory = inventory
+
+    async def search(self, kind: str, request) -> List[Dict[str, Any]]:
+        if not self.inventory.is_loaded:
+            return []
+        if self.inventory.is_stale:
+            await self.inventory.roll_forward()
+        _, hotels = self.inventory.search(
+            request.location, request.check_in, request.check_out,
+            rooms=request.rooms, guests=request.guests,
+            min_price=request.min_price, max_price=request.max_price,
+            min_rating=request.min_rating, amenities=request.amenities,
+            sort_by=request.sort_by, limit=request.limit
+        )
+        return hotels
+
+# Global instance
+hotel_inventory = HotelInventory()
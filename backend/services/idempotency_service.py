@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal
+from config.redis_client import redis_client
+from models.models import IdempotencyRecord
+
+load_dotenv()
+
+class IdempotencyService:
+    """Idempotency-Key cho các request tạo booking: client retry với cùng key nhận lại
+    đúng response của lần đầu thay vì tạo booking mới.
+
+    Key được giữ chỗ bằng một row (user_id, key) unique trong bảng idempotency_keys
+    (commit ngay nên request song song cùng key thấy nhau), response được ghi vào
+    row trong cùng transaction với booking, rồi chép sang Redis để replay nhanh.
+    Request xử lý lỗi thì nhả key để client retry được.
+    """
+
+    def __init__(self):
+        self.ttl = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+        self.max_key_length = int(os.getenv("IDEMPOTENCY_MAX_KEY_LENGTH", 255))
+        self.purge_interval = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 3600))
+        self.redis_prefix = "idempotency"
+        self.stats = {
+            "claimed": 0,
+            "replayed": 0,
+            "conflicts": 0,
+            "mismatches": 0,
+            "released": 0
+        }
+
+    @staticmethod
+    def fingerprint(operation: str, payload: Dict[str, Any]) -> str:
+        """Hash của thao tác + body để phát hiện cùng key nhưng khác request"""
+        canonical = json.dumps({"operation": operation, "payload": payload}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _redis_key(self, user_id: int, key: str) -> str:
+        return f"{self.redis_prefix}:{user_id}:{key}"
+
+    async def begin(self, db: AsyncSession, user_id: int, key: str, request_hash: str) -> Dict[str, Any]:
+        """Giữ key cho request này.
+
+        Trả về {"status": "new"} nếu request được xử lý lần đầu, {"status": "replay",
+        "status_code", "body"} nếu đã có response, hoặc {"status": "in_progress" |
+        "mismatch", "error"} khi không thể xử lý.
+        """
+        cached = await self._redis_get(user_id, key)
+        if cached is not None:
+            return self._resolve(cached["request_hash"], cached["status_code"], cached["body"], request_hash)
+
+        # Hai lượt: request đang giữ key có thể vừa lỗi và nhả key giữa INSERT và SELECT
+        for _ in range(2):
+            # Key hết hạn được dùng lại như key mới
+            await db.execute(delete(IdempotencyRecord).where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.key == key,
+                IdempotencyRecord.expires_at <= datetime.utcnow()
+            ))
+            db.add(IdempotencyRecord(
+                user_id=user_id,
+                key=key,
+                request_hash=request_hash,
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+            ))
+            try:
+                await db.commit()
+                self.stats["claimed"] += 1
+                return {"status": "new"}
+            except IntegrityError:
+                await db.rollback()
+
+            record = (await db.execute(select(IdempotencyRecord).where(
+                IdempotencyRecord.user_id == user_id,
+                IdempotencyRecord.key == key
+            ))).scalars().first()
+            if record is not None:
+                body = json.loads(record.response_body) if record.response_body is not None else None
+                return self._resolve(record.request_hash, record.status_code, body, request_hash)
+
+        self.stats["conflicts"] += 1
+        return {"status": "in_progress", "error": "A request with this Idempotency-Key is still being processed"}
+
+    def _resolve(self, stored_hash: str, status_code: Optional[int], body: Any, request_hash: str) -> Dict[str, Any]:
+        if stored_hash != request_hash:
+            self.stats["mismatches"] += 1
+            return {"status": "mismatch", "error": "Idempotency-Key was already used for a different request"}
+        if status_code is None:
+            self.stats["conflicts"] += 1
+            return {"status": "in_progress", "error": "A request with this Idempotency-Key is still being processed"}
+        self.stats["replayed"] += 1
+        return {"status": "replay", "status_code": status_code, "body": body}
+
+    async def complete(self, db: AsyncSession, user_id: int, key: str, status_code: int, body: Any):
+        """Ghi response vào row đã giữ; caller commit cùng transaction với booking"""
+        await db.execute(update(IdempotencyRecord).where(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.key == key
+        ).values(status_code=status_code, response_body=json.dumps(body, ensure_ascii=False)))
+
+    async def remember(self, user_id: int, key: str, request_hash: str, status_code: int, body: Any):
+        """Chép response đã commit sang Redis"""
+        entry = {"request_hash": request_hash, "status_code": status_code, "body": body}
+        try:
+            await redis_client.set(self._redis_key(user_id, key), json.dumps(entry, ensure_ascii=False), ex=self.ttl)
+        except Exception as e:
+            print(f"⚠️ Idempotency Redis write failed: {e}")
+
+    async def release(self, db: AsyncSession, user_id: int, key: str):
+        """Nhả key của request xử lý lỗi để client retry với cùng key"""
+        await db.rollback()
+        await db.execute(delete(IdempotencyRecord).where(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.status_code.is_(None)
+        ))
+        await db.commit()
+        self.stats["released"] += 1
+
+    async def _redis_get(self, user_id: int, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await redis_client.get(self._redis_key(user_id, key))
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            print(f"⚠️ Idempotency Redis read failed: {e}")
+            return None
+
+    async def purge_expired(self) -> int:
+        """Xóa các idempotency key đã hết hạn"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow()))
+            await db.commit()
+        return result.rowcount
+
+    async def run_purge_loop(self):
+        """Job định kỳ purge key hết hạn (chạy trong lifespan)"""
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    print(f"🧹 Purged {purged} expired idempotency keys")
+            except Exception as e:
+                print(f"❌ Idempotency key purge failed: {e}")
+            await asyncio.sleep(self.purge_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "ttl": self.ttl}
+
+# Global instance
+idempotency_service = IdempotencyService()
@@ -1,10 +1,16 @@
 import httpx
 import json
 import os
-from typing import Dict, Any, Optional
+import time
+import uuid
+from typing import Dict, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
 import asyncio
 
+from config.http_client import create_async_client, get_pool_stats
+from services.request_coalescer import RequestCoalescer
+from services.response_cache_service import response_cache_service, is_authenticated_context
+
 load_dotenv()
 
 class LangflowService:
@@ -15,7 +21,65 @@ class LangflowService:
         self.user_id = os.getenv("USER_ID")
         self.folder_id = os.getenv("FOLDER_ID")
         self._cached_flow_id = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.coalescer = RequestCoalescer()
+        # Lần chạy đầu tiên của mỗi flow trên worker này là "cold"
+        self._warm_urls = set()
+        self.last_run_at: Optional[float] = None
+        self._latency = {
+            source: {kind: {"count": 0, "total_ms": 0.0, "max_ms": 0.0} for kind in ("cold", "warm")}
+            for source in ("user", "synthetic")
+        }
+    
+    async def startup(self):
+        """Tạo HTTP client dùng chung (gọi trong lifespan của app)"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_async_client("LANGFLOW", timeout=30.0)
+    
+    async def shutdown(self):
+        """Đóng HTTP client dùng chung"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        # Fallback khi service được dùng ngoài lifespan (scripts, tests)
+        if self._client is None or self._client.is_closed:
+            self._client = create_async_client("LANGFLOW", timeout=30.0)
+        return self._client
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Thống kê connection pool tới Langflow"""
+        return get_pool_stats(self._client)
         
+    def _record_run(self, url: str, elapsed_ms: float, synthetic: bool = False) -> bool:
+        """Ghi latency một lần chạy flow theo cold/warm; trả về True nếu là lần chạy cold"""
+        cold = url not in self._warm_urls
+        self._warm_urls.add(url)
+        self.last_run_at = time.monotonic()
+        bucket = self._latency["synthetic" if synthetic else "user"]["cold" if cold else "warm"]
+        bucket["count"] += 1
+        bucket["total_ms"] += elapsed_ms
+        bucket["max_ms"] = max(bucket["max_ms"], elapsed_ms)
+        return cold
+    
+    def seconds_since_last_run(self) -> Optional[float]:
+        return None if self.last_run_at is None else time.monotonic() - self.last_run_at
+    
+    def get_latency_stats(self) -> Dict[str, Any]:
+        """Latency cold/warm (ms) của request người dùng và lần chạy warm-up"""
+        return {
+            source: {
+                kind: {
+                    "count": bucket["count"],
+                    "avg_ms": round(bucket["total_ms"] / bucket["count"], 1) if bucket["count"] else None,
+                    "max_ms": round(bucket["max_ms"], 1)
+                }
+                for kind, bucket in kinds.items()
+            }
+            for source, kinds in self._latency.items()
+        }
+    
     def get_persistent_flow_id(self) -> Optional[str]:
         """Lấy flow ID từ file persistent và sync data"""
         try:
@@ -46,22 +110,22 @@ class LangflowService:
     async def auto_detect_flow_id(self) -> Optional[str]:
         """Tự động detect flow ID từ LangFlow"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Lấy danh sách flows
-                response = await client.get(f"{self.langflow_host}/api/v1/flows/")
-                if response.status_code == 200:
-                    flows = response.json()
-                    if flows and len(flows) > 0:
-                        # Ưu tiên flow có tên "Travel Chatbot"
-                        for flow in flows:
-                            if flow.get('name') == 'Travel Chatbot':
-                                print(f"✅ Auto-detected Travel Chatbot flow ID: {flow['id']}")
-                                return flow['id']
-                        
-                        # Nếu không tìm thấy, lấy flow đầu tiên
-                        first_flow = flows[0]
-                        print(f"✅ Using first available flow ID: {first_flow['id']}")
-                        return first_flow['id']
+            client = self._get_client()
+            # Lấy danh sách flows
+            response = await client.get(f"{self.langflow_host}/api/v1/flows/", timeout=5.0)
+            if response.status_code == 200:
+                flows = response.json()
+                if flows and len(flows) > 0:
+                    # Ưu tiên flow có tên "Travel Chatbot"
+                    for flow in flows:
+                        if flow.get('name') == 'Travel Chatbot':
+                            print(f"✅ Auto-detected Travel Chatbot flow ID: {flow['id']}")
+                            return flow['id']
+                    
+                    # Nếu không tìm thấy, lấy flow đầu tiên
+                    first_flow = flows[0]
+                    print(f"✅ Using first available flow ID: {first_flow['id']}")
+                    return first_flow['id']
         except Exception as e:
             print(f"⚠️ Could not auto-detect flow ID: {e}")
         return None
@@ -78,7 +142,7 @@ class LangflowService:
             return self.flow_id
             
         # 3. Persistent file
-        persistent_id = self.get_persistent_flow_id()
+        persistent_id = await asyncio.to_thread(self.get_persistent_flow_id)
         if persistent_id:
             self._cached_flow_id = persistent_id
             return persistent_id
@@ -89,11 +153,17 @@ class LangflowService:
             return detected_id
             
         raise Exception("❌ Could not determine flow ID. Please check LangFlow configuration.")
+    
+    async def set_flow_id(self, flow_id: str, invalidate_cache: bool = True):
+        """Đổi flow ID đang dùng và xóa cache câu trả lời của flow cũ
+        (invalidate_cache=False khi worker khác đã xóa cache dùng chung)"""
+        old_flow_id = self._cached_flow_id
+        self._cached_flow_id = flow_id
+        if old_flow_id != flow_id and invalidate_cache:
+            await response_cache_service.invalidate()
         
-    async def send_message(self, message: str, session_id: Optional[str] = None, user_context: Optional[Dict] = None) -> Dict[str, Any]:
-        """Send message to Langflow and get response with user context"""
-        # Lấy flow ID
-        flow_id = await self.get_flow_id()
+    def _build_request(self, flow_id: str, message: str, session_id: Optional[str] = None, user_context: Optional[Dict] = None):
+        """Chuẩn bị url, payload và headers cho một lần chạy flow"""
         url = f"{self.langflow_host}/api/v1/run/{flow_id}"
         
         headers = {
@@ -103,7 +173,7 @@ class LangflowService:
         # Thêm authorization nếu có
         if self.app_token:
             headers["Authorization"] = f"Bearer {self.app_token}"
-          # Prepare message with user context
+        # Prepare message with user context
         enhanced_message = message
         if user_context and hasattr(user_context, 'isAuthenticated') and user_context.isAuthenticated:
             user_info = []
@@ -128,39 +198,110 @@ class LangflowService:
         
         if session_id:
             payload["session_id"] = session_id
-              # Add user context to payload for advanced processing
+        # Add user context to payload for advanced processing
         if user_context:
             # Convert Pydantic model to dict if needed
             if hasattr(user_context, 'dict'):
                 payload["user_context"] = user_context.dict()
             else:
                 payload["user_context"] = user_context
+        
+        return url, payload, headers
+    
+    @staticmethod
+    def _extract_response_text(result: Dict[str, Any]) -> Optional[str]:
+        """Lấy text trả lời từ kết quả run của Langflow"""
+        if "outputs" in result and len(result["outputs"]) > 0:
+            output = result["outputs"][0]
+            if "outputs" in output and len(output["outputs"]) > 0:
+                message_output = output["outputs"][0]
+                if "results" in message_output and "message" in message_output["results"]:
+                    return message_output["results"]["message"]["text"]
+        return None
+        
+    async def _run_flow(self, url: str, payload: Dict[str, Any], headers: Dict[str, str], synthetic: bool = False):
+        """Chạy flow một lần, trả về (text trả lời, session_id của Langflow)"""
+        client = self._get_client()
+        started = time.perf_counter()
+        response = await client.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        self._record_run(url, (time.perf_counter() - started) * 1000, synthetic)
+        
+        result = response.json()
+        return self._extract_response_text(result), result.get("session_id")
+    
+    async def warm_run(self, message: str, session_id: str) -> Dict[str, Any]:
+        """Một lần chạy tổng hợp (warm-up/keep-warm); lỗi được raise cho caller"""
+        flow_id = await self.get_flow_id()
+        url, payload, headers = self._build_request(flow_id, message, session_id)
+        cold = url not in self._warm_urls
+        started = time.perf_counter()
+        await self._run_flow(url, payload, headers, synthetic=True)
+        return {
+            "flow_id": flow_id,
+            "cold": cold,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        
+    async def send_message(self, message: str, session_id: Optional[str] = None, user_context: Optional[Dict] = None, use_cache: bool = False) -> Dict[str, Any]:
+        """Send message to Langflow and get response with user context
+        
+        use_cache chỉ nên bật cho lượt chat không phụ thuộc session (không có lịch sử hội thoại).
+        session_id=None: lượt đầu của một session mới, session ID được tạo ở đây và
+        trả về trong kết quả.
+        """
+        # Lấy flow ID
+        flow_id = await self.get_flow_id()
+        new_session = session_id is None
+        if new_session:
+            session_id = str(uuid.uuid4())
+        
+        cacheable = use_cache and response_cache_service.is_cacheable(user_context)
+        if cacheable:
+            cached = await response_cache_service.get(flow_id, message)
+            if cached:
+                return {
+                    "response": cached["response"],
+                    "session_id": session_id,
+                    "status": "success",
+                    "cached": True
+                }
+        
+        url, payload, headers = self._build_request(flow_id, message, session_id, user_context)
+        
+        async def run_flow():
+            text, result_session_id = await self._run_flow(url, payload, headers)
+            if text is not None and cacheable:
+                await response_cache_service.set(flow_id, message, {"response": text})
+            return text, result_session_id
             
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                
-                result = response.json()
-                
-                # Extract the actual response message
-                if "outputs" in result and len(result["outputs"]) > 0:
-                    output = result["outputs"][0]
-                    if "outputs" in output and len(output["outputs"]) > 0:
-                        message_output = output["outputs"][0]
-                        if "results" in message_output and "message" in message_output["results"]:
-                            return {
-                                "response": message_output["results"]["message"]["text"],
-                                "session_id": result.get("session_id"),
-                                "status": "success"
-                            }
+            # Lượt chat stateless, ẩn danh: các request giống hệt nhau dùng chung một lần chạy flow.
+            # Session có sẵn thì chỉ gộp trong cùng session (Langflow lưu lịch sử theo session_id);
+            # lượt đầu của session mới chưa có lịch sử nên gộp theo câu hỏi như cache câu trả lời
+            if use_cache and not is_authenticated_context(user_context):
+                key = response_cache_service.make_key(flow_id, message)
+                if not new_session:
+                    key = f"{key}:{session_id}"
+                text, _ = await self.coalescer.run(key, run_flow)
+                result_session_id = session_id
+            else:
+                text, result_session_id = await run_flow()
                 
+            # Extract the actual response message
+            if text is not None:
                 return {
-                    "response": "Xin lỗi, tôi không thể xử lý yêu cầu của bạn lúc này.",
-                    "session_id": session_id,
-                    "status": "error"
+                    "response": text,
+                    "session_id": result_session_id,
+                    "status": "success"
                 }
                 
+            return {
+                "response": "Xin lỗi, tôi không thể xử lý yêu cầu của bạn lúc này.",
+                "session_id": session_id,
+                "status": "error"
+            }
+                
         except httpx.TimeoutException:
             return {
                 "response": "Kết nối bị timeout. Vui lòng thử lại sau.",
@@ -180,12 +321,86 @@ class LangflowService:
                 "status": "error"
             }
     
+    async def stream_message(self, message: str, session_id: Optional[str] = None, user_context: Optional[Dict] = None, use_cache: bool = False) -> AsyncIterator[str]:
+        """Stream câu trả lời từ Langflow (run API với stream=true), yield từng đoạn text.
+        
+        Langflow trả về các event JSON phân tách bởi dòng trống:
+        {"event": "token", "data": {"chunk": ...}} cho từng token và
+        {"event": "end", "data": {"result": ...}} khi kết thúc.
+        Lỗi kết nối được raise để caller tự xử lý.
+        """
+        flow_id = await self.get_flow_id()
+        
+        cacheable = use_cache and response_cache_service.is_cacheable(user_context)
+        if cacheable:
+            cached = await response_cache_service.get(flow_id, message)
+            if cached:
+                yield cached["response"]
+                return
+        
+        url, payload, headers = self._build_request(flow_id, message, session_id, user_context)
+        headers["Accept"] = "text/event-stream"
+        
+        chunks = []
+        started = time.perf_counter()
+        async for chunk in self._stream_run(url, payload, headers):
+            if not chunks:
+                # Latency của stream là thời gian tới đoạn text đầu tiên
+                self._record_run(url, (time.perf_counter() - started) * 1000)
+            chunks.append(chunk)
+            yield chunk
+        
+        if cacheable and chunks:
+            await response_cache_service.set(flow_id, message, {"response": "".join(chunks)})
+    
+    async def _stream_run(self, url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> AsyncIterator[str]:
+        client = self._get_client()
+        async with client.stream("POST", url, params={"stream": "true"}, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            
+            # Langflow cũ / flow không hỗ trợ stream: trả về JSON một lần
+            if response.headers.get("content-type", "").startswith("application/json"):
+                result = json.loads(await response.aread())
+                text = self._extract_response_text(result)
+                if text:
+                    yield text
+                return
+            
+            streamed_tokens = False
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if line.startswith("data:"):
+                    line = line[len("data:"):].strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                
+                event_type = event.get("event")
+                data = event.get("data") or {}
+                if event_type == "token":
+                    chunk = data.get("chunk")
+                    if chunk:
+                        streamed_tokens = True
+                        yield chunk
+                elif event_type == "error":
+                    raise Exception(data.get("error") or data.get("text") or "Langflow stream error")
+                elif event_type == "end":
+                    # Model không stream token: lấy toàn bộ text từ kết quả cuối
+                    if not streamed_tokens:
+                        text = self._extract_response_text(data.get("result") or {})
+                        if text:
+                            yield text
+                    break
+    
     async def health_check(self) -> bool:
         """Check if Langflow is running"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.langflow_host}/api/v1/health")
-                return response.status_code == 200
+            client = self._get_client()
+            response = await client.get(f"{self.langflow_host}/api/v1/health", timeout=5.0)
+            return response.status_code == 200
         except:
             return False
 
@@ -0,0 +1,51 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class RequestCoalescer:
+    """Single-flight: các request giống hệt nhau đang chạy đồng thời dùng chung một lần gọi upstream.
+
+    Lần gọi đầu tiên cho một key (leader) chạy factory trong một task riêng;
+    các request tới sau với cùng key chỉ chờ task đó. Task được shield nên
+    một client ngắt kết nối không hủy kết quả của những người đang chờ.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            self.leaders += 1
+            task.add_done_callback(lambda done, key=key: self._on_done(key, done))
+        else:
+            self.coalesced += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        # Tránh warning "exception was never retrieved" khi không còn ai chờ
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "waiters": dict(self._waiters)
+        }
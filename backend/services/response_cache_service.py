@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+from config.redis_client import redis_client
+
+load_dotenv()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " ?!.,;:…"
+
+
+def normalize_message(message: str) -> str:
+    """Chuẩn hóa câu hỏi để các biến thể giống nhau dùng chung cache key"""
+    text = unicodedata.normalize("NFC", message).casefold()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def is_authenticated_context(user_context: Any) -> bool:
+    """user_context có thể là dict (từ /send) hoặc Pydantic model (từ widget)"""
+    if not user_context:
+        return False
+    if isinstance(user_context, dict):
+        return bool(user_context.get("isAuthenticated"))
+    return bool(getattr(user_context, "isAuthenticated", False))
+
+
+class ResponseCacheService:
+    """Exact-match cache câu trả lời Langflow trên Redis.
+
+    Key gồm flow ID và hash của câu hỏi đã chuẩn hóa, nên đổi flow sẽ không
+    bao giờ trả về câu trả lời của flow cũ. Một sorted set (score = lần truy
+    cập cuối) giới hạn số entry và dùng để evict theo LRU.
+    """
+
+    def __init__(self, redis=redis_client):
+        self.redis = redis
+        self.enabled = os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+        self.ttl = int(os.getenv("RESPONSE_CACHE_TTL", 3600))
+        self.max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))
+        self.bypass_authenticated = os.getenv("RESPONSE_CACHE_BYPASS_AUTHENTICATED", "True").lower() == "true"
+        self.prefix = "langflow:response_cache"
+        self.index_key = f"{self.prefix}:index"
+        self.stats_key = f"{self.prefix}:stats"
+
+    def make_key(self, flow_id: str, message: str) -> str:
+        digest = hashlib.sha256(normalize_message(message).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:entry:{flow_id}:{digest}"
+
+    def is_cacheable(self, user_context: Any = None) -> bool:
+        """Lượt chat có thể dùng cache không (không phụ thuộc session/người dùng)"""
+        if not self.enabled:
+            return False
+        if self.bypass_authenticated and is_authenticated_context(user_context):
+            return False
+        return True
+
+    async def get(self, flow_id: str, message: str) -> Optional[Dict[str, Any]]:
+        key = self.make_key(flow_id, message)
+        try:
+            cached = await self.redis.get(key)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if cached is None:
+                    pipe.hincrby(self.stats_key, "misses", 1)
+                else:
+                    pipe.hincrby(self.stats_key, "hits", 1)
+                    pipe.zadd(self.index_key, {key: time.time()})
+                await pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Response cache read failed: {e}")
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    async def set(self, flow_id: str, message: str, response: Dict[str, Any]):
+        key = self.make_key(flow_id, message)
+        now = time.time()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, json.dumps(response, ensure_ascii=False), ex=self.ttl)
+                pipe.zadd(self.index_key, {key: now})
+                # Bỏ các entry đã hết TTL khỏi index
+                pipe.zremrangebyscore(self.index_key, 0, now - self.ttl)
+                pipe.zcard(self.index_key)
+                results = await pipe.execute()
+
+            overflow = results[-1] - self.max_entries
+            if overflow > 0:
+                await self._evict(overflow)
+        except Exception as e:
+            print(f"⚠️ Response cache write failed: {e}")
+
+    async def _evict(self, count: int):
+        """Evict các entry ít được truy cập gần đây nhất"""
+        evicted = await self.redis.zpopmin(self.index_key, count)
+        keys = [key for key, _ in evicted]
+        if keys:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(*keys)
+                pipe.hincrby(self.stats_key, "evictions", len(keys))
+                await pipe.execute()
+
+    async def invalidate(self) -> int:
+        """Xóa toàn bộ câu trả lời đã cache (ví dụ khi flow ID thay đổi)"""
+        deleted = 0
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=f"{self.prefix}:entry:*", count=500)]
+            for i in range(0, len(keys), 500):
+                deleted += await self.redis.delete(*keys[i:i + 500])
+            await self.redis.delete(self.index_key)
+            print(f"🧹 Response cache invalidated ({deleted} entries)")
+        except Exception as e:
+            print(f"⚠️ Response cache invalidation failed: {e}")
+        return deleted
+
+    async def get_stats(self) -> Dict[str, Any]:
+        try:
+            stats = await self.redis.hgetall(self.stats_key)
+            entries = await self.redis.zcard(self.index_key)
+        except Exception as e:
+            return {"enabled": self.enabled, "error": str(e)}
+
+        hits = int(stats.get("hits", 0))
+        misses = int(stats.get("misses", 0))
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "evictions": int(stats.get("evictions", 0)),
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl
+        }
+
+# Global instance
+response_cache_service = ResponseCacheService()
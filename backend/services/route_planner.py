@@ -0,0 +1,502 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable, Set, Tuple, FrozenSet
+from dotenv import load_dotenv
+
+from services.booking_providers import BookingProvider
+from services.hotel_inventory import normalize_city
+
+load_dotenv()
+
+MINUTES_PER_DAY = 1440
+
+DEFAULT_TIMETABLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "timetable.json")
+
+OPTIMIZE_OPTIONS = ("fastest", "cheapest")
+
+MODES = ("train", "flight")
+
+# Loại nhãn trong hàng đợi tìm kiếm
+RIDE, STOP, SCAN = 0, 1, 2
+
+
+def _parse_clock(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _place_key(place: str) -> str:
+    """'Hà Nội', 'Ha Noi' và 'Hanoi' cho cùng một key"""
+    return normalize_city(place).replace(" ", "")
+
+
+def _format_duration(minutes: int) -> str:
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+
+class Trip:
+    """Một chuyến tàu/máy bay chạy hằng ngày; thời gian tính bằng phút từ 00:00
+    ngày khởi hành của chuyến (qua nửa đêm thì lớn hơn 1440)"""
+
+    __slots__ = ("id", "mode", "operator", "seat_class", "fare_per_km", "price", "stops", "cities",
+                 "arrivals", "departures", "km")
+
+    def __init__(self, trip: Dict[str, Any], stop_city: Dict[str, str]):
+        self.id = trip["id"]
+        self.mode = trip["mode"]
+        self.operator = trip["operator"]
+        self.seat_class = trip.get("class")
+        self.fare_per_km = trip.get("fare_per_km")
+        self.price = trip.get("price")
+        self.stops, self.arrivals, self.departures, self.km = [], [], [], []
+        # Giờ trong file là giờ địa phương; giờ nhỏ hơn giờ trước đó nghĩa là đã sang ngày hôm sau
+        day, last = 0, None
+        for stop_id, arrival, departure, km in trip["stops"]:
+            times = []
+            for value in (arrival, departure):
+                if value is None:
+                    times.append(None)
+                    continue
+                minutes = _parse_clock(value) + day * MINUTES_PER_DAY
+                if last is not None and minutes < last:
+                    day += 1
+                    minutes += MINUTES_PER_DAY
+                last = minutes
+                times.append(minutes)
+            self.stops.append(stop_id)
+            self.arrivals.append(times[0])
+            self.departures.append(times[1])
+            self.km.append(km)
+        self.cities = [stop_city[stop] for stop in self.stops]
+
+    def fare(self, board: int, alight: int) -> float:
+        if self.price is not None:
+            return self.price
+        return round((self.km[alight] - self.km[board]) * self.fare_per_km, -3)
+
+    def hop_lower_bound(self, index: int) -> float:
+        """Cận dưới giá chặng index -> index + 1: tổng các cận của một đoạn không vượt giá đoạn đó"""
+        if self.price is not None:
+            return self.price / (len(self.stops) - 1)
+        # fare() làm tròn tới nghìn, mỗi chặng trừ hao 500
+        return max(0.0, (self.km[index + 1] - self.km[index]) * self.fare_per_km - 500)
+
+
+class RoutePlanner:
+    """Tìm hành trình nhiều chặng tàu/máy bay trên đồ thị thời gian biểu.
+
+    Lúc load, các chuyến trong file thời gian biểu được chỉ mục theo điểm dừng:
+    mỗi điểm dừng giữ các lượt lên tàu (chuyến, vị trí dừng) sắp theo giờ khởi
+    hành. Truy vấn chạy Dijkstra phụ thuộc thời gian (A*) trên đồ thị mở rộng
+    theo thời gian với hai loại nhãn: đang ở trên một chuyến tại điểm dừng thứ
+    j (đi tiếp một chặng hoặc xuống) và đã xuống tại một điểm dừng (lên chuyến
+    khác). Khóa ưu tiên là tổng thời gian hành trình (fastest) hoặc tổng giá
+    (cheapest) cộng cận dưới phần còn lại tính sẵn theo đích; nhãn bị bỏ khi đã
+    có k nhãn tốt hơn hẳn ở cùng vị trí nên trả về được k hành trình tốt nhất.
+    Với fastest, các lượt lên tàu tại một điểm dừng được tạo lần lượt theo giờ
+    khởi hành khi tới lượt trong hàng đợi, nên các chuyến chờ quá lâu không bao
+    giờ được xét.
+    Đổi chuyến tại cùng điểm dừng cần min_transfer_minutes của điểm đó, đổi sang
+    điểm dừng khác cùng thành phố (ga -> sân bay) cần city_transfer_minutes.
+    Mỗi truy vấn có ngân sách (ROUTE_MAX_EXPANSIONS nhãn, ROUTE_SEARCH_BUDGET_MS);
+    hết ngân sách thì trả về các hành trình đã tìm được. Từ code async gọi
+    plan_async để tìm kiếm chạy ngoài event loop.
+    """
+
+    def __init__(self):
+        self.max_wait = int(os.getenv("ROUTE_MAX_WAIT_MINUTES", 720))
+        self.max_duration = int(os.getenv("ROUTE_MAX_DURATION_HOURS", 48)) * 60
+        self.max_transfers = int(os.getenv("ROUTE_MAX_TRANSFERS", 2))
+        self.max_k = int(os.getenv("ROUTE_MAX_K", 10))
+        self.max_expansions = int(os.getenv("ROUTE_MAX_EXPANSIONS", 200000))
+        self.search_budget = float(os.getenv("ROUTE_SEARCH_BUDGET_MS", 500)) / 1000
+        self.budget_exhausted = 0
+        self.city_transfer = 90
+        self.stops: Dict[str, Dict[str, Any]] = {}
+        self.trips: List[Trip] = []
+        # Điểm dừng -> giờ khởi hành trong ngày (để bisect) và (chuyến, vị trí dừng) tương ứng
+        self._departures: Dict[str, List[int]] = {}
+        self._boardings: Dict[str, List[Tuple[int, int]]] = {}
+        self._city_stops: Dict[str, List[str]] = {}
+        self._stop_city: Dict[str, str] = {}
+        self._aliases: Dict[str, Set[str]] = {}
+        # mode -> điểm đến -> {điểm đi: (cận dưới thời gian, cận dưới giá)} trên từng chặng liền kề
+        self._links: Dict[str, Dict[str, Dict[str, Tuple[int, float]]]] = {}
+        self._bounds: Dict[Tuple[FrozenSet[str], FrozenSet[str]], Tuple[Dict[str, float], Dict[str, float]]] = {}
+        self.hops = 0
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def build(self, timetable: Dict[str, Any]):
+        started = time.perf_counter()
+        self.city_transfer = int(timetable.get("city_transfer_minutes", self.city_transfer))
+        self.stops = {stop["id"]: stop for stop in timetable["stops"]}
+        self._city_stops = {}
+        self._stop_city = {}
+        self._aliases = {}
+        for stop in timetable["stops"]:
+            city = self._stop_city[stop["id"]] = normalize_city(stop["city"])
+            self._city_stops.setdefault(city, []).append(stop["id"])
+            for name in [stop["id"], stop["city"], stop["name"]] + list(stop.get("aliases", [])):
+                self._aliases.setdefault(_place_key(name), set()).add(city)
+
+        trips = [Trip(trip, self._stop_city) for trip in timetable["trips"]]
+        boardings: Dict[str, List[Tuple[int, int, int]]] = {}
+        links: Dict[str, Dict[str, Dict[str, Tuple[int, float]]]] = {}
+        hops = 0
+        for t, trip in enumerate(trips):
+            for j in range(len(trip.stops) - 1):
+                hops += 1
+                boardings.setdefault(trip.stops[j], []).append((trip.departures[j] % MINUTES_PER_DAY, t, j))
+                incoming = links.setdefault(trip.mode, {}).setdefault(trip.stops[j + 1], {})
+                duration = trip.arrivals[j + 1] - trip.departures[j]
+                price = trip.hop_lower_bound(j)
+                best_duration, best_price = incoming.get(trip.stops[j], (duration, price))
+                incoming[trip.stops[j]] = (min(best_duration, duration), min(best_price, price))
+
+        self.trips = trips
+        self._departures, self._boardings = {}, {}
+        for stop, events in boardings.items():
+            events.sort()
+            self._departures[stop] = [minute for minute, _, _ in events]
+            self._boardings[stop] = [(t, j) for _, t, j in events]
+        self._links = links
+        self._bounds = {}
+        self.hops = hops
+        self.loaded_at = time.time()
+        print(f"🚆 Route planner indexed {len(trips)} trips, {hops} legs "
+              f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+
+    def load_file(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            self.build(json.load(f))
+
+    async def load_file_async(self, path: str):
+        await asyncio.to_thread(self.load_file, path)
+
+    def resolve(self, place: str) -> List[str]:
+        """Mã điểm dừng, tên ga/sân bay, tên thành phố hoặc alias -> các điểm dừng của thành phố đó"""
+        stops = []
+        for city in sorted(self._aliases.get(_place_key(place), ())):
+            stops.extend(self._city_stops[city])
+        return stops
+
+    def _lower_bounds(self, targets: FrozenSet[str], modes: FrozenSet[str]) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Cận dưới thời gian và giá từ mỗi điểm dừng tới đích (Dijkstra ngược trên
+        các chặng liền kề, bỏ qua thời gian chờ), dùng làm heuristic A*.
+        Điểm dừng không có trong kết quả thì không tới được đích."""
+        cache_key = (targets, modes)
+        if cache_key not in self._bounds:
+            bounds = []
+            for metric in (0, 1):
+                best = {stop: 0 for stop in targets}
+                heap = [(0, stop) for stop in targets]
+                while heap:
+                    value, stop = heapq.heappop(heap)
+                    if value > best[stop]:
+                        continue
+                    # Đổi sang điểm dừng khác cùng thành phố: cận dưới 0
+                    neighbours = [(other, 0) for other in self._city_stops[self._stop_city[stop]]]
+                    for mode in modes:
+                        neighbours.extend((origin, link[metric])
+                                          for origin, link in self._links.get(mode, {}).get(stop, {}).items())
+                    for origin, weight in neighbours:
+                        if value + weight < best.get(origin, float("inf")):
+                            best[origin] = value + weight
+                            heapq.heappush(heap, (value + weight, origin))
+                bounds.append(best)
+            self._bounds[cache_key] = (bounds[0], bounds[1])
+        return self._bounds[cache_key]
+
+    def _first_boarding(self, stop: str, start: int) -> int:
+        """Vị trí (đánh số liên tục qua các ngày) của lượt lên tàu đầu tiên rời `stop`
+        từ phút `start` (tính từ 00:00 ngày đi)"""
+        times = self._departures[stop]
+        day = start // MINUTES_PER_DAY
+        return day * len(times) + bisect_left(times, start - day * MINUTES_PER_DAY)
+
+    def _boarding_at(self, stop: str, position: int) -> Tuple[int, int, int]:
+        """(giờ khởi hành tuyệt đối, chuyến, vị trí dừng trên chuyến)"""
+        times = self._departures[stop]
+        day, i = divmod(position, len(times))
+        t, j = self._boardings[stop][i]
+        return day * MINUTES_PER_DAY + times[i], t, j
+
+    def plan(
+        self,
+        origin: str,
+        destination: str,
+        earliest_departure: str = "00:00",
+        latest_departure: str = "23:59",
+        modes: Optional[Iterable[str]] = None,
+        optimize: str = "fastest",
+        k: int = 3,
+        max_transfers: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """k hành trình tốt nhất khởi hành trong [earliest_departure, latest_departure] của ngày đi.
+
+        Thời điểm trong kết quả là số phút tính từ 00:00 ngày đi.
+        """
+        if optimize not in OPTIMIZE_OPTIONS:
+            raise ValueError(f"optimize must be one of {', '.join(OPTIMIZE_OPTIONS)}")
+        origins = self.resolve(origin)
+        targets = set(self.resolve(destination))
+        if not origins or not targets or targets & set(origins):
+            return []
+        modes = frozenset(modes) if modes else None
+        remaining_time, remaining_cost = self._lower_bounds(frozenset(targets), modes or frozenset(self._links))
+        max_transfers = self.max_transfers if max_transfers is None else max_transfers
+        fastest = optimize == "fastest"
+        trips = self.trips
+
+        heap = []
+        counter = 0
+        # Nhãn đã mở rộng: theo điểm dừng (đã xuống) và theo (chuyến, ngày chạy, vị trí dừng) (đang ở trên chuyến)
+        stop_labels: Dict[str, List[Tuple[float, int, int]]] = {}
+        ride_labels: Dict[Tuple[int, int, int], List[Tuple[float, int, int]]] = {}
+
+        def dominated(popped, label) -> bool:
+            # Bị k nhãn lấn át: khởi hành không sớm hơn (fastest) hoặc không đắt hơn
+            # (cheapest), tới không muộn hơn, không nhiều chặng hơn
+            count = 0
+            for other in popped or ():
+                if other[0] <= label[0] and other[1] <= label[1] and other[2] <= label[2]:
+                    count += 1
+                    if count >= k:
+                        return True
+            return False
+
+        def make_key(stop, elapsed, cost, legs):
+            # A*: khóa = giá trị đã đi + cận dưới phần còn lại (cả tiêu chí phụ, rồi số
+            # chặng để xếp các hành trình hòa nhau), nên hành trình tới đích được lấy ra đúng thứ tự
+            duration = elapsed + remaining_time[stop]
+            estimated_cost = cost + remaining_cost[stop]
+            return (duration, estimated_cost, legs) if fastest else (estimated_cost, duration, legs)
+
+        def push(state, arrival, first_departure, cost, legs, cities):
+            nonlocal counter
+            t, _, j, run = legs[-1]
+            stop = trips[t].stops[j]
+            if stop not in remaining_time or arrival - first_departure > self.max_duration:
+                return
+            label = (-first_departure if fastest else cost, arrival, len(legs))
+            if dominated(ride_labels.get((t, run, j)) if state == RIDE else stop_labels.get(stop), label):
+                return
+            counter += 1
+            heapq.heappush(heap, (make_key(stop, arrival - first_departure, cost, len(legs)), counter, state,
+                                  arrival, first_departure, cost, legs, cities, label))
+
+        def scan(stop, position, end, first_departure, cost, legs, cities):
+            # Lượt lên tàu tiếp theo tại `stop` chỉ được tạo khi tới lượt: khóa của nó không
+            # nhỏ hơn (giờ khởi hành - first_departure) + cận dưới từ `stop`
+            nonlocal counter
+            departure = self._boarding_at(stop, position)[0]
+            if departure > end:
+                return
+            elapsed = 0 if first_departure is None else departure - first_departure
+            counter += 1
+            heapq.heappush(heap, (make_key(stop, elapsed, cost, len(legs) + 1), counter, SCAN,
+                                  departure, first_departure, cost, legs, cities, (stop, position, end)))
+
+        def board(stop, position, first_departure, cost, legs, cities):
+            departure, t, j = self._boarding_at(stop, position)
+            trip = trips[t]
+            if (legs and legs[-1][0] == t) or j + 1 == len(trip.stops) or (modes and trip.mode not in modes):
+                return
+            # Lên chuyến t tại vị trí j rồi đi ngay một chặng; legs: (chuyến, vị trí lên, vị trí hiện tại, ngày chạy)
+            run = departure - trip.departures[j]
+            start = departure if first_departure is None else first_departure
+            push(RIDE, run + trip.arrivals[j + 1], start, cost + trip.fare(j, j + 1),
+                 legs + ((t, j, j + 1, run),), cities)
+
+        def start_scan(stop, start, end, first_departure, cost, legs, cities):
+            if stop not in remaining_time or stop not in self._departures:
+                return
+            position = self._first_boarding(stop, start)
+            if fastest:
+                scan(stop, position, end, first_departure, cost, legs, cities)
+                return
+            # cheapest: chờ lâu không làm khóa tăng nên tạo lượt lên tàu lazy không lợi gì
+            while self._boarding_at(stop, position)[0] <= end:
+                board(stop, position, first_departure, cost, legs, cities)
+                position += 1
+
+        origin_city = self._stop_city[origins[0]]
+        for stop in origins:
+            start_scan(stop, _parse_clock(earliest_departure), _parse_clock(latest_departure), None, 0, (), (origin_city,))
+
+        results, seen = [], set()
+        expansions, deadline = 0, time.perf_counter() + self.search_budget
+        while heap and len(results) < k:
+            expansions += 1
+            # Chỉ xem đồng hồ mỗi 1024 nhãn để vòng lặp nóng không tốn thêm
+            if expansions > self.max_expansions or (expansions % 1024 == 0 and time.perf_counter() > deadline):
+                self.budget_exhausted += 1
+                break
+            _, _, state, arrival, first_departure, cost, legs, cities, extra = heapq.heappop(heap)
+
+            if state == SCAN:
+                stop, position, end = extra
+                scan(stop, position + 1, end, first_departure, cost, legs, cities)
+                board(stop, position, first_departure, cost, legs, cities)
+                continue
+
+            t, boarded, j, run = legs[-1]
+            trip = trips[t]
+            stop = trip.stops[j]
+            label = extra
+
+            if state == RIDE:
+                popped = ride_labels.setdefault((t, run, j), [])
+                if dominated(popped, label):
+                    continue
+                popped.append(label)
+                if stop in targets:
+                    # Cùng dãy chuyến nhưng đổi tàu ở ga khác chỉ giữ phương án tốt nhất
+                    trip_ids = tuple(trips[leg[0]].id for leg in legs)
+                    if trip_ids not in seen:
+                        seen.add(trip_ids)
+                        results.append(self._itinerary(legs, arrival, cost))
+                    continue
+                # Đi tiếp trên cùng chuyến: giá tính lại theo cả đoạn vì fare làm tròn theo đoạn
+                if j + 1 < len(trip.stops):
+                    fare = trip.fare(boarded, j + 1) - trip.fare(boarded, j)
+                    push(RIDE, run + trip.arrivals[j + 1], first_departure, cost + fare,
+                         legs[:-1] + ((t, boarded, j + 1, run),), cities)
+                # Xuống để đổi chuyến
+                if len(legs) <= max_transfers and trip.cities[j] not in cities:
+                    push(STOP, arrival, first_departure, cost, legs, cities + (trip.cities[j],))
+                continue
+
+            popped = stop_labels.setdefault(stop, [])
+            if dominated(popped, label):
+                continue
+            popped.append(label)
+            latest = min(arrival + self.max_wait, first_departure + self.max_duration)
+            for next_stop in self._city_stops[cities[-1]]:
+                transfer = (self.stops[stop].get("min_transfer_minutes", 20) if next_stop == stop
+                            else self.city_transfer)
+                start_scan(next_stop, arrival + transfer, latest, first_departure, cost, legs, cities)
+        return results
+
+    async def plan_async(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        """plan() chạy trong thread pool: truy vấn lớn không chặn event loop"""
+        return await asyncio.to_thread(self.plan, *args, **kwargs)
+
+    def _itinerary(self, legs, arrival: int, cost: float) -> Dict[str, Any]:
+        details = []
+        for t, boarded, alighted, run in legs:
+            trip = self.trips[t]
+            details.append({
+                "trip_id": trip.id,
+                "mode": trip.mode,
+                "operator": trip.operator,
+                "class": trip.seat_class,
+                "origin": trip.stops[boarded],
+                "destination": trip.stops[alighted],
+                "departure": run + trip.departures[boarded],
+                "arrival": run + trip.arrivals[alighted],
+                "price": trip.fare(boarded, alighted)
+            })
+        modes = {leg["mode"] for leg in details}
+        first_departure = details[0]["departure"]
+        return {
+            "id": "+".join(leg["trip_id"] for leg in details),
+            "mode": modes.pop() if len(modes) == 1 else "mixed",
+            "origin": details[0]["origin"],
+            "destination": details[-1]["destination"],
+            "departure": first_departure,
+            "arrival": arrival,
+            "duration_minutes": arrival - first_departure,
+            "price": cost,
+            "transfers": len(details) - 1,
+            "legs": details
+        }
+
+    def describe(self, itinerary: Dict[str, Any], travel_date: date) -> Dict[str, Any]:
+        """Đổi phút tương đối sang datetime ISO và mã điểm dừng sang tên"""
+        base = datetime.combine(travel_date, datetime.min.time())
+        at = lambda minutes: (base + timedelta(minutes=minutes)).isoformat(timespec="minutes")
+        name = lambda stop: self.stops[stop]["name"]
+        return {
+            **itinerary,
+            "origin": name(itinerary["origin"]),
+            "destination": name(itinerary["destination"]),
+            "departure": at(itinerary["departure"]),
+            "arrival": at(itinerary["arrival"]),
+            "duration": _format_duration(itinerary["duration_minutes"]),
+            "legs": [
+                {**leg, "origin": name(leg["origin"]), "destination": name(leg["destination"]),
+                 "departure": at(leg["departure"]), "arrival": at(leg["arrival"])}
+                for leg in itinerary["legs"]
+            ]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.is_loaded,
+            "stops": len(self.stops),
+            "trips": len(self.trips),
+            "legs": self.hops,
+            "max_transfers": self.max_transfers,
+            "max_wait_minutes": self.max_wait,
+            "max_expansions": self.max_expansions,
+            "search_budget_ms": self.search_budget * 1000,
+            "budget_exhausted": self.budget_exhausted
+        }
+
+
+def _clock_with_day(minutes: int) -> str:
+    """'06:00+1' cho giờ tới sau ngày khởi hành, như format của các offer khác"""
+    day, minute = divmod(minutes, MINUTES_PER_DAY)
+    clock = f"{minute // 60:02d}:{minute % 60:02d}"
+    return f"{clock}+{day}" if day else clock
+
+
+class TimetableProvider(BookingProvider):
+    """Provider chuyến bay/tàu (kể cả hành trình nối chuyến) từ thời gian biểu local"""
+
+    name = "timetable"
+    kinds = {"flights", "trains"}
+    _modes = {"flights": "flight", "trains": "train"}
+
+    def __init__(self, planner: RoutePlanner, k: Optional[int] = None):
+        self.planner = planner
+        self.k = k or int(os.getenv("ROUTE_OFFERS_PER_SEARCH", 5))
+
+    async def search(self, kind: str, request) -> List[Dict[str, Any]]:
+        if not self.planner.is_loaded:
+            return []
+        itineraries = await self.planner.plan_async(request.origin, request.destination, modes={self._modes[kind]}, k=self.k)
+        offers = []
+        for itinerary in itineraries:
+            operators = " + ".join(dict.fromkeys(leg["operator"] for leg in itinerary["legs"]))
+            offer = {
+                "id": itinerary["id"],
+                "origin": request.origin,
+                "destination": request.destination,
+                "departure_time": _clock_with_day(itinerary["departure"]),
+                "arrival_time": _clock_with_day(itinerary["arrival"]),
+                "price": itinerary["price"],
+                "duration": _format_duration(itinerary["duration_minutes"]),
+                "transfers": itinerary["transfers"],
+                "legs": self.planner.describe(itinerary, date.fromisoformat(request.departure_date))["legs"],
+                "provider": self.name
+            }
+            if kind == "flights":
+                offer.update({"airline": operators, "class": getattr(request, "class_type", None)})
+            else:
+                offer.update({"name": operators, "class": itinerary["legs"][0]["class"]})
+            offers.append(offer)
+        return offers
+
+# Global instance
+route_planner = RoutePlanner()
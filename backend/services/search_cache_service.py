@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Type
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from config.redis_client import redis_client
+from services.request_coalescer import RequestCoalescer
+
+load_dotenv()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SearchFetcher = Callable[[BaseModel], Awaitable[Dict[str, Any]]]
+
+
+def _canonical_text(value: str) -> str:
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", value).casefold()).strip()
+
+
+def canonicalize_request(request: BaseModel) -> Dict[str, Any]:
+    """Chuẩn hóa request tìm kiếm: 'Hà Nội ' và 'hà nội' cho cùng một cache key.
+
+    List chuỗi (vd. amenities) được coi như tập hợp: bỏ trùng và sắp xếp.
+    """
+    params = {}
+    for field, value in request.model_dump().items():
+        if isinstance(value, str):
+            value = _canonical_text(value)
+        elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+            value = sorted({_canonical_text(item) for item in value})
+        params[field] = value
+    return params
+
+
+class SearchCacheService:
+    """Cache kết quả tìm kiếm chuyến bay/khách sạn/tàu theo request đã chuẩn hóa.
+
+    Tầng lưu trữ: LRU trong process -> Redis. Mỗi provider có TTL riêng. Entry
+    quá TTL nhưng còn trong cửa sổ stale được refresh ngay; nếu provider trả lời
+    chậm hơn SEARCH_PROVIDER_SOFT_TIMEOUT thì trả về kết quả cũ (kèm tuổi của
+    entry) trong khi refresh tiếp tục ở background. Các route được tìm nhiều
+    nhất được refresh trước khi hết hạn bởi run_refresh_loop. Kết quả thiếu
+    (fan-out có provider quá deadline) được cache với SEARCH_CACHE_PARTIAL_TTL ngắn.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("SEARCH_CACHE_ENABLED", "True").lower() == "true"
+        self.ttls = {
+            "flights": int(os.getenv("SEARCH_CACHE_FLIGHTS_TTL", 300)),
+            "hotels": int(os.getenv("SEARCH_CACHE_HOTELS_TTL", 900)),
+            "trains": int(os.getenv("SEARCH_CACHE_TRAINS_TTL", 1800))
+        }
+        self.default_ttl = int(os.getenv("SEARCH_CACHE_DEFAULT_TTL", 300))
+        # Kết quả thiếu (có provider quá deadline) chỉ được cache ngắn
+        self.partial_ttl = int(os.getenv("SEARCH_CACHE_PARTIAL_TTL", 30))
+        self.stale_window = int(os.getenv("SEARCH_CACHE_STALE_SECONDS", 3600))
+        self.provider_soft_timeout = float(os.getenv("SEARCH_PROVIDER_SOFT_TIMEOUT", 2.0))
+        self.lru_size = int(os.getenv("SEARCH_CACHE_LRU_SIZE", 2048))
+        self.refresh_interval = int(os.getenv("SEARCH_CACHE_REFRESH_INTERVAL", 60))
+        self.popular_routes = int(os.getenv("SEARCH_CACHE_POPULAR_ROUTES", 50))
+        # Refresh route phổ biến khi entry đã dùng hết tỉ lệ này của TTL
+        self.refresh_ahead = float(os.getenv("SEARCH_CACHE_REFRESH_AHEAD", 0.8))
+        self.redis_prefix = "booking:search_cache"
+        self._lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._providers: Dict[str, Any] = {}
+        self._popularity: Counter = Counter()
+        self._background_tasks = set()
+        self.coalescer = RequestCoalescer()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "provider_errors": 0
+        }
+
+    def register_provider(self, provider: str, model: Type[BaseModel], fetcher: SearchFetcher):
+        """Đăng ký hàm gọi provider để refresh được entry ở background"""
+        self._providers[provider] = (model, fetcher)
+
+    def ttl_for(self, provider: str) -> int:
+        return self.ttls.get(provider, self.default_ttl)
+
+    def _entry_ttl(self, entry: Dict[str, Any]) -> int:
+        return self.partial_ttl if entry["data"].get("partial") else self.ttl_for(entry["provider"])
+
+    @staticmethod
+    def make_key(provider: str, request: BaseModel) -> str:
+        canonical = json.dumps(canonicalize_request(request), sort_keys=True, ensure_ascii=False)
+        return f"{provider}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+    async def search(self, provider: str, request: BaseModel) -> Dict[str, Any]:
+        """Trả về {"data", "cache": HIT|MISS|STALE|BYPASS, "age": giây}"""
+        _, fetcher = self._providers[provider]
+        if not self.enabled:
+            return {"data": await fetcher(request), "cache": "BYPASS", "age": 0}
+
+        key = self.make_key(provider, request)
+        self._popularity[key] += 1
+
+        entry = await self._lookup(key)
+        if entry is not None:
+            ttl = self._entry_ttl(entry)
+            age = time.time() - entry["fetched_at"]
+            if age < ttl:
+                self.stats["hits"] += 1
+                return {"data": entry["data"], "cache": "HIT", "age": int(age)}
+            if age < ttl + self.stale_window:
+                refresh = self._refresh(key, provider, request)
+                try:
+                    data = await asyncio.wait_for(asyncio.shield(refresh), timeout=self.provider_soft_timeout)
+                    # Kết quả mới thiếu vẫn tốt hơn kết quả cũ cũng thiếu
+                    if "error" not in data and (not data.get("partial") or entry["data"].get("partial")):
+                        return {"data": data, "cache": "MISS", "age": 0}
+                except asyncio.TimeoutError:
+                    pass
+                except Exception as e:
+                    print(f"⚠️ Search provider {provider} failed, serving stale results: {e}")
+                # Provider chậm, lỗi hoặc thiếu kết quả: trả kết quả cũ, refresh vẫn chạy tiếp
+                self.stats["stale_served"] += 1
+                return {"data": entry["data"], "cache": "STALE", "age": int(age)}
+
+        self.stats["misses"] += 1
+        data = await self._refresh(key, provider, request)
+        return {"data": data, "cache": "MISS", "age": 0}
+
+    def _refresh(self, key: str, provider: str, request: BaseModel) -> "asyncio.Future":
+        """Gọi provider (gộp các lần gọi cùng key), chạy độc lập với request đang chờ"""
+        task = asyncio.ensure_future(self.coalescer.run(key, lambda: self._fetch_and_store(key, provider, request)))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_refresh_done)
+        return task
+
+    def _on_refresh_done(self, task: "asyncio.Future"):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["provider_errors"] += 1
+
+    async def _fetch_and_store(self, key: str, provider: str, request: BaseModel) -> Dict[str, Any]:
+        _, fetcher = self._providers[provider]
+        self.stats["refreshes"] += 1
+        data = await fetcher(request)
+        # Không cache lỗi
+        if "error" in data:
+            self.stats["provider_errors"] += 1
+            return data
+        entry = {
+            "data": data,
+            "fetched_at": time.time(),
+            "provider": provider,
+            "request": request.model_dump()
+        }
+        self._lru_set(key, entry)
+        await self._redis_set(key, entry, self._entry_ttl(entry) + self.stale_window)
+        return data
+
+    async def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+            return entry
+        entry = await self._redis_get(key)
+        if entry is not None:
+            self._lru_set(key, entry)
+        return entry
+
+    def _lru_set(self, key: str, entry: Dict[str, Any]):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def _redis_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await redis_client.get(f"{self.redis_prefix}:{key}")
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            print(f"⚠️ Search cache Redis read failed: {e}")
+            return None
+
+    async def _redis_set(self, key: str, entry: Dict[str, Any], expire: int):
+        try:
+            await redis_client.set(f"{self.redis_prefix}:{key}", json.dumps(entry, ensure_ascii=False), ex=expire)
+        except Exception as e:
+            print(f"⚠️ Search cache Redis write failed: {e}")
+
+    async def refresh_popular(self) -> int:
+        """Refresh các route được tìm nhiều nhất sắp hết TTL, trả về số route đã refresh"""
+        refreshed = []
+        for key, _ in self._popularity.most_common(self.popular_routes):
+            entry = await self._lookup(key)
+            if entry is None or entry.get("provider") not in self._providers:
+                continue
+            provider = entry["provider"]
+            if time.time() - entry["fetched_at"] < self._entry_ttl(entry) * self.refresh_ahead:
+                continue
+            model, _ = self._providers[provider]
+            refreshed.append(self._refresh(key, provider, model(**entry["request"])))
+        if refreshed:
+            await asyncio.gather(*refreshed, return_exceptions=True)
+            self.stats["background_refreshes"] += len(refreshed)
+
+        # Giảm dần độ phổ biến để route cũ rời khỏi top
+        for key in list(self._popularity):
+            self._popularity[key] //= 2
+            if not self._popularity[key]:
+                del self._popularity[key]
+        return len(refreshed)
+
+    async def run_refresh_loop(self):
+        """Job định kỳ refresh các route phổ biến (chạy trong lifespan)"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                refreshed = await self.refresh_popular()
+                if refreshed:
+                    print(f"🔄 Refreshed {refreshed} popular search routes")
+            except Exception as e:
+                print(f"❌ Search cache refresh failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "memory_entries": len(self._lru),
+            "tracked_routes": len(self._popularity),
+            "ttls": self.ttls,
+            "partial_ttl": self.partial_ttl,
+            "stale_window": self.stale_window
+        }
+
+# Global instance
+search_cache_service = SearchCacheService()
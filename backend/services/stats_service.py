@@ -0,0 +1,238 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import select, delete, func, or_, and_, text, literal_column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import AsyncSessionLocal, engine
+from models.models import User, Booking, ChatSession, StatCounter
+
+load_dotenv()
+
+TOTAL = "total"
+DAILY_BOOKINGS = "bookings_daily"  # dimension = booking_type, amount = doanh thu
+HOURLY_CHAT_SESSIONS = "chat_sessions_hourly"
+TOTAL_METRICS = ("users", "active_users", "bookings", "chat_sessions")
+RECONCILE_INSERT_BATCH = 1000  # 5 tham số mỗi row, dưới giới hạn biến của SQLite
+
+def _day_bucket(at: datetime) -> str:
+    return at.strftime("%Y-%m-%d")
+
+def _hour_bucket(at: datetime) -> str:
+    return at.strftime("%Y-%m-%dT%H")
+
+def _bucket_expr(column, hourly: bool):
+    """Bucket theo giờ UTC tính trong SQL, cùng định dạng với _day_bucket/_hour_bucket
+    (định dạng là literal để biểu thức trong SELECT và GROUP BY giống hệt nhau)"""
+    if engine.dialect.name == "postgresql":
+        pattern = """'YYYY-MM-DD"T"HH24'""" if hourly else "'YYYY-MM-DD'"
+        return func.to_char(func.timezone(literal_column("'UTC'"), column), literal_column(pattern))
+    return func.strftime(literal_column("'%Y-%m-%dT%H'" if hourly else "'%Y-%m-%d'"), column)
+
+class StatsService:
+    """Thống kê admin đọc từ bảng stat_counters thay vì COUNT(*) trên bảng gốc.
+
+    Các route ghi (đăng ký, khóa/mở user, tạo booking, tạo/xóa chat session) cộng dồn
+    counter bằng upsert trong cùng transaction với thay đổi gốc. Series theo
+    ngày/giờ là các bucket rollup trong cùng bảng, nên dashboard chỉ cần một
+    query nhỏ trên unique index. Job reconcile định kỳ tính lại từ bảng gốc
+    (tổng và các bucket gần đây) để sửa drift.
+    """
+
+    def __init__(self):
+        self.reconcile_interval = int(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", 900))
+        self.reconcile_window_days = int(os.getenv("STATS_RECONCILE_WINDOW_DAYS", 2))
+        self.max_series_days = int(os.getenv("STATS_SERIES_MAX_DAYS", 366))
+        self.stats = {
+            "increments": 0,
+            "reconciliations": 0,
+            "last_drift": 0,
+            "total_drift": 0,
+            "last_reconciled_at": None
+        }
+
+    @staticmethod
+    def _insert():
+        return (postgresql if engine.dialect.name == "postgresql" else sqlite).insert(StatCounter)
+
+    async def _increment(self, db: AsyncSession, rows: List[Tuple[str, str, str, int, float]]):
+        """Upsert cộng dồn (metric, bucket, dimension, count, amount) trong transaction của caller"""
+        stmt = self._insert().values([
+            {"metric": metric, "bucket": bucket, "dimension": dimension, "count": count, "amount": amount}
+            for metric, bucket, dimension, count, amount in rows
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["metric", "bucket", "dimension"],
+            set_={
+                "count": StatCounter.count + stmt.excluded.count,
+                "amount": StatCounter.amount + stmt.excluded.amount,
+                "updated_at": func.now()
+            }
+        )
+        await db.execute(stmt)
+        self.stats["increments"] += 1
+
+    async def record_user(self, db: AsyncSession, active: bool = True):
+        await self._increment(db, [("users", TOTAL, "", 1, 0), ("active_users", TOTAL, "", int(active), 0)])
+
+    async def record_user_active_changed(self, db: AsyncSession, active: bool):
+        await self._increment(db, [("active_users", TOTAL, "", 1 if active else -1, 0)])
+
+    async def record_booking(self, db: AsyncSession, booking_type: Optional[str], amount: float,
+                             at: Optional[datetime] = None):
+        at = at or datetime.utcnow()
+        await self._increment(db, [
+            ("bookings", TOTAL, "", 1, 0),
+            (DAILY_BOOKINGS, _day_bucket(at), booking_type or "", 1, float(amount or 0))
+        ])
+
+    async def record_chat_session(self, db: AsyncSession, at: Optional[datetime] = None):
+        at = at or datetime.utcnow()
+        await self._increment(db, [("chat_sessions", TOTAL, "", 1, 0), (HOURLY_CHAT_SESSIONS, _hour_bucket(at), "", 1, 0)])
+
+    async def record_chat_session_deleted(self, db: AsyncSession, created_at: Optional[datetime] = None):
+        """Trừ tổng và bucket giờ tạo của session, để series theo giờ khớp với
+        reconcile (đếm lại từ các session còn tồn tại)"""
+        rows = [("chat_sessions", TOTAL, "", -1, 0)]
+        if created_at is not None:
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone(timezone.utc)
+            rows.append((HOURLY_CHAT_SESSIONS, _hour_bucket(created_at), "", -1, 0))
+        await self._increment(db, rows)
+
+    async def snapshot(self, db: AsyncSession, days: int = 30, hours: int = 48) -> Dict[str, Any]:
+        """Tổng + series bookings/doanh thu theo ngày (days ngày gần nhất) và chat
+        session theo giờ (hours giờ gần nhất), một query, bucket trống điền 0"""
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        day_keys = [_day_bucket(now - timedelta(days=i)) for i in range(days - 1, -1, -1)]
+        hour_keys = [_hour_bucket(now - timedelta(hours=i)) for i in range(hours - 1, -1, -1)]
+        rows = (await db.execute(select(
+            StatCounter.metric, StatCounter.bucket, StatCounter.dimension, StatCounter.count, StatCounter.amount
+        ).where(or_(
+            and_(StatCounter.metric.in_(TOTAL_METRICS), StatCounter.bucket == TOTAL),
+            and_(StatCounter.metric == DAILY_BOOKINGS, StatCounter.bucket >= day_keys[0]),
+            and_(StatCounter.metric == HOURLY_CHAT_SESSIONS, StatCounter.bucket >= hour_keys[0])
+        )))).all()
+
+        totals = dict.fromkeys(TOTAL_METRICS, 0)
+        bookings = {key: {} for key in day_keys}
+        revenue = dict.fromkeys(day_keys, 0.0)
+        sessions = dict.fromkeys(hour_keys, 0)
+        for metric, bucket, dimension, count, amount in rows:
+            if bucket == TOTAL:
+                totals[metric] = count
+            elif metric == DAILY_BOOKINGS and bucket in bookings:
+                bookings[bucket][dimension or "unknown"] = count
+                revenue[bucket] += amount
+            elif metric == HOURLY_CHAT_SESSIONS and bucket in sessions:
+                sessions[bucket] = count
+        return {
+            "total_users": totals["users"],
+            "active_users": totals["active_users"],
+            "total_bookings": totals["bookings"],
+            "total_chat_sessions": totals["chat_sessions"],
+            "bookings_per_day": [{"date": day, "by_type": by_type, "total": sum(by_type.values())}
+                                 for day, by_type in bookings.items()],
+            "revenue_per_day": [{"date": day, "revenue": amount} for day, amount in revenue.items()],
+            "chat_sessions_per_hour": [{"hour": hour, "sessions": count} for hour, count in sessions.items()],
+            "reconciled_at": self.stats["last_reconciled_at"]
+        }
+
+    async def reconcile(self, days: Optional[int] = None) -> int:
+        """Tính lại các tổng và các bucket từ `days` ngày trước (None: toàn bộ lịch
+        sử) từ bảng gốc. Trả về drift: tổng chênh lệch count đã sửa"""
+        since = None
+        if days is not None:
+            since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+        window = [and_(StatCounter.metric.in_(TOTAL_METRICS), StatCounter.bucket == TOTAL)]
+        if since is None:
+            window += [StatCounter.metric.in_((DAILY_BOOKINGS, HOURLY_CHAT_SESSIONS))]
+        else:
+            window += [
+                and_(StatCounter.metric == DAILY_BOOKINGS, StatCounter.bucket >= _day_bucket(since)),
+                and_(StatCounter.metric == HOURLY_CHAT_SESSIONS, StatCounter.bucket >= _hour_bucket(since))
+            ]
+
+        async with AsyncSessionLocal() as db:
+            if engine.dialect.name == "postgresql":
+                await db.execute(text("LOCK TABLE stat_counters IN EXCLUSIVE MODE"))
+            # Xóa trước khi đếm: lấy write lock ngay (SQLite) nên các increment đồng
+            # thời phải chờ tới khi ghi xong, không bị mất giữa lúc đếm và lúc ghi
+            previous = (await db.execute(delete(StatCounter).where(or_(*window)).returning(
+                StatCounter.metric, StatCounter.bucket, StatCounter.dimension, StatCounter.count
+            ))).all()
+
+            totals = (await db.execute(select(
+                select(func.count()).select_from(User).scalar_subquery(),
+                select(func.count()).select_from(User).where(User.is_active == True).scalar_subquery(),
+                select(func.count()).select_from(Booking).scalar_subquery(),
+                select(func.count()).select_from(ChatSession).scalar_subquery()
+            ))).one()
+            rows = [(metric, TOTAL, "", count, 0.0) for metric, count in zip(TOTAL_METRICS, totals)]
+
+            day = _bucket_expr(Booking.created_at, hourly=False)
+            query = select(day, Booking.booking_type, func.count(), func.sum(Booking.total_amount))
+            if since is not None:
+                query = query.where(Booking.created_at >= since)
+            rows += [(DAILY_BOOKINGS, bucket, booking_type or "", count, float(amount or 0))
+                     for bucket, booking_type, count, amount in (await db.execute(
+                         query.group_by(day, Booking.booking_type))).all()]
+
+            hour = _bucket_expr(ChatSession.created_at, hourly=True)
+            query = select(hour, func.count())
+            if since is not None:
+                query = query.where(ChatSession.created_at >= since)
+            rows += [(HOURLY_CHAT_SESSIONS, bucket, "", count, 0.0)
+                     for bucket, count in (await db.execute(query.group_by(hour))).all()]
+
+            # Gộp các key trùng (booking_type NULL và "") trước khi upsert
+            after: Dict[Tuple[str, str, str], List[float]] = {}
+            for metric, bucket, dimension, count, amount in rows:
+                if bucket is not None:
+                    entry = after.setdefault((metric, bucket, dimension), [0, 0.0])
+                    entry[0] += count
+                    entry[1] += amount
+            merged = [(*key, count, amount) for key, (count, amount) in after.items()]
+            for start in range(0, len(merged), RECONCILE_INSERT_BATCH):
+                await self._increment(db, merged[start:start + RECONCILE_INSERT_BATCH])
+            await db.commit()
+
+        before = {(metric, bucket, dimension): count for metric, bucket, dimension, count in previous}
+        after = {key: count for key, (count, _) in after.items()}
+        drift = sum(abs(after.get(key, 0) - before.get(key, 0)) for key in before.keys() | after.keys())
+        self.stats["reconciliations"] += 1
+        self.stats["last_drift"] = drift
+        self.stats["total_drift"] += drift
+        self.stats["last_reconciled_at"] = datetime.utcnow().isoformat()
+        return drift
+
+    async def needs_bootstrap(self) -> bool:
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(func.count()).select_from(StatCounter).where(StatCounter.bucket == TOTAL)) == 0
+
+    async def run_reconcile_loop(self):
+        """Job định kỳ reconcile counter (chạy trong lifespan); lần đầu tính lại toàn
+        bộ nếu bảng counter còn trống"""
+        full = True
+        while True:
+            try:
+                if full and await self.needs_bootstrap():
+                    await self.reconcile()
+                    print("📊 Stats counters bootstrapped from source tables")
+                else:
+                    drift = await self.reconcile(self.reconcile_window_days)
+                    if drift:
+                        print(f"📊 Stats reconcile corrected drift of {drift}")
+                full = False
+            except Exception as e:
+                print(f"❌ Stats reconcile failed: {e}")
+            await asyncio.sleep(self.reconcile_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "reconcile_interval": self.reconcile_interval}
+
+# Global instance
+stats_service = StatsService()
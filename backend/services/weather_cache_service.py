@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Awaitable
+from dotenv import load_dotenv
+from sqlalchemy import select, update, delete
+
+from config.database import AsyncSessionLocal
+from config.redis_client import redis_client
+from models.models import WeatherCache
+from services.request_coalescer import RequestCoalescer
+
+load_dotenv()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_location(location: str) -> str:
+    """'  Hà  Nội, ' và 'hà nội' dùng chung một cache key"""
+    text = unicodedata.normalize("NFC", location).casefold()
+    text = _WHITESPACE_RE.sub(" ", text).strip(" ,.")
+    return text
+
+
+class WeatherCacheService:
+    """Read-through cache nhiều tầng cho dữ liệu thời tiết.
+
+    Thứ tự tra cứu: LRU trong process -> Redis -> bảng weather_cache -> upstream.
+    Mỗi entry lưu thời điểm fetch; entry còn trong TTL được trả về ngay, entry
+    đã quá TTL nhưng còn trong cửa sổ stale cũng được trả về ngay đồng thời
+    refresh ở background (stale-while-revalidate). Các lần refresh cùng key
+    được gộp bằng RequestCoalescer.
+    """
+
+    def __init__(self):
+        self.current_ttl = int(os.getenv("WEATHER_CACHE_CURRENT_TTL", 600))
+        self.forecast_ttl = int(os.getenv("WEATHER_CACHE_FORECAST_TTL", 3600))
+        self.stale_window = int(os.getenv("WEATHER_CACHE_STALE_SECONDS", 3600))
+        self.lru_size = int(os.getenv("WEATHER_CACHE_LRU_SIZE", 1024))
+        self.purge_interval = int(os.getenv("WEATHER_CACHE_PURGE_INTERVAL", 3600))
+        self.redis_prefix = "weather:cache"
+        self._lru: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._background_tasks = set()
+        self.coalescer = RequestCoalescer()
+        self.stats = {
+            "memory_hits": 0,
+            "redis_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stale_served": 0,
+            "upstream_fetches": 0
+        }
+
+    @staticmethod
+    def make_key(kind: str, location: str, days: Optional[int] = None) -> str:
+        key = f"{kind}:{normalize_location(location)}"
+        return f"{key}:{days}" if days is not None else key
+
+    async def get_or_fetch(self, key: str, ttl: int, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        entry = await self.lookup(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < ttl:
+                return entry["data"]
+            if age < ttl + self.stale_window:
+                self.stats["stale_served"] += 1
+                self._schedule_refresh(key, ttl, fetcher)
+                return entry["data"]
+
+        self.stats["misses"] += 1
+        return await self.coalescer.run(key, lambda: self._fetch_and_store(key, ttl, fetcher))
+
+    async def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Tra cứu qua các tầng cache (không gọi upstream), promote entry lên tầng trên"""
+        entry = self._lru_get(key)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+            return entry
+
+        entry = await self._redis_get(key)
+        if entry is not None:
+            self.stats["redis_hits"] += 1
+            self._lru_set(key, entry)
+            return entry
+
+        entry = await self._db_get(key)
+        if entry is not None:
+            self.stats["db_hits"] += 1
+            self._lru_set(key, entry)
+            await self._redis_set(key, entry)
+            return entry
+        return None
+
+    def _schedule_refresh(self, key: str, ttl: int, fetcher: Callable[[], Awaitable[Dict[str, Any]]]):
+        task = asyncio.ensure_future(self.coalescer.run(key, lambda: self._fetch_and_store(key, ttl, fetcher)))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _fetch_and_store(self, key: str, ttl: int, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self.stats["upstream_fetches"] += 1
+        data = await fetcher()
+        # Không cache lỗi
+        if "error" not in data:
+            entry = {"data": data, "fetched_at": time.time()}
+            self._lru_set(key, entry)
+            await self._redis_set(key, entry)
+            await self._db_set(key, entry, ttl)
+        return data
+
+    # In-process LRU
+    def _lru_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._lru.get(key)
+        if entry is not None:
+            self._lru.move_to_end(key)
+        return entry
+
+    def _lru_set(self, key: str, entry: Dict[str, Any]):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    # Redis
+    async def _redis_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await redis_client.get(f"{self.redis_prefix}:{key}")
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            print(f"⚠️ Weather cache Redis read failed: {e}")
+            return None
+
+    async def _redis_set(self, key: str, entry: Dict[str, Any]):
+        ttl = self._ttl_for(key) + self.stale_window
+        remaining = int(entry["fetched_at"] + ttl - time.time())
+        if remaining <= 0:
+            return
+        try:
+            await redis_client.set(f"{self.redis_prefix}:{key}", json.dumps(entry, ensure_ascii=False), ex=remaining)
+        except Exception as e:
+            print(f"⚠️ Weather cache Redis write failed: {e}")
+
+    # weather_cache table
+    async def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(WeatherCache.weather_data)
+                    .where(WeatherCache.location == key, WeatherCache.expires_at > datetime.utcnow())
+                    .order_by(WeatherCache.id.desc())
+                    .limit(1)
+                )
+                row = result.scalar_one_or_none()
+            return json.loads(row) if row else None
+        except Exception as e:
+            print(f"⚠️ Weather cache DB read failed: {e}")
+            return None
+
+    async def _db_set(self, key: str, entry: Dict[str, Any], ttl: int):
+        fetched_at = datetime.utcfromtimestamp(entry["fetched_at"])
+        values = {
+            "weather_data": json.dumps(entry, ensure_ascii=False),
+            "created_at": fetched_at,
+            "expires_at": fetched_at + timedelta(seconds=ttl + self.stale_window)
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(update(WeatherCache).where(WeatherCache.location == key).values(**values))
+                if result.rowcount == 0:
+                    db.add(WeatherCache(location=key, **values))
+                await db.commit()
+        except Exception as e:
+            print(f"⚠️ Weather cache DB write failed: {e}")
+
+    def _ttl_for(self, key: str) -> int:
+        return self.forecast_ttl if key.startswith("forecast:") else self.current_ttl
+
+    async def purge_expired(self) -> int:
+        """Xóa các row weather_cache đã hết hạn"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(WeatherCache).where(WeatherCache.expires_at <= datetime.utcnow()))
+            await db.commit()
+        return result.rowcount
+
+    async def run_purge_loop(self):
+        """Job định kỳ purge cache hết hạn (chạy trong lifespan)"""
+        while True:
+            try:
+                purged = await self.purge_expired()
+                if purged:
+                    print(f"🧹 Purged {purged} expired weather cache rows")
+            except Exception as e:
+                print(f"❌ Weather cache purge failed: {e}")
+            await asyncio.sleep(self.purge_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "memory_entries": len(self._lru),
+            "current_ttl": self.current_ttl,
+            "forecast_ttl": self.forecast_ttl,
+            "stale_window": self.stale_window
+        }
+
+# Global instance
+weather_cache_service = WeatherCacheService()
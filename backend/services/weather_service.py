@@ -1,19 +1,97 @@
 import httpx
 import json
 import os
+import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from dotenv import load_dotenv
 
+from config.http_client import create_async_client, get_pool_stats
+from services.forecast_aggregation import aggregate_daily, aggregate_daily_batch
+from services.weather_cache_service import weather_cache_service, normalize_location
+
 load_dotenv()
 
 class WeatherService:
     def __init__(self):
         self.api_key = os.getenv("WEATHER_API_KEY")
         self.base_url = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5")
-        
+        self.current_timeout = float(os.getenv("WEATHER_CURRENT_TIMEOUT", 5.0))
+        self.forecast_timeout = float(os.getenv("WEATHER_FORECAST_TIMEOUT", 8.0))
+        self.batch_concurrency = int(os.getenv("WEATHER_BATCH_CONCURRENCY", 5))
+        self.batch_max_locations = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", 30))
+        # Giới hạn số lần gọi upstream mỗi phút (gói free của OpenWeatherMap: 60/phút)
+        self.rate_limit_per_minute = int(os.getenv("WEATHER_RATE_LIMIT_PER_MINUTE", 60))
+        self.rate_limit_burst = max(1, int(os.getenv("WEATHER_RATE_LIMIT_BURST", 10)))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._rate_tokens = float(self.rate_limit_burst)
+        self._rate_updated_at = time.monotonic()
+        self._batch_semaphore: Optional[asyncio.Semaphore] = None
+    
+    async def startup(self):
+        """Tạo HTTP client dùng chung tới OpenWeatherMap (gọi trong lifespan của app)"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_async_client("WEATHER", timeout=10.0)
+    
+    async def shutdown(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        # Fallback khi service được dùng ngoài lifespan (scripts, tests)
+        if self._client is None or self._client.is_closed:
+            self._client = create_async_client("WEATHER", timeout=10.0)
+        return self._client
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return get_pool_stats(self._client)
+    
+    def _get_rate_lock(self) -> asyncio.Lock:
+        # Tạo lazily để lock gắn với event loop đang chạy
+        if self._rate_lock is None:
+            self._rate_lock = asyncio.Lock()
+        return self._rate_lock
+    
+    async def _wait_for_rate_limit(self):
+        """Token bucket: cho phép burst WEATHER_RATE_LIMIT_BURST lần gọi, sau đó
+        giới hạn ở WEATHER_RATE_LIMIT_PER_MINUTE"""
+        if self.rate_limit_per_minute <= 0:
+            return
+        rate = self.rate_limit_per_minute / 60.0
+        while True:
+            async with self._get_rate_lock():
+                now = time.monotonic()
+                self._rate_tokens = min(self.rate_limit_burst, self._rate_tokens + (now - self._rate_updated_at) * rate)
+                self._rate_updated_at = now
+                if self._rate_tokens >= 1:
+                    self._rate_tokens -= 1
+                    return
+                wait = (1 - self._rate_tokens) / rate
+            await asyncio.sleep(wait)
+    
     async def get_current_weather(self, location: str) -> Dict[str, Any]:
-        """Get current weather for a location"""
+        """Get current weather for a location (qua cache nhiều tầng)"""
+        if not self.api_key:
+            return {"error": "Weather API key not configured"}
+        key = weather_cache_service.make_key("current", location)
+        return await weather_cache_service.get_or_fetch(
+            key, weather_cache_service.current_ttl, lambda: self._fetch_current_weather(location)
+        )
+    
+    async def get_weather_forecast(self, location: str, days: int = 5) -> Dict[str, Any]:
+        """Get weather forecast for multiple days (qua cache nhiều tầng)"""
+        if not self.api_key:
+            return {"error": "Weather API key not configured"}
+        key = weather_cache_service.make_key("forecast", location, days)
+        return await weather_cache_service.get_or_fetch(
+            key, weather_cache_service.forecast_ttl, lambda: self._fetch_weather_forecast(location, days)
+        )
+        
+    async def _fetch_current_weather(self, location: str) -> Dict[str, Any]:
+        """Gọi OpenWeatherMap lấy thời tiết hiện tại"""
         if not self.api_key:
             return {"error": "Weather API key not configured"}
             
@@ -26,15 +104,18 @@ class WeatherService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            await self._wait_for_rate_limit()
+            client = self._get_client()
+            response = await client.get(url, params=params, timeout=self.current_timeout)
+            response.raise_for_status()
+            return response.json()
+        except httpx.TimeoutException:
+            return {"error": "Weather API timeout"}
         except Exception as e:
             return {"error": str(e)}
     
-    async def get_weather_forecast(self, location: str, days: int = 5) -> Dict[str, Any]:
-        """Get weather forecast for multiple days"""
+    async def _fetch_weather_forecast(self, location: str, days: int = 5) -> Dict[str, Any]:
+        """Gọi OpenWeatherMap lấy dự báo nhiều ngày"""
         if not self.api_key:
             return {"error": "Weather API key not configured"}
             
@@ -48,19 +129,131 @@ class WeatherService:
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            await self._wait_for_rate_limit()
+            client = self._get_client()
+            response = await client.get(url, params=params, timeout=self.forecast_timeout)
+            response.raise_for_status()
+            return response.json()
+        except httpx.TimeoutException:
+            return {"error": "Weather API timeout"}
         except Exception as e:
             return {"error": str(e)}
     
+    async def get_current_with_forecast(self, location: str, days: int = 5):
+        """Lấy thời tiết hiện tại và dự báo song song.
+        
+        Dự báo lỗi không làm hỏng cả request: trả về forecast rỗng.
+        """
+        current_data, forecast_data = await asyncio.gather(
+            self.get_current_weather(location),
+            self.get_weather_forecast(location, days)
+        )
+        if "error" in forecast_data:
+            print(f"⚠️ Forecast unavailable for {location}: {forecast_data['error']}")
+            forecast_data = {}
+        return current_data, forecast_data
+    
+    def _get_batch_semaphore(self) -> asyncio.Semaphore:
+        # Tạo lazily để semaphore gắn với event loop đang chạy
+        if self._batch_semaphore is None:
+            self._batch_semaphore = asyncio.Semaphore(self.batch_concurrency)
+        return self._batch_semaphore
+    
+    async def _lookup_cached(self, location: str, days: int) -> Optional[Tuple[dict, dict]]:
+        """Trả về (current, forecast) thô nếu cả hai đều còn trong TTL"""
+        current_entry = await weather_cache_service.lookup(weather_cache_service.make_key("current", location))
+        forecast_entry = await weather_cache_service.lookup(weather_cache_service.make_key("forecast", location, days))
+        now = time.time()
+        if (current_entry is None or forecast_entry is None
+                or now - current_entry["fetched_at"] >= weather_cache_service.current_ttl
+                or now - forecast_entry["fetched_at"] >= weather_cache_service.forecast_ttl):
+            return None
+        return current_entry["data"], forecast_entry["data"]
+    
+    async def _fetch_batch_item(self, location: str, days: int) -> Tuple[str, dict, dict]:
+        async with self._get_batch_semaphore():
+            try:
+                current_data, forecast_data = await self.get_current_with_forecast(location, days)
+            except Exception as e:
+                current_data, forecast_data = {"error": str(e)}, {}
+        return location, current_data, forecast_data
+    
+    @staticmethod
+    def dedupe_locations(locations: List[str]) -> List[str]:
+        """Bỏ trùng theo tên đã chuẩn hóa, giữ thứ tự và cách viết của lần xuất hiện đầu"""
+        seen = set()
+        unique = []
+        for location in locations:
+            key = normalize_location(location)
+            if key and key not in seen:
+                seen.add(key)
+                unique.append(location.strip())
+        return unique
+    
+    async def _iter_batch_raw(self, locations: List[str], days: int) -> AsyncIterator[Tuple[str, bool, dict, dict]]:
+        """Yield (location, cached, current, forecast) thô theo thứ tự hoàn thành.
+        
+        Cache hit được trả về trước; các địa điểm còn lại được fetch song song,
+        tối đa WEATHER_BATCH_CONCURRENCY địa điểm cùng lúc.
+        """
+        if not self.api_key:
+            for location in self.dedupe_locations(locations):
+                yield location, False, {"error": "Weather API key not configured"}, {}
+            return
+        
+        misses = []
+        for location in self.dedupe_locations(locations):
+            cached = await self._lookup_cached(location, days)
+            if cached is not None:
+                yield (location, True) + cached
+            else:
+                misses.append(location)
+        
+        tasks = [asyncio.ensure_future(self._fetch_batch_item(location, days)) for location in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                location, current_data, forecast_data = await next_done
+                yield location, False, current_data, forecast_data
+        finally:
+            # Client ngắt stream giữa chừng: hủy các fetch còn lại
+            for task in tasks:
+                task.cancel()
+    
+    def _batch_item(self, location: str, cached: bool, current_data: dict, forecast: List[dict]) -> Dict[str, Any]:
+        if "error" in current_data:
+            return {"location": location, "status": "error", "cached": cached, "error": current_data["error"]}
+        return {"location": location, "status": "ok", "cached": cached,
+                "data": self._build_weather_response(current_data, forecast)}
+    
+    async def iter_batch(self, locations: List[str], days: int = 5) -> AsyncIterator[Dict[str, Any]]:
+        """Thời tiết cho nhiều địa điểm, yield từng kết quả đã format ngay khi có"""
+        async for location, cached, current_data, forecast_data in self._iter_batch_raw(locations, days):
+            forecast = aggregate_daily(forecast_data) if "list" in forecast_data else []
+            yield self._batch_item(location, cached, current_data, forecast)
+    
+    async def get_batch(self, locations: List[str], days: int = 5) -> List[Dict[str, Any]]:
+        """Giống iter_batch nhưng trả về đủ kết quả theo thứ tự địa điểm đầu vào.
+        
+        Forecast của mọi địa điểm được gộp theo ngày trong một lượt vector hóa.
+        """
+        raw = {item[0]: item async for item in self._iter_batch_raw(locations, days)}
+        ordered = [raw[location] for location in self.dedupe_locations(locations)]
+        daily = aggregate_daily_batch([forecast_data for _, _, _, forecast_data in ordered])
+        return [
+            self._batch_item(location, cached, current_data, forecast)
+            for (location, cached, current_data, _), forecast in zip(ordered, daily)
+        ]
+    
     def format_weather_response(self, current_data: dict, forecast_data: dict) -> Dict[str, Any]:
         """Format weather data for frontend"""
-        if "error" in current_data or "error" in forecast_data:
+        if "error" in current_data:
             return {"error": "Không thể lấy dữ liệu thời tiết"}
         
-        # Format current weather
+        # Format forecast: gộp theo ngày địa phương của thành phố (Python thuần)
+        forecast = aggregate_daily(forecast_data) if "list" in forecast_data else []
+        return self._build_weather_response(current_data, forecast)
+    
+    def _build_weather_response(self, current_data: dict, forecast: List[dict]) -> Dict[str, Any]:
         current = {
             "temperature": current_data["main"]["temp"],
             "feels_like": current_data["main"]["feels_like"],
@@ -72,35 +265,6 @@ class WeatherService:
             "icon": current_data["weather"][0]["icon"]
         }
         
-        # Format forecast
-        forecast = []
-        if "list" in forecast_data:
-            daily_forecasts = {}
-            for item in forecast_data["list"]:
-                date = datetime.fromtimestamp(item["dt"]).date()
-                if date not in daily_forecasts:
-                    daily_forecasts[date] = {
-                        "date": date.isoformat(),
-                        "temp_min": item["main"]["temp_min"],
-                        "temp_max": item["main"]["temp_max"],
-                        "description": item["weather"][0]["description"],
-                        "icon": item["weather"][0]["icon"],
-                        "humidity": item["main"]["humidity"],
-                        "wind_speed": item["wind"]["speed"]
-                    }
-                else:
-                    # Update min/max temperatures
-                    daily_forecasts[date]["temp_min"] = min(
-                        daily_forecasts[date]["temp_min"], 
-                        item["main"]["temp_min"]
-                    )
-                    daily_forecasts[date]["temp_max"] = max(
-                        daily_forecasts[date]["temp_max"], 
-                        item["main"]["temp_max"]
-                    )
-            
-            forecast = list(daily_forecasts.values())[:5]  # Only return 5 days
-        
         return {
             "location": current_data["name"],
             "current": current,
@@ -0,0 +1,75 @@
+import asyncio
+import time
+import uuid
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import delete, select
+
+from auth.auth import (
+    UserCache, create_access_token, get_current_user, get_password_hash_async, user_cache, verify_password_async
+)
+from config.database import AsyncSessionLocal, Base, engine
+from models.models import User
+
+
+def test_user_cache_expires_and_invalidates():
+    cache = UserCache(ttl=0.05, max_size=10)
+    cache.set("alice", "user-a")
+    assert cache.get("alice") == "user-a"
+
+    cache.invalidate("alice")
+    assert cache.get("alice") is None
+
+    cache.set("bob", "user-b")
+    time.sleep(0.06)
+    assert cache.get("bob") is None
+
+
+def test_user_cache_is_size_bounded():
+    cache = UserCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_password_hashing_runs_off_loop():
+    async def scenario():
+        hashed = await get_password_hash_async("secret")
+        return await verify_password_async("secret", hashed), await verify_password_async("wrong", hashed)
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_cached_user_is_a_separate_instance_per_request():
+    Base.metadata.create_all(bind=engine)
+    name = f"cache-{uuid.uuid4().hex[:8]}"
+    token = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": name}))
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            db.add(User(email=f"{name}@example.com", username=name, hashed_password="x"))
+            await db.commit()
+        try:
+            async with AsyncSessionLocal() as db:
+                await get_current_user(token, db)  # miss: nạp vào cache
+            async with AsyncSessionLocal() as db_a, AsyncSessionLocal() as db_b:
+                user_a = await get_current_user(token, db_a)
+                user_b = await get_current_user(token, db_b)
+                user_a.is_active = False
+                await db_a.commit()
+            async with AsyncSessionLocal() as db:
+                stored = await db.scalar(select(User.is_active).where(User.username == name))
+            return user_a is not user_b, user_b.is_active, stored
+        finally:
+            user_cache.invalidate(name)
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(User).where(User.username == name))
+                await db.commit()
+
+    separate, other_active, stored = asyncio.run(scenario())
+    assert separate
+    # Sửa đổi của request A được ghi qua session của nó, không lọt sang instance của request B
+    assert stored is False and other_active is True
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy import select, delete
+
+from main import app
+from auth.auth import create_access_token
+from config.database import AsyncSessionLocal, Base, SessionLocal, engine
+from models.models import User, Booking
+from models.schemas import BookingResponse
+from services.booking_query_service import booking_query_service
+from scripts.migrate_booking_data import normalize
+
+
+def test_listing_matches_response_model_and_filters_on_generated_columns():
+    Base.metadata.create_all(bind=engine)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            name = f"listing-{uuid.uuid4().hex[:8]}"
+            user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+            db.add(user)
+            await db.commit()
+            db.add_all([
+                Booking(user_id=user.id, booking_type="flight", booking_reference=str(uuid.uuid4()),
+                        status="confirmed", total_amount=2500000,
+                        booking_data={"provider": "vietjet", "destination": "Đà Nẵng", "travel_date": "2025-03-01",
+                                      "passengers": [{"name": "Nguyễn Văn A"}]}),
+                Booking(user_id=user.id, booking_type="hotel", booking_reference=str(uuid.uuid4()),
+                        status="pending", total_amount=1200000,
+                        booking_data={"provider": "hotel_inventory", "destination": "Huế", "travel_date": "2025-04-10"})
+            ])
+            await db.commit()
+            rows = (await db.execute(select(Booking).where(Booking.user_id == user.id)
+                                     .order_by(Booking.created_at.desc(), Booking.id.desc()))).scalars().all()
+            expected = jsonable_encoder([BookingResponse.model_validate(row) for row in rows])
+            listed = json.loads(await booking_query_service.list_json(db, user_id=user.id))
+            by_provider = json.loads(await booking_query_service.list_json(
+                db, user_id=user.id, filters={"provider": "vietjet"}))
+            by_date = json.loads(await booking_query_service.list_json(
+                db, user_id=user.id, filters={"travel_date_from": "2025-04-01", "destination": "Huế"}))
+            await db.execute(delete(Booking).where(Booking.user_id == user.id))
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        return expected, listed, by_provider, by_date
+
+    expected, listed, by_provider, by_date = asyncio.run(scenario())
+    assert listed == expected
+    assert listed[0]["booking_data"]["destination"] in ("Đà Nẵng", "Huế")
+    assert [b["booking_data"]["destination"] for b in by_provider] == ["Đà Nẵng"]
+    assert [b["booking_type"] for b in by_date] == ["hotel"]
+
+
+def test_migration_normalizes_legacy_booking_data():
+    assert normalize('{"provider": "vnr"}') == ('{"provider": "vnr"}', True)
+    # json.dumps hai lần
+    assert normalize(json.dumps(json.dumps({"provider": "vnr"}))) == ('{"provider": "vnr"}', True)
+    assert normalize("not json") == ('{"raw": "not json"}', False)
+    assert normalize(None) == (None, True)
+
+
+def test_booking_endpoints_fill_generated_columns():
+    Base.metadata.create_all(bind=engine)
+    name = f"booker-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': name})}"}
+    client = TestClient(app)
+
+    flight = client.post("/api/booking/flights/book", headers=headers, json={
+        "flight_id": "VJ456", "passenger_details": [{"name": "Nguyễn Văn A"}], "provider": "vietjet",
+        "origin": "Hà Nội", "destination": "Đà Nẵng", "departure_date": "2025-03-01"})
+    hotel = client.post("/api/booking/hotels/book", headers=headers, json={
+        "hotel_id": "HOTEL002", "room_type": "double", "guest_details": {}, "provider": "hotel_inventory",
+        "location": "Huế", "check_in": "2025-04-10", "check_out": "2025-04-12"})
+    assert flight.status_code == 200 and hotel.status_code == 200
+
+    async def scenario():
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(Booking.booking_type, Booking.provider, Booking.travel_date, Booking.destination)
+                .where(Booking.user_id == user_id).order_by(Booking.booking_type))).all()
+            by_destination = json.loads(await booking_query_service.list_json(
+                session, user_id=user_id, filters={"destination": "Huế"}))
+            await session.execute(delete(Booking).where(Booking.user_id == user_id))
+            await session.execute(delete(User).where(User.id == user_id))
+            await session.commit()
+        return rows, by_destination
+
+    rows, by_destination = asyncio.run(scenario())
+    assert [tuple(row) for row in rows] == [
+        ("flight", "vietjet", "2025-03-01", "Đà Nẵng"),
+        ("hotel", "hotel_inventory", "2025-04-10", "Huế")
+    ]
+    assert [b["booking_type"] for b in by_destination] == ["hotel"]
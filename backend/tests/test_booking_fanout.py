@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from models.schemas import FlightSearchRequest, HotelSearchRequest
+from services.booking_providers import StandInProvider, default_standin_providers
+from services.booking_service import BookingService
+
+FLIGHTS = FlightSearchRequest(origin="Hà Nội", destination="Đà Nẵng", departure_date="2025-01-01")
+
+
+def _service(providers, deadline_ms=200):
+    service = BookingService()
+    service.providers = []
+    service.search_deadline = deadline_ms / 1000
+    for provider in providers:
+        service.register_provider(provider)
+    return service
+
+
+def _flight(id, price, airline="Vietnam Airlines"):
+    return {"id": id, "airline": airline, "origin": None, "destination": None,
+            "departure_time": "08:00", "price": price, "class": None}
+
+
+def test_default_providers_are_deduped_and_ranked():
+    service = _service(default_standin_providers())
+    for provider in service.providers:
+        provider.latency_ms, provider.jitter_ms = 1, 0
+
+    result = asyncio.run(service.search_flights(FLIGHTS))
+    assert result["partial"] is False
+    assert [f["id"] for f in result["flights"]] == ["VJ456", "QH789", "VN123"]
+    vn123 = result["flights"][-1]
+    # Aggregator rẻ hơn hãng: giữ giá rẻ nhất và ghi lại cả hai nguồn
+    assert vn123["price"] == 2450000
+    assert vn123["provider"] == "flight_aggregator"
+    assert sorted(vn123["sources"]) == ["flight_aggregator", "vietnam_airlines"]
+    assert vn123["origin"] == "Hà Nội"
+
+    hotels = asyncio.run(service.search_hotels(
+        HotelSearchRequest(location="Huế", check_in="2025-01-01", check_out="2025-01-02")))
+    assert [h["id"] for h in hotels["hotels"]] == ["HOTEL003", "HOTEL002", "HOTEL001"]
+
+
+def test_deadline_returns_partial_results():
+    service = _service([
+        StandInProvider("fast", {"flights": [_flight("A1", 100)]}, latency_ms=10, jitter_ms=0),
+        StandInProvider("slow", {"flights": [_flight("B1", 50)]}, latency_ms=2000, jitter_ms=0),
+        StandInProvider("broken", {"flights": [_flight("C1", 10)]}, latency_ms=5, jitter_ms=0, failure_rate=1.0)
+    ], deadline_ms=100)
+
+    start = time.perf_counter()
+    result = asyncio.run(service.search_flights(FLIGHTS))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert result["partial"] is True
+    assert [f["id"] for f in result["flights"]] == ["A1"]
+    assert result["providers"]["fast"]["status"] == "ok"
+    assert result["providers"]["slow"]["status"] == "timeout"
+    assert result["providers"]["broken"]["status"] == "error"
+
+
+def test_no_provider_in_time_is_an_error():
+    service = _service([StandInProvider("slow", {"flights": [_flight("B1", 50)]}, latency_ms=500, jitter_ms=0)],
+                       deadline_ms=20)
+    result = asyncio.run(service.search_flights(FLIGHTS))
+    assert "error" in result
+    assert result["providers"]["slow"]["status"] == "timeout"
+
+    assert "error" in asyncio.run(_service([]).search_trains(FLIGHTS))
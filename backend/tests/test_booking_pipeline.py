@@ -0,0 +1,153 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, func, delete
+
+from config.database import AsyncSessionLocal, Base, engine
+from models.models import User, Booking, IdempotencyRecord
+from models.schemas import FlightBookingRequest
+from routes.booking import _create_booking
+from services.booking_state_service import BookingStateService
+
+
+async def _make_user():
+    async with AsyncSessionLocal() as db:
+        name = f"pipeline-{uuid.uuid4().hex[:8]}"
+        user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+        db.add(user)
+        await db.commit()
+        return user
+
+
+async def _cleanup(user_id):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.user_id == user_id))
+        await db.execute(delete(Booking).where(Booking.user_id == user_id))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+def test_concurrent_cancels_only_one_wins():
+    Base.metadata.create_all(bind=engine)
+    service = BookingStateService()
+
+    async def cancel(booking_id, user_id):
+        async with AsyncSessionLocal() as db:
+            return await service.transition(db, booking_id, user_id, "cancelled")
+
+    async def scenario():
+        user = await _make_user()
+        async with AsyncSessionLocal() as db:
+            booking = Booking(user_id=user.id, booking_type="flight", booking_reference=str(uuid.uuid4()),
+                              status="pending", total_amount=1, booking_data="{}")
+            db.add(booking)
+            await db.commit()
+        results = await asyncio.gather(*(cancel(booking.id, user.id) for _ in range(20)))
+        async with AsyncSessionLocal() as db:
+            stored = (await db.execute(select(Booking).where(Booking.id == booking.id))).scalars().one()
+        await _cleanup(user.id)
+        return results, stored
+
+    results, stored = asyncio.run(scenario())
+    assert sum("booking" in result and "error" not in result for result in results) == 1
+    assert all(result["reason"] == "invalid_transition" for result in results if "error" in result)
+    assert stored.status == "cancelled"
+    assert stored.version == 2
+
+
+def test_transition_rejects_stale_version():
+    Base.metadata.create_all(bind=engine)
+    service = BookingStateService()
+
+    async def scenario():
+        user = await _make_user()
+        async with AsyncSessionLocal() as db:
+            booking = Booking(user_id=user.id, booking_type="hotel", booking_reference=str(uuid.uuid4()),
+                              status="pending", total_amount=1, booking_data="{}")
+            db.add(booking)
+            await db.commit()
+            confirmed = await service.transition(db, booking.id, user.id, "confirmed", expected_version=1)
+            stale = await service.transition(db, booking.id, user.id, "cancelled", expected_version=1)
+            missing = await service.transition(db, booking.id + 1000, user.id, "cancelled")
+        await _cleanup(user.id)
+        return confirmed, stale, missing
+
+    confirmed, stale, missing = asyncio.run(scenario())
+    assert confirmed["booking"].version == 2 and confirmed["booking"].status == "confirmed"
+    assert stale["reason"] == "version_conflict"
+    assert missing["reason"] == "not_found"
+
+
+def test_idempotency_key_creates_a_single_booking_under_retries():
+    Base.metadata.create_all(bind=engine)
+    calls = 0
+
+    async def book(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"booking_id": f"FLIGHT_{request.flight_id}", "status": "confirmed", "total_amount": 2500000}
+
+    async def attempt(user, request, key):
+        async with AsyncSessionLocal() as db:
+            try:
+                return await _create_booking("flight", book, request, user, db, key)
+            except HTTPException as e:
+                return e
+
+    async def scenario():
+        user = await _make_user()
+        request = FlightBookingRequest(flight_id="VN123", passenger_details=[{"name": "A"}])
+        concurrent = await asyncio.gather(*(attempt(user, request, "retry-1") for _ in range(10)))
+        replay = await attempt(user, request, "retry-1")
+        other = FlightBookingRequest(flight_id="VJ456", passenger_details=[{"name": "A"}])
+        mismatch = await attempt(user, other, "retry-1")
+        async with AsyncSessionLocal() as db:
+            count = await db.scalar(select(func.count()).select_from(Booking).where(Booking.user_id == user.id))
+        await _cleanup(user.id)
+        return concurrent, replay, mismatch, count
+
+    concurrent, replay, mismatch, count = asyncio.run(scenario())
+    assert count == 1
+    assert calls == 1
+    created = [result for result in concurrent if isinstance(result, dict)]
+    assert len(created) == 1
+    # Các request song song còn lại: đang xử lý (409) hoặc replay nếu tới sau khi commit
+    for result in concurrent:
+        if isinstance(result, HTTPException):
+            assert result.status_code == 409
+        elif isinstance(result, JSONResponse):
+            assert json.loads(result.body) == created[0]
+    assert isinstance(replay, JSONResponse)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(replay.body) == created[0]
+    assert created[0]["booking_data"]["booking_id"] == "FLIGHT_VN123"
+    assert isinstance(mismatch, HTTPException) and mismatch.status_code == 422
+
+
+def test_failed_booking_releases_idempotency_key():
+    Base.metadata.create_all(bind=engine)
+    outcomes = iter([{"error": "Provider unavailable"}, {"booking_id": "TRAIN_SE1", "total_amount": 850000}])
+
+    async def book(request):
+        return next(outcomes)
+
+    async def scenario():
+        user = await _make_user()
+        request = FlightBookingRequest(flight_id="SE1", passenger_details=[])
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(HTTPException) as failed:
+                await _create_booking("train", book, request, user, db, "retry-2")
+        async with AsyncSessionLocal() as db:
+            retried = await _create_booking("train", book, request, user, db, "retry-2")
+        await _cleanup(user.id)
+        return failed.value, retried
+
+    failed, retried = asyncio.run(scenario())
+    assert failed.status_code == 400
+    assert retried["booking_data"]["booking_id"] == "TRAIN_SE1"
+    assert retried["version"] == 1
@@ -0,0 +1,71 @@
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from main import app
+from auth.auth import create_access_token
+from config.database import SessionLocal
+from models.models import User, ChatSession, ChatMessage
+
+client = TestClient(app)
+
+
+def _seed_user_with_messages(messages: int):
+    username = f"pager-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    user = User(email=f"{username}@example.com", username=username, hashed_password="x")
+    db.add(user)
+    db.commit()
+    session = ChatSession(user_id=user.id, session_id=str(uuid.uuid4()), title="t")
+    db.add(session)
+    db.commit()
+    # Cùng created_at để phân trang phải tie-break theo id
+    now = datetime(2024, 1, 1)
+    db.add_all(ChatMessage(session_id=session.id, message=f"m{i}", created_at=now) for i in range(messages))
+    db.commit()
+    session_id = session.session_id
+    db.close()
+    token = create_access_token({"sub": username})
+    return {"Authorization": f"Bearer {token}"}, session_id
+
+
+def test_messages_keyset_pagination_walks_all_pages():
+    headers, session_id = _seed_user_with_messages(25)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/chatbot/sessions/{session_id}/messages", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(m["message"] for m in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == [f"m{i}" for i in range(25)]
+
+
+def test_sessions_endpoint_returns_cursor_only_for_full_pages():
+    headers, session_id = _seed_user_with_messages(0)
+    response = client.get("/api/chatbot/sessions", params={"limit": 1}, headers=headers)
+    assert [s["session_id"] for s in response.json()] == [session_id]
+    assert "X-Next-Cursor" in response.headers
+
+    response = client.get("/api/chatbot/sessions", params={"limit": 1, "cursor": response.headers["X-Next-Cursor"]}, headers=headers)
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_unpaginated_request_still_returns_full_history():
+    headers, session_id = _seed_user_with_messages(130)
+    response = client.get(f"/api/chatbot/sessions/{session_id}/messages", headers=headers)
+    assert len(response.json()) == 130
+    assert "X-Next-Cursor" not in response.headers
+
+    # Chỉ có cursor: trang mặc định 100
+    first = response.json()[0]["id"]
+    response = client.get(f"/api/chatbot/sessions/{session_id}/messages", params={"cursor": first}, headers=headers)
+    assert len(response.json()) == 100
+    assert response.headers["X-Next-Cursor"] == str(response.json()[-1]["id"])
@@ -0,0 +1,105 @@
+import asyncio
+
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from config.database import Base
+from models.models import ChatMessage
+from services.chat_persistence_service import ChatMessageWriter
+
+SESSION_PK = 987654
+
+
+async def _temp_sessions(tmp_path):
+    """Engine SQLite riêng trong tmp_path, không đụng tới travel_app.db"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def _count(sessions):
+    async with sessions() as db:
+        return await db.scalar(select(func.count()).select_from(ChatMessage).where(ChatMessage.session_id == SESSION_PK))
+
+
+def _failing(sessions, errors):
+    """session factory ném lần lượt các lỗi trong errors trước khi mở session thật"""
+    errors = list(errors)
+
+    def factory():
+        if errors:
+            raise errors.pop(0)
+        return sessions()
+    return factory
+
+
+def _locked():
+    return OperationalError("INSERT INTO chat_messages", {}, Exception("database is locked"))
+
+
+def test_writer_batches_and_flushes_on_stop(tmp_path):
+    async def scenario():
+        engine, sessions = await _temp_sessions(tmp_path)
+        writer = ChatMessageWriter(session_factory=sessions)
+        writer.batch_size = 50
+        writer.flush_interval = 10  # Chỉ flush khi đủ lô hoặc khi stop
+        await writer.start()
+        await asyncio.gather(*(writer.enqueue_exchange(SESSION_PK, f"q{i}", f"a{i}") for i in range(60)))
+        await writer.stop()
+        count = await _count(sessions)
+        await engine.dispose()
+        return writer.get_stats(), count
+
+    stats, count = asyncio.run(scenario())
+    assert count == 120
+    assert stats["flushed"] == 120
+    assert stats["batches"] == 3
+    assert stats["direct_writes"] == 0 and not stats["running"]
+
+
+def test_writer_writes_directly_when_not_started(tmp_path):
+    async def scenario():
+        engine, sessions = await _temp_sessions(tmp_path)
+        writer = ChatMessageWriter(session_factory=sessions)
+        await writer.enqueue_exchange(SESSION_PK, "q", "a")
+        count = await _count(sessions)
+        await engine.dispose()
+        return writer.get_stats(), count
+
+    stats, count = asyncio.run(scenario())
+    assert count == 2
+    assert stats["direct_writes"] == 2
+
+
+def test_transient_failures_are_retried_before_dropping(tmp_path):
+    async def scenario():
+        engine, sessions = await _temp_sessions(tmp_path)
+        # Lỗi tạm thời: thử lại rồi ghi thành công
+        writer = ChatMessageWriter(session_factory=_failing(sessions, [_locked(), _locked()]))
+        writer.max_retries = 2
+        writer.retry_backoff = 0.001
+        await writer.enqueue_exchange(SESSION_PK, "q", "a")
+        recovered = writer.get_stats(), await _count(sessions)
+
+        # Hết lượt thử thì mới bỏ lô
+        writer = ChatMessageWriter(session_factory=_failing(sessions, [_locked()] * 3))
+        writer.max_retries = 2
+        writer.retry_backoff = 0.001
+        await writer.enqueue_exchange(SESSION_PK, "q", "a")
+        exhausted = writer.get_stats()
+
+        # Lỗi không tạm thời (vi phạm ràng buộc) không được thử lại
+        writer = ChatMessageWriter(session_factory=_failing(
+            sessions, [IntegrityError("INSERT INTO chat_messages", {}, Exception("constraint"))]))
+        await writer.enqueue_exchange(SESSION_PK, "q", "a")
+        permanent = writer.get_stats()
+        await engine.dispose()
+        return recovered, exhausted, permanent
+
+    (recovered, count), exhausted, permanent = asyncio.run(scenario())
+    assert count == 2
+    assert recovered["retries"] == 2 and recovered["flushed"] == 2 and recovered["failed"] == 0
+    assert exhausted["retries"] == 2 and exhausted["flushed"] == 0 and exhausted["failed"] == 2
+    assert permanent["retries"] == 0 and permanent["failed"] == 2
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Chạy trong process riêng: cấu hình pool/pragma được đọc từ env lúc import config.database
+PROBE = """
+import asyncio, json
+from sqlalchemy import text
+from config.database import engine, async_engine, get_pool_stats
+
+with engine.connect() as conn:
+    pragmas = {name: conn.execute(text(f"PRAGMA {name}")).scalar()
+               for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")}
+
+async def touch_async():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+asyncio.run(touch_async())
+
+pool = async_engine.pool
+print(json.dumps({
+    "pragmas": pragmas,
+    "pool": {"size": pool.size(), "timeout": pool.timeout(), "recycle": pool._recycle, "pre_ping": pool._pre_ping},
+    "stats": get_pool_stats()
+}))
+"""
+
+
+def test_pool_settings_and_sqlite_pragmas_come_from_env(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'config.db'}",
+        "DB_POOL_SIZE": "3",
+        "DB_MAX_OVERFLOW": "7",
+        "DB_POOL_TIMEOUT": "4",
+        "DB_POOL_RECYCLE": "120",
+        "DB_POOL_PRE_PING": "False",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "1234",
+        "SQLITE_MMAP_SIZE": "1048576"
+    }
+    env.pop("ASYNC_DATABASE_URL", None)
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["pragmas"] == {"journal_mode": "wal", "synchronous": 2, "busy_timeout": 1234, "mmap_size": 1048576}
+    assert result["pool"] == {"size": 3, "timeout": 4.0, "recycle": 120, "pre_ping": False}
+    stats = result["stats"]
+    assert stats["max_overflow"] == 7 and stats["sync"]["max_overflow"] == 7
+    # Mỗi engine có thống kê chờ checkout riêng
+    assert stats["checkouts"] == 1 and stats["sync"]["checkouts"] == 1
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from services.event_hub import EventHub, format_sse
+
+
+def _hub(queue_size=4, max_subscribers=10000):
+    hub = EventHub()
+    hub.queue_size = queue_size
+    hub.max_subscribers = max_subscribers
+    return hub
+
+
+def test_publish_fans_out_to_thousands_of_connections():
+    async def scenario():
+        hub = _hub()
+        subscribers = [hub.subscribe() for _ in range(5000)]
+        started = time.perf_counter()
+        delivered = hub.publish("flow_id", {"flow_id": "flow-v2"})
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        frames = [s.queue.get_nowait() for s in subscribers]
+        return delivered, frames, elapsed_ms
+
+    delivered, frames, elapsed_ms = asyncio.run(scenario())
+    print(f"Fan-out to 5000 connections in {elapsed_ms:.2f}ms")
+    assert delivered == 5000
+    assert set(frames) == {format_sse("flow_id", {"flow_id": "flow-v2"})}
+
+
+def test_slow_consumer_is_evicted_without_blocking_others():
+    async def scenario():
+        hub = _hub(queue_size=2)
+        slow, fast = hub.subscribe(), hub.subscribe()
+        received = []
+        for i in range(3):
+            hub.publish("flow_id", {"flow_id": f"flow-{i}"})
+            received.append(fast.queue.get_nowait())
+        return hub, slow, fast, received, slow.queue.get_nowait()
+
+    hub, slow, fast, received, sentinel = asyncio.run(scenario())
+    assert len(received) == 3
+    assert slow.evicted and sentinel is None
+    assert hub.subscribers == {fast}
+    assert hub.get_stats()["evicted"] == 1
+
+
+def test_stream_sends_snapshot_events_and_unsubscribes_on_close():
+    async def scenario():
+        hub = _hub(max_subscribers=1)
+        subscriber = hub.subscribe()
+        rejected = hub.subscribe()
+        stream = hub.stream(subscriber, snapshot=format_sse("flow_id", {"flow_id": "flow-v1"}))
+        frames = [await stream.__anext__(), await stream.__anext__()]
+        hub.publish("flow_id", {"flow_id": "flow-v2"})
+        hub._fan_out(": heartbeat\n\n")
+        frames += [await stream.__anext__(), await stream.__anext__()]
+        hub.close_all()
+        rest = [frame async for frame in stream]
+        return hub, frames, rest, rejected
+
+    hub, frames, rest, rejected = asyncio.run(scenario())
+    assert rejected is None
+    assert frames[0].startswith("retry: ")
+    assert '"flow-v1"' in frames[1] and '"flow-v2"' in frames[2]
+    assert frames[3] == ": heartbeat\n\n"
+    assert rest == []
+    assert not hub.subscribers
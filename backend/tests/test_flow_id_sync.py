@@ -0,0 +1,147 @@
+import asyncio
+import os
+import time
+
+import redis.asyncio as redis
+
+from services.flow_id_broadcast_service import FlowIdBroadcastService
+
+
+class _Bus:
+    """Redis tối giản trong bộ nhớ: key/value + pub/sub (chỉ các lệnh service dùng)"""
+
+    def __init__(self):
+        self.values = {}
+        self.subscribers = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    def pubsub(self):
+        return _PubSub(self)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    def publish(self, channel, message):
+        queues = self.subscribers.get(channel, [])
+        for queue in queues:
+            queue.put_nowait({"type": "message", "data": message})
+        return len(queues)
+
+
+class _PubSub:
+    def __init__(self, bus):
+        self.bus = bus
+        self.queue = asyncio.Queue()
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.bus.subscribers.setdefault(channel, []).append(self.queue)
+        self.channels.append(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        for channel in self.channels:
+            self.bus.subscribers[channel].remove(self.queue)
+
+
+class _Pipeline:
+    def __init__(self, bus):
+        self.bus = bus
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value):
+        self.ops.append(lambda: self.bus.values.__setitem__(key, value) or True)
+
+    def publish(self, channel, message):
+        self.ops.append(lambda: self.bus.publish(channel, message))
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+def _worker(tmp_path, redis_client, applied, **settings):
+    async def apply(flow_id):
+        applied.append((flow_id, time.perf_counter()))
+
+    service = FlowIdBroadcastService(apply_flow_id=apply, redis=redis_client)
+    service.flow_id_file = str(tmp_path / "flow_id.txt")
+    service.notification_file = str(tmp_path / "flow_id_changed.json")
+    for name, value in settings.items():
+        setattr(service, name, value)
+    return service
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        await asyncio.sleep(0.001)
+
+
+def test_flow_id_change_reaches_every_worker(tmp_path):
+    workers = 8
+
+    async def scenario():
+        bus = _Bus()
+        applied = [[] for _ in range(workers)]
+        services = [_worker(tmp_path, bus, applied[i]) for i in range(workers)]
+        for service in services:
+            await service.start_monitoring()
+        await _wait_for(lambda: all(s.mode == "pubsub" for s in services))
+
+        started = time.perf_counter()
+        result = await services[0].publish("flow-v2", source="test")
+        await _wait_for(lambda: all(log for log in applied))
+        propagation_ms = (max(log[-1][1] for log in applied) - started) * 1000
+
+        # Worker khởi động sau khi đổi flow đọc giá trị hiện tại từ key
+        late_applied = []
+        late = _worker(tmp_path, bus, late_applied)
+        await late.start_monitoring()
+        await _wait_for(lambda: late_applied)
+
+        for service in services + [late]:
+            service.stop_monitoring()
+        return result, applied, propagation_ms, services, late_applied
+
+    result, applied, propagation_ms, services, late_applied = asyncio.run(scenario())
+    print(f"Flow ID propagated to {workers} workers in {propagation_ms:.2f}ms")
+    assert result == {"published": True, "receivers": workers}
+    assert all([flow_id for flow_id, _ in log] == ["flow-v2"] for log in applied)
+    assert propagation_ms < 500
+    assert all(s.get_stats()["last_propagation_ms"] is not None for s in services)
+    assert late_applied[0][0] == "flow-v2"
+
+
+def test_file_watch_takes_over_when_redis_is_unreachable(tmp_path):
+    async def scenario():
+        applied = []
+        unreachable = redis.from_url("redis://127.0.0.1:1/0", decode_responses=True)
+        service = _worker(tmp_path, unreachable, applied, reconnect_delay=0.05, file_poll_interval=0.02)
+        await service.start_monitoring()
+        await _wait_for(lambda: service.mode == "file")
+        published = await service.publish("flow-v3")
+
+        with open(service.flow_id_file, "w") as f:
+            f.write("flow-v3\n")
+        await _wait_for(lambda: applied)
+        service.stop_monitoring()
+        await unreachable.aclose()
+        return applied, published, service.get_stats()
+
+    applied, published, stats = asyncio.run(scenario())
+    assert applied[0][0] == "flow-v3"
+    assert published["published"] is False
+    assert stats["fallback_activations"] == 1
+    assert os.path.exists(str(tmp_path / "flow_id_changed.json"))
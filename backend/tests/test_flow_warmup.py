@@ -0,0 +1,171 @@
+import asyncio
+import json
+import time
+
+import httpx
+import redis.asyncio as redis
+
+from services.langflow_service import LangflowService
+from services.flow_warmup_service import FlowWarmupService
+
+
+def _langflow(handler):
+    service = LangflowService()
+    service.langflow_host = "http://langflow"
+    service._cached_flow_id = "flow-v1"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+class _Redis:
+    """Redis giả dùng chung giữa các worker: SET NX PX, GET, EXISTS, DELETE cho lease"""
+
+    def __init__(self):
+        self.keys = {}
+
+    def _live(self, key):
+        current = self.keys.get(key)
+        return current if current is not None and current[1] > time.monotonic() else None
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and self._live(key) is not None:
+            return None
+        self.keys[key] = (value, time.monotonic() + px / 1000 if px else float("inf"))
+        return True
+
+    async def get(self, key):
+        current = self._live(key)
+        return current[0] if current is not None else None
+
+    async def exists(self, key):
+        return int(self._live(key) is not None)
+
+    async def delete(self, key):
+        return int(self.keys.pop(key, None) is not None)
+
+
+def _reply(text="ok"):
+    return {"outputs": [{"outputs": [{"results": {"message": {"text": text}}}]}], "session_id": "s"}
+
+
+def test_startup_warmup_absorbs_cold_start_and_gates_ready():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        # Lần chạy đầu tiên: Langflow khởi tạo component/tool/model client
+        await asyncio.sleep(0.2 if len(calls) == 1 else 0.01)
+        return httpx.Response(200, json=_reply())
+
+    async def scenario():
+        langflow = _langflow(handler)
+        warmup = FlowWarmupService(langflow=langflow, redis=_Redis())
+        warmup.enabled, warmup.runs = True, 2
+        warmup.start()
+        ready_during = warmup.ready
+        await warmup._task
+        user = await langflow.send_message("Thời tiết Hà Nội?", session_id="user-1")
+        stats = warmup.get_stats()
+        await langflow._client.aclose()
+        return ready_during, warmup, user, stats
+
+    ready_during, warmup, user, stats = asyncio.run(scenario())
+    assert ready_during is False and warmup.ready
+    assert warmup.warmed_flow_id == "flow-v1"
+    assert [run["cold"] for run in stats["last_runs"]] == [True, False]
+    assert stats["last_runs"][0]["latency_ms"] > stats["last_runs"][1]["latency_ms"]
+    assert user["status"] == "success"
+    latency = stats["latency"]
+    assert latency["synthetic"]["cold"]["count"] == 1 and latency["synthetic"]["warm"]["count"] == 1
+    # Request thật đầu tiên không còn là cold start
+    assert latency["user"]["cold"]["count"] == 0 and latency["user"]["warm"]["count"] == 1
+
+
+def test_keep_warm_pings_only_when_idle_and_failures_do_not_block_ready():
+    status = {"code": 500}
+
+    async def handler(request):
+        return httpx.Response(status["code"], json=_reply())
+
+    async def scenario():
+        langflow = _langflow(handler)
+        warmup = FlowWarmupService(langflow=langflow, redis=_Redis())
+        warmup.enabled, warmup.runs, warmup.keep_warm_interval = True, 1, 0.05
+        warmup.start()
+        await warmup._task
+        failed = dict(warmup.stats)
+
+        status["code"] = 200
+        loop = asyncio.create_task(warmup.run_keep_warm_loop())
+        await asyncio.sleep(0.13)
+        idle_pings = warmup.stats["keep_warm_pings"]
+        # Có request thật liên tục: không cần ping
+        for _ in range(6):
+            await langflow.send_message("Xin chào")
+            await asyncio.sleep(0.02)
+        busy_pings = warmup.stats["keep_warm_pings"] - idle_pings
+        loop.cancel()
+        await langflow._client.aclose()
+        return warmup, failed, idle_pings, busy_pings
+
+    warmup, failed, idle_pings, busy_pings = asyncio.run(scenario())
+    assert warmup.ready
+    assert failed["failures"] == 1 and "HTTPStatusError" in failed["last_error"]
+    assert idle_pings >= 1
+    assert busy_pings == 0
+
+
+def test_only_one_worker_warms_and_each_run_gets_a_fresh_session():
+    sessions = []
+
+    async def handler(request):
+        sessions.append(json.loads(request.content)["session_id"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=_reply())
+
+    async def scenario():
+        shared = _Redis()
+        langflow = _langflow(handler)
+        workers = [FlowWarmupService(langflow=langflow, redis=shared) for _ in range(3)]
+        for warmup in workers:
+            warmup.enabled, warmup.runs, warmup.keep_warm_interval = True, 2, 0.05
+            warmup.lease_poll_interval = 0.01
+            warmup.start()
+        # Worker thua lease vẫn chưa ready trong lúc worker kia đang warm-up
+        await asyncio.sleep(0.03)
+        ready_during = [w.ready for w in workers]
+        await asyncio.gather(*(warmup._task for warmup in workers))
+        startup = len(sessions)
+        lease_held = await shared.exists("langflow:warmup:flow-v1")
+
+        # Langflow khởi động lại với cùng Flow ID: lease đã được trả nên warm-up chạy lại
+        restarted = FlowWarmupService(langflow=langflow, redis=shared)
+        restarted.enabled, restarted.runs = True, 1
+        restarted.start()
+        await restarted._task
+
+        # Keep-warm: một ping mỗi interval cho cả ba worker
+        loops = [asyncio.create_task(warmup.run_keep_warm_loop()) for warmup in workers]
+        await asyncio.sleep(0.12)
+        for loop in loops:
+            loop.cancel()
+        pings = sum(warmup.stats["keep_warm_pings"] for warmup in workers)
+
+        # Redis không kết nối được: worker tự warm-up
+        alone = FlowWarmupService(langflow=langflow, redis=redis.from_url("redis://127.0.0.1:1/0"))
+        alone.enabled, alone.runs = True, 1
+        alone.start()
+        await alone._task
+        await langflow._client.aclose()
+        return workers, ready_during, startup, lease_held, restarted, pings, alone
+
+    workers, ready_during, startup, lease_held, restarted, pings, alone = asyncio.run(scenario())
+    assert sum(w.stats["warmups"] for w in workers) == 1 and sum(w.stats["skipped"] for w in workers) == 2
+    assert ready_during == [False, False, False]
+    assert all(w.ready for w in workers)
+    assert startup == 2
+    assert not lease_held
+    assert restarted.stats["warmups"] == 1 and restarted.stats["skipped"] == 0
+    assert 1 <= pings <= 3
+    assert alone.stats["warmups"] == 1
+    assert len(set(sessions)) == len(sessions)
@@ -0,0 +1,68 @@
+from services.forecast_aggregation import BATCH_MIN_FORECASTS, aggregate_daily, aggregate_daily_batch
+
+# 2024-01-01 00:00 UTC
+BASE = 1704067200
+
+
+def _item(hours, temp, description="mây rải rác", icon="03d", rain=None):
+    item = {
+        "dt": BASE + hours * 3600,
+        "main": {"temp": temp, "temp_min": temp - 1, "temp_max": temp + 1, "humidity": 80},
+        "wind": {"speed": hours / 10},
+        "weather": [{"description": description, "icon": icon}]
+    }
+    if rain is not None:
+        item["rain"] = {"3h": rain}
+    return item
+
+
+def test_groups_by_city_local_date_not_server_timezone():
+    # 18:00 UTC ngày 1/1 là 01:00 ngày 2/1 ở Việt Nam (UTC+7)
+    data = {"list": [_item(12, 20), _item(18, 22)], "city": {"timezone": 7 * 3600}}
+    daily = aggregate_daily(data)
+    assert [day["date"] for day in daily] == ["2024-01-01", "2024-01-02"]
+
+    utc = aggregate_daily({"list": data["list"], "city": {"timezone": 0}})
+    assert [day["date"] for day in utc] == ["2024-01-01"]
+
+
+def test_daily_stats_condition_and_precipitation():
+    data = {
+        "list": [
+            _item(3, 24, "mưa nhẹ", "10n", rain=1.5),
+            _item(0, 20, "mưa nhẹ", "10n", rain=0.5),
+            _item(6, 30, "trời quang", "01d"),
+            _item(9, 28, "mưa nhẹ", "10d", rain=2.0),
+            _item(24, 18, "trời quang", "01n")
+        ],
+        "city": {"timezone": 0}
+    }
+    first, second = aggregate_daily(data)
+    assert first["date"] == "2024-01-01"
+    assert first["temp_min"] == 19
+    assert first["temp_max"] == 31
+    assert first["temp_mean"] == 25.5
+    assert first["description"] == "mưa nhẹ"
+    assert first["icon"] == "10d"
+    assert first["precipitation"] == 4.0
+    assert first["wind_speed"] == 0.9
+    assert second["description"] == "trời quang"
+    assert second["precipitation"] == 0
+
+
+def test_limits_days_and_handles_empty_list():
+    data = {"list": [_item(h, 20) for h in range(0, 24 * 7, 3)], "city": {"timezone": 0}}
+    assert len(aggregate_daily(data, max_days=5)) == 5
+    assert aggregate_daily({"list": []}) == []
+
+
+def test_numpy_batch_matches_python_path():
+    conditions = [("mưa nhẹ", "10n"), ("trời quang", "01d"), ("dông", "11d")]
+    forecasts = [
+        {"list": [_item(h + 3 * i, 20 + (h * i) % 13, *conditions[(h + i) % 3], rain=(h % 4) / 3 or None)
+                  for h in range(0, 120, 3)],
+         "city": {"timezone": 3600 * (i % 12)}}
+        for i in range(BATCH_MIN_FORECASTS * 2)
+    ]
+    assert aggregate_daily_batch(forecasts) == [aggregate_daily(data) for data in forecasts]
+    assert aggregate_daily_batch(forecasts[:2]) == [aggregate_daily(data) for data in forecasts[:2]]
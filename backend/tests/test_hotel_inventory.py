@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date, timedelta
+
+from models.schemas import HotelSearchRequest
+from services.booking_service import BookingService
+from services.booking_providers import StandInProvider
+import services.hotel_inventory as hotel_inventory_module
+from services.hotel_inventory import HotelInventory, InventoryHotelProvider
+
+BASE = date(2025, 1, 1)
+
+
+def _hotel(id, city, price, rating, amenities, **extra):
+    return {"id": id, "name": f"Hotel {id}", "city": city, "price_per_night": price,
+            "rating": rating, "amenities": amenities, "rooms": 10, **extra}
+
+
+def _inventory():
+    inventory = HotelInventory(horizon_days=200)
+    inventory.build([
+        _hotel("A", "Đà Nẵng", 900000, 4.0, ["WiFi", "Pool"]),
+        _hotel("B", "Đà Nẵng", 1400000, 4.5, ["WiFi", "Pool", "Spa"]),
+        _hotel("C", "Đà Nẵng", 1600000, 5.0, ["Pool"]),
+        _hotel("D", "Đà Nẵng", 500000, 3.0, ["WiFi"]),
+        _hotel("E", "Đà Nẵng", 1000000, 4.5, ["Pool"], blackout_dates=["2025-03-02"]),
+        _hotel("F", "Đà Nẵng", 1200000, 4.2, ["Pool"], rooms=1, max_guests_per_room=2),
+        # Cuối đợt available nằm sau word bitmap đầu tiên (ngày thứ 64+)
+        _hotel("G", "Đà Nẵng", 1300000, 4.8, ["Pool"], available_from="2025-03-10"),
+        _hotel("H", "Huế", 700000, 4.0, ["WiFi", "Pool"])
+    ], base_date=BASE)
+    return inventory
+
+
+def test_filters_by_city_price_rating_and_amenities():
+    inventory = _inventory()
+    total, hotels = inventory.search("da nang", "2025-03-01", "2025-03-03",
+                                     max_price=1500000, min_rating=4, amenities=["pool"])
+    assert total == 3
+    assert [h["id"] for h in hotels] == ["A", "F", "B"]
+    assert inventory.search("Đà Nẵng", "2025-03-01", "2025-03-03", amenities=["Sauna"]) == (0, [])
+    assert inventory.search("Hà Nội", "2025-03-01", "2025-03-03") == (0, [])
+
+
+def test_availability_bitmaps_and_capacity():
+    inventory = _inventory()
+    ids = lambda **kw: [h["id"] for h in inventory.search("Đà Nẵng", **kw)[1]]
+    # E hết phòng đêm 2/3; G chỉ mở từ 10/3 (nằm ở word bitmap thứ hai)
+    assert "E" not in ids(check_in="2025-03-01", check_out="2025-03-03")
+    assert "E" in ids(check_in="2025-03-03", check_out="2025-03-05")
+    assert "G" not in ids(check_in="2025-03-08", check_out="2025-03-11")
+    assert "G" in ids(check_in="2025-03-10", check_out="2025-03-20")
+    # F chỉ có 1 phòng, tối đa 2 khách/phòng
+    assert "F" not in ids(check_in="2025-03-03", check_out="2025-03-04", rooms=2)
+    assert "F" not in ids(check_in="2025-03-03", check_out="2025-03-04", guests=3)
+    # Ngoài horizon
+    assert ids(check_in="2025-12-01", check_out="2025-12-02") == []
+
+
+def test_sort_options_and_paging():
+    inventory = _inventory()
+    search = lambda **kw: [h["id"] for h in inventory.search("Đà Nẵng", "2025-03-03", "2025-03-04", **kw)[1]]
+    assert search(sort_by="price_asc") == ["D", "A", "E", "F", "B", "C"]
+    assert search(sort_by="price_desc") == ["C", "B", "F", "E", "A", "D"]
+    assert search(sort_by="rating_desc") == ["C", "E", "B", "F", "A", "D"]
+    assert search(sort_by="price_asc", limit=2, offset=2) == ["E", "F"]
+
+
+def test_inventory_provider_in_fan_out_applies_request_filters():
+    service = BookingService()
+    service.providers = []
+    service.register_provider(InventoryHotelProvider(_inventory()))
+    # Provider ngoài bỏ qua bộ lọc: kết quả gộp vẫn phải được lọc
+    service.register_provider(StandInProvider("channel", {"hotels": [
+        {"id": "X", "name": "Cheap", "location": None, "rating": 2.0, "price_per_night": 300000, "amenities": ["Pool"]}
+    ]}, latency_ms=1, jitter_ms=0))
+    # base_date của inventory là 2025-01-01
+    request = HotelSearchRequest(location="Đà Nẵng", check_in="2025-03-03", check_out="2025-03-04",
+                                 min_rating=4.5, amenities=["Pool"], sort_by="rating_desc", limit=2)
+    result = asyncio.run(service.search_hotels(request))
+    assert [h["id"] for h in result["hotels"]] == ["C", "E"]
+
+
+def test_bitmaps_roll_forward_when_the_day_changes(monkeypatch):
+    today = {"value": BASE}
+
+    class _Date(date):
+        @classmethod
+        def today(cls):
+            return today["value"]
+
+    monkeypatch.setattr(hotel_inventory_module, "date", _Date)
+    inventory = HotelInventory(horizon_days=30)
+    inventory.build([_hotel("A", "Huế", 500000, 4.0, [], blackout_dates=["2025-01-10"])])
+    provider = InventoryHotelProvider(inventory)
+
+    def search(check_in, check_out):
+        request = HotelSearchRequest(location="Huế", check_in=check_in, check_out=check_out)
+        return [h["id"] for h in asyncio.run(provider.search("hotels", request))]
+
+    assert search("2025-01-10", "2025-01-11") == []
+    assert search("2025-01-31", "2025-02-01") == []
+
+    # Sang ngày mới: blackout vẫn đúng ngày và horizon dịch theo hôm nay
+    today["value"] = BASE + timedelta(days=1)
+    assert inventory.is_stale
+    assert search("2025-01-10", "2025-01-11") == []
+    assert search("2025-01-11", "2025-01-12") == ["A"]
+    assert search("2025-01-31", "2025-02-01") == ["A"]
+    assert inventory.base_date == BASE + timedelta(days=1) and not inventory.is_stale
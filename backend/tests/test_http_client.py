@@ -0,0 +1,22 @@
+import asyncio
+
+from config.http_client import create_async_client, get_pool_stats
+
+
+def test_pool_stats_uninitialized():
+    assert get_pool_stats(None) == {"initialized": False}
+
+
+def test_pool_limits_from_env(monkeypatch):
+    monkeypatch.setenv("TESTPOOL_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("TESTPOOL_MAX_KEEPALIVE_CONNECTIONS", "3")
+    monkeypatch.setenv("TESTPOOL_KEEPALIVE_EXPIRY", "12")
+
+    client = create_async_client("TESTPOOL")
+    stats = get_pool_stats(client)
+    asyncio.run(client.aclose())
+
+    assert stats["max_connections"] == 7
+    assert stats["max_keepalive_connections"] == 3
+    assert stats["keepalive_expiry"] == 12.0
+    assert stats["connections"] == 0
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from services.langflow_service import LangflowService, langflow_service
+
+
+def _stream_body(*events):
+    return "".join(json.dumps(event) + "\n\n" for event in events)
+
+
+def _service_with(handler) -> LangflowService:
+    service = LangflowService()
+    service._cached_flow_id = "test-flow"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+async def _collect(service, message):
+    chunks = [chunk async for chunk in service.stream_message(message)]
+    await service.shutdown()
+    return chunks
+
+
+def test_stream_message_yields_tokens():
+    def handler(request):
+        assert request.url.params["stream"] == "true"
+        body = _stream_body(
+            {"event": "add_message", "data": {}},
+            {"event": "token", "data": {"chunk": "Xin "}},
+            {"event": "token", "data": {"chunk": "chào"}},
+            {"event": "end", "data": {"result": {}}},
+        )
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    assert asyncio.run(_collect(_service_with(handler), "hi")) == ["Xin ", "chào"]
+
+
+def test_stream_message_falls_back_to_end_result():
+    result = {"outputs": [{"outputs": [{"results": {"message": {"text": "Full answer"}}}]}]}
+
+    def handler(request):
+        body = _stream_body({"event": "end", "data": {"result": result}})
+        return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+    assert asyncio.run(_collect(_service_with(handler), "hi")) == ["Full answer"]
+
+
+def test_chat_stream_endpoint_relays_sse(monkeypatch):
+    async def fake_stream(message, session_id=None, user_context=None, use_cache=False):
+        for chunk in ["Da ", "Nang"]:
+            yield chunk
+
+    monkeypatch.setattr(langflow_service, "stream_message", fake_stream)
+    client = TestClient(app)
+    response = client.post("/api/chatbot/chat/stream?session_id=abc", json={"message": "hello"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: token\ndata: {"chunk": "Da "}' in response.text
+    assert 'event: done\ndata: {"response": "Da Nang", "session_id": "abc"}' in response.text
@@ -0,0 +1,72 @@
+import json
+
+import scripts.manage_flow as manage_flow
+
+
+class _Response:
+    def __init__(self, payload=None, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class _Langflow:
+    """Langflow giả: ghi lại các request upload/cập nhật"""
+
+    def __init__(self, flows):
+        self.flows = flows
+        self.list_params = []
+        self.patched = []
+        self.timeouts = []
+        self.uploaded = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.list_params.append(params)
+        return _Response([{"id": flow_id, "name": name} for flow_id, name in self.flows.items()])
+
+    def patch(self, url, json=None, timeout=None):
+        self.patched.append(url.rsplit("/", 1)[-1])
+        self.timeouts.append(timeout)
+        return _Response({})
+
+    def post(self, url, files=None, timeout=None):
+        self.uploaded += 1
+        self.timeouts.append(timeout)
+        self.flows["flow-new"] = manage_flow.FLOW_NAME
+        return _Response([{"id": "flow-new"}])
+
+
+def test_upload_is_skipped_until_flow_file_changes(tmp_path, monkeypatch):
+    flow_file = tmp_path / "TravelMate.json"
+    flow_file.write_text(json.dumps({"name": "TravelMate", "description": "v1", "data": {"nodes": []}}))
+    monkeypatch.setattr(manage_flow, "FLOW_FILE_PATH", str(flow_file))
+    monkeypatch.setattr(manage_flow, "FLOW_ID_FILE", str(tmp_path / "flow_id.txt"))
+    monkeypatch.setattr(manage_flow, "FLOW_HASH_FILE", str(tmp_path / "flow_hash.json"))
+    monkeypatch.setattr(manage_flow, "ensure_data_dir", lambda: None)
+    langflow = _Langflow({"flow-1": manage_flow.FLOW_NAME})
+    monkeypatch.setattr(manage_flow, "requests", langflow)
+
+    first = manage_flow.get_or_create_flow()
+    restart = manage_flow.get_or_create_flow()
+    flow_file.write_text(json.dumps({"name": "TravelMate", "description": "v2", "data": {"nodes": [1]}}))
+    edited = manage_flow.get_or_create_flow()
+
+    # Flow đã lưu bị xóa khỏi Langflow: upload lại
+    langflow.flows.clear()
+    recreated = manage_flow.get_or_create_flow()
+
+    # Chưa có hash: không ghi đè flow có sẵn (có thể đã sửa trên UI), chỉ ghi nhận hash
+    assert first == ("flow-1", False)
+    assert restart == ("flow-1", False)
+    assert edited == ("flow-1", True)
+    assert langflow.patched == ["flow-1"]
+    assert recreated == ("flow-new", True) and langflow.uploaded == 1
+    assert all(timeout for timeout in langflow.timeouts)
+    assert all(params["header_flows"] == "true" for params in langflow.list_params)
+    assert json.loads((tmp_path / "flow_hash.json").read_text())["flow_id"] == "flow-new"
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+import pytest
+
+from main import app
+from services.langflow_service import LangflowService, langflow_service
+from services.request_coalescer import RequestCoalescer
+
+
+def test_identical_requests_share_one_call():
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+        results = await asyncio.gather(*(coalescer.run("k", upstream) for _ in range(10)))
+        other = await coalescer.run("other", upstream)
+        return coalescer, results, other
+
+    coalescer, results, other = asyncio.run(scenario())
+    assert results == ["answer"] * 10
+    assert other == "answer"
+    assert calls == 2
+    assert coalescer.get_stats() == {"in_flight": 0, "leaders": 2, "coalesced": 9, "waiters": {}}
+
+
+def test_waiter_counts_and_shared_errors():
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+        tasks = [asyncio.ensure_future(coalescer.run("k", failing)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters = coalescer.get_stats()["waiters"]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return waiters, results
+
+    waiters, results = asyncio.run(scenario())
+    assert waiters == {"k": 3}
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+        leader = asyncio.ensure_future(coalescer.run("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(coalescer.run("k", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader
+
+    result, leader = asyncio.run(scenario())
+    assert result == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        leader.result()
+
+
+def test_langflow_runs_are_only_shared_within_one_session():
+    sessions = []
+
+    async def handler(request):
+        payload = json.loads(request.content)
+        sessions.append(payload.get("session_id"))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={
+            "outputs": [{"outputs": [{"results": {"message": {"text": f"reply for {payload.get('session_id')}"}}}]}]
+        })
+
+    async def scenario():
+        service = LangflowService()
+        service._cached_flow_id = "flow-v1"
+        service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        results = await asyncio.gather(
+            service.send_message("Đà Lạt có gì chơi?", "session-a", use_cache=True),
+            service.send_message("Đà Lạt có gì chơi?", "session-a", use_cache=True),
+            service.send_message("Đà Lạt có gì chơi?", "session-b", use_cache=True)
+        )
+        await service._client.aclose()
+        return service, results
+
+    service, results = asyncio.run(scenario())
+    assert sorted(sessions) == ["session-a", "session-b"]
+    assert [result["response"] for result in results] == ["reply for session-a", "reply for session-a", "reply for session-b"]
+    assert service.coalescer.coalesced == 1
+
+
+def test_concurrent_session_less_chat_turns_share_one_flow_run(monkeypatch):
+    runs = []
+
+    async def handler(request):
+        runs.append(json.loads(request.content).get("session_id"))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"outputs": [{"outputs": [{"results": {"message": {"text": "Hồ Xuân Hương"}}}]}]})
+
+    async def scenario():
+        upstream = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(langflow_service, "_cached_flow_id", "flow-v1")
+        monkeypatch.setattr(langflow_service, "_client", upstream)
+        body = {"message": f"Đà Lạt có gì chơi? {uuid.uuid4().hex}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post("/api/chatbot/chat", json=body) for _ in range(2)))
+        await upstream.aclose()
+        return [response.json() for response in responses]
+
+    first, second = asyncio.run(scenario())
+    assert len(runs) == 1 and runs[0]
+    assert first["response"] == second["response"] == "Hồ Xuân Hương"
+    # Mỗi client vẫn nhận session ID riêng
+    assert first["session_id"] and second["session_id"] and first["session_id"] != second["session_id"]
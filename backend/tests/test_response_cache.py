@@ -0,0 +1,162 @@
+import asyncio
+import fnmatch
+
+from services.langflow_service import LangflowService
+from services.response_cache_service import ResponseCacheService, normalize_message
+import services.langflow_service as langflow_module
+from models.schemas import UserContext
+
+
+class _Pipeline:
+    """Gom lệnh rồi chạy tuần tự trên _Redis khi execute()"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Redis:
+    """redis.asyncio giả trong bộ nhớ: chỉ các lệnh ResponseCacheService dùng"""
+
+    def __init__(self):
+        self.values, self.zsets, self.hashes = {}, {}, {}
+        self.scans = 0
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+        return True
+
+    async def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += sum(key in store and store.pop(key) is not None for store in (self.values, self.zsets))
+        return deleted
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if low <= score <= high]:
+            del zset[member]
+
+    async def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    async def zpopmin(self, key, count):
+        zset = self.zsets.get(key, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+    async def hincrby(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def scan_iter(self, match=None, count=None):
+        self.scans += 1
+        for key in list(self.values):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+
+def test_normalize_message_collapses_variants():
+    assert normalize_message("  Best time to visit  Da Nang?? ") == "best time to visit da nang"
+    assert normalize_message("VISA for Vietnam.") == normalize_message("visa for vietnam")
+
+
+def test_key_depends_on_flow_id():
+    cache = ResponseCacheService()
+    assert cache.make_key("flow-a", "Visa?") == cache.make_key("flow-a", "visa")
+    assert cache.make_key("flow-a", "visa") != cache.make_key("flow-b", "visa")
+
+
+def test_authenticated_turns_bypass_cache():
+    cache = ResponseCacheService()
+    cache.enabled = True
+    cache.bypass_authenticated = True
+    assert cache.is_cacheable(None)
+    assert cache.is_cacheable(UserContext(isAuthenticated=False))
+    assert not cache.is_cacheable(UserContext(isAuthenticated=True, email="a@b.c"))
+    assert not cache.is_cacheable({"isAuthenticated": True})
+
+
+def test_get_and_set_track_hits_and_misses():
+    async def scenario():
+        cache = ResponseCacheService(redis=_Redis())
+        missed = await cache.get("flow-a", "Visa?")
+        await cache.set("flow-a", "Visa?", {"response": "Cần visa"})
+        hit = await cache.get("flow-a", "visa")
+        return missed, hit, await cache.get_stats()
+
+    missed, hit, stats = asyncio.run(scenario())
+    assert missed is None
+    assert hit == {"response": "Cần visa"}
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_eviction_keeps_index_within_max_entries():
+    async def scenario():
+        redis = _Redis()
+        cache = ResponseCacheService(redis=redis)
+        cache.max_entries = 3
+        for i in range(3):
+            await cache.set("flow-a", f"câu {i}", {"response": str(i)})
+            await asyncio.sleep(0.001)
+        # Truy cập câu 0 để nó không còn là entry cũ nhất
+        await cache.get("flow-a", "câu 0")
+        await asyncio.sleep(0.001)
+        await cache.set("flow-a", "câu 3", {"response": "3"})
+        kept = {i: await redis.get(cache.make_key("flow-a", f"câu {i}")) is not None for i in range(4)}
+        return kept, await cache.get_stats()
+
+    kept, stats = asyncio.run(scenario())
+    assert kept == {0: True, 1: False, 2: True, 3: True}
+    assert stats["entries"] == 3 and stats["evictions"] == 1
+
+
+def test_flow_id_change_invalidates_entries_via_scan(monkeypatch):
+    async def scenario():
+        redis = _Redis()
+        cache = ResponseCacheService(redis=redis)
+        monkeypatch.setattr(langflow_module, "response_cache_service", cache)
+        await cache.set("flow-a", "Visa?", {"response": "Cần visa"})
+        await cache.set("flow-a", "Đà Lạt?", {"response": "Mát"})
+        redis.values["other:key"] = "giữ nguyên"
+
+        service = LangflowService()
+        await service.set_flow_id("flow-a")
+        await service.set_flow_id("flow-a")
+        unchanged = len(redis.values)
+        await service.set_flow_id("flow-b")
+        return redis, unchanged, await cache.get_stats()
+
+    redis, unchanged, stats = asyncio.run(scenario())
+    # Lần đầu đặt flow (từ None) cũng xóa; đặt lại cùng flow thì không
+    assert redis.scans == 2
+    assert unchanged == 1
+    assert redis.values == {"other:key": "giữ nguyên"}
+    assert stats["entries"] == 0
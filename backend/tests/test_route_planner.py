@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from datetime import date
+
+from models.schemas import TrainSearchRequest
+from services.booking_service import BookingService
+from services.route_planner import RoutePlanner, TimetableProvider, DEFAULT_TIMETABLE_PATH
+
+
+def _stop(id, city, type="station", transfer=20):
+    return {"id": id, "name": f"{city} {type}", "city": city, "aliases": [], "type": type,
+            "min_transfer_minutes": transfer}
+
+
+def _planner():
+    planner = RoutePlanner()
+    planner.build({
+        "city_transfer_minutes": 60,
+        "stops": [
+            _stop("HNO", "Hà Nội"), _stop("HUE", "Huế"), _stop("DNA", "Đà Nẵng"),
+            _stop("HAN", "Hà Nội", "airport", 60), _stop("DAD", "Đà Nẵng", "airport", 60)
+        ],
+        "trips": [
+            # Tàu đêm qua Huế, tới Đà Nẵng sau nửa đêm
+            {"id": "SE1", "mode": "train", "operator": "VNR", "class": "Soft sleeper", "fare_per_km": 500,
+             "stops": [["HNO", None, "19:00", 0], ["HUE", "07:00", "07:10", 700], ["DNA", "10:00", None, 800]]},
+            # Hà Nội -> Huế, nối chuyến Huế -> Đà Nẵng cần >= 20 phút đổi tàu
+            {"id": "SE5", "mode": "train", "operator": "VNR", "class": "Hard seat", "fare_per_km": 300,
+             "stops": [["HNO", None, "08:00", 0], ["HUE", "20:00", None, 700]]},
+            {"id": "HD1", "mode": "train", "operator": "VNR", "class": "Hard seat", "fare_per_km": 300,
+             "stops": [["HUE", None, "20:10", 0], ["DNA", "23:00", None, 100]]},
+            {"id": "HD3", "mode": "train", "operator": "VNR", "class": "Hard seat", "fare_per_km": 300,
+             "stops": [["HUE", None, "20:30", 0], ["DNA", "23:30", None, 100]]},
+            {"id": "VN1", "mode": "flight", "operator": "Vietnam Airlines", "price": 1500000,
+             "stops": [["HAN", None, "09:00", 0], ["DAD", "10:20", None, 630]]}
+        ]
+    })
+    return planner
+
+
+def test_fastest_itineraries_respect_transfer_times():
+    planner = _planner()
+    itineraries = planner.plan("Hanoi", "Da Nang", k=3)
+    assert [it["id"] for it in itineraries] == ["VN1", "SE1", "SE5+HD3"]
+    assert [it["duration_minutes"] for it in itineraries] == [80, 900, 930]
+    # Chuyến qua đêm: tới lúc 10:00 ngày hôm sau
+    assert itineraries[1]["arrival"] == 1440 + 600
+    # HD1 rời Huế 10 phút sau khi SE5 tới: không đủ thời gian đổi tàu
+    connection = itineraries[2]
+    assert connection["transfers"] == 1
+    assert [(leg["origin"], leg["destination"]) for leg in connection["legs"]] == [("HNO", "HUE"), ("HUE", "DNA")]
+    assert connection["price"] == 210000 + 30000
+
+
+def test_cheapest_and_mode_filters():
+    planner = _planner()
+    cheapest = planner.plan("ha noi", "đà nẵng", optimize="cheapest", k=2)
+    # Ngủ lại Huế chờ SE1 sáng hôm sau vẫn rẻ hơn đi SE1 cả chặng
+    assert [(it["id"], it["price"]) for it in cheapest] == [("SE5+HD3", 240000), ("SE5+SE1", 260000)]
+    assert planner.plan("Hà Nội", "Đà Nẵng", modes=["flight"], k=3)[0]["id"] == "VN1"
+    assert len(planner.plan("Hà Nội", "Đà Nẵng", modes=["flight"], k=3)) == 1
+    assert [it["id"] for it in planner.plan("Hà Nội", "Đà Nẵng", modes=["train"], max_transfers=0, k=3)] == ["SE1"]
+    assert planner.plan("Hà Nội", "Đà Nẵng", earliest_departure="10:00")[0]["id"] == "SE1"
+    assert planner.plan("Hà Nội", "Cần Thơ") == []
+
+
+def test_describe_formats_times_and_stop_names():
+    planner = _planner()
+    itinerary = planner.describe(planner.plan("Hà Nội", "Đà Nẵng", modes=["train"], k=1)[0], date(2025, 3, 1))
+    assert itinerary["departure"] == "2025-03-01T19:00"
+    assert itinerary["arrival"] == "2025-03-02T10:00"
+    assert itinerary["duration"] == "15h 00m"
+    assert itinerary["origin"] == "Hà Nội station"
+
+
+def test_timetable_provider_returns_connections_in_fan_out():
+    service = BookingService()
+    service.providers = []
+    service.register_provider(TimetableProvider(_planner(), k=2))
+    request = TrainSearchRequest(origin="Hà Nội", destination="Đà Nẵng", departure_date="2025-03-01")
+    result = asyncio.run(service.search_trains(request))
+    trains = result["trains"]
+    assert {train["id"] for train in trains} == {"SE5+HD3", "SE1"}
+    assert next(t for t in trains if t["id"] == "SE1")["arrival_time"] == "10:00+1"
+
+
+def test_search_budget_returns_what_was_found():
+    planner = _planner()
+    planner.max_expansions = 1
+    assert planner.plan("Hà Nội", "Đà Nẵng", k=3) == []
+    assert planner.get_stats()["budget_exhausted"] == 1
+
+    planner.max_expansions = 200000
+    planner.search_budget = 0
+    # Đồng hồ chỉ được xem mỗi 1024 nhãn: truy vấn nhỏ vẫn chạy xong
+    assert len(planner.plan("Hà Nội", "Đà Nẵng", k=3)) == 3
+
+
+def test_provider_plans_off_the_event_loop():
+    planner = _planner()
+    threads = []
+    plan = planner.plan
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return plan(*args, **kwargs)
+
+    planner.plan = record_thread
+    request = TrainSearchRequest(origin="Hà Nội", destination="Đà Nẵng", departure_date="2025-03-01")
+    offers = asyncio.run(TimetableProvider(planner, k=2).search("trains", request))
+    assert len(offers) == 2
+    assert threads and threads[0] != threading.get_ident()
+
+
+def test_bundled_timetable_loads():
+    planner = RoutePlanner()
+    planner.load_file(DEFAULT_TIMETABLE_PATH)
+    assert planner.get_stats()["trips"] > 0
+    assert planner.plan("Hà Nội", "Huế", modes=["train"], k=1)
@@ -0,0 +1,152 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+
+from main import app
+from auth.auth import create_access_token
+from config.database import SessionLocal
+from models.models import User
+from models.schemas import FlightSearchRequest
+from services.search_cache_service import SearchCacheService
+
+
+def _service(fetcher, ttl=60):
+    service = SearchCacheService()
+    service.enabled = True
+    service.ttls["flights"] = ttl
+    service.provider_soft_timeout = 0.05
+    service.register_provider("flights", FlightSearchRequest, fetcher)
+    return service
+
+
+def _request(**overrides):
+    params = {"origin": f"Hà Nội {uuid.uuid4().hex}", "destination": "Đà Nẵng", "departure_date": "2025-01-01"}
+    params.update(overrides)
+    return FlightSearchRequest(**params)
+
+
+def test_canonical_key_ignores_case_and_whitespace():
+    request = _request()
+    same = FlightSearchRequest(**{**request.model_dump(), "origin": "  " + request.origin.upper(), "destination": "đà  nẵng"})
+    other = FlightSearchRequest(**{**request.model_dump(), "passengers": 2})
+    assert SearchCacheService.make_key("flights", request) == SearchCacheService.make_key("flights", same)
+    assert SearchCacheService.make_key("flights", request) != SearchCacheService.make_key("flights", other)
+
+
+def test_miss_then_hit_and_stale_when_provider_is_slow():
+    calls = []
+
+    async def fetcher(request):
+        calls.append(request)
+        if len(calls) > 1:
+            await asyncio.sleep(0.2)
+        return {"flights": [{"id": f"VN{len(calls)}"}]}
+
+    async def scenario():
+        service = _service(fetcher)
+        request = _request()
+        first = await service.search("flights", request)
+        second = await service.search("flights", request)
+
+        # Entry hết TTL, provider chậm hơn soft timeout -> trả kết quả cũ kèm tuổi
+        key = service.make_key("flights", request)
+        service._lru[key]["fetched_at"] -= 120
+        stale = await service.search("flights", request)
+        await asyncio.sleep(0.3)
+        refreshed = await service.search("flights", request)
+        return first, second, stale, refreshed
+
+    first, second, stale, refreshed = asyncio.run(scenario())
+    assert first["cache"] == "MISS"
+    assert second["cache"] == "HIT" and second["data"] == first["data"]
+    assert stale["cache"] == "STALE" and stale["age"] >= 120
+    assert stale["data"]["flights"][0]["id"] == "VN1"
+    # Refresh chạy tiếp ở background và cập nhật cache
+    assert refreshed["cache"] == "HIT"
+    assert refreshed["data"]["flights"][0]["id"] == "VN2"
+    assert len(calls) == 2
+
+
+def test_errors_are_not_cached():
+    async def fetcher(request):
+        return {"error": "provider down"}
+
+    async def scenario():
+        service = _service(fetcher)
+        request = _request()
+        await service.search("flights", request)
+        return await service.search("flights", request)
+
+    assert asyncio.run(scenario())["cache"] == "MISS"
+
+
+def test_partial_results_are_cached_with_short_ttl():
+    calls = []
+
+    async def fetcher(request):
+        calls.append(request)
+        return {"flights": [{"id": f"VN{len(calls)}"}], "partial": len(calls) == 1}
+
+    async def scenario():
+        service = _service(fetcher, ttl=600)
+        service.partial_ttl = 10
+        request = _request()
+        first = await service.search("flights", request)
+        cached = await service.search("flights", request)
+
+        # Quá TTL ngắn của kết quả thiếu -> fan-out lại, kết quả đủ dùng TTL bình thường
+        key = service.make_key("flights", request)
+        service._lru[key]["fetched_at"] -= 20
+        refreshed = await service.search("flights", request)
+        service._lru[key]["fetched_at"] -= 20
+        complete = await service.search("flights", request)
+        return first, cached, refreshed, complete
+
+    first, cached, refreshed, complete = asyncio.run(scenario())
+    assert first["cache"] == "MISS" and cached["cache"] == "HIT"
+    assert cached["data"]["partial"] is True
+    assert refreshed["cache"] == "MISS" and refreshed["data"]["flights"][0]["id"] == "VN2"
+    assert complete["cache"] == "HIT"
+    assert len(calls) == 2
+
+
+def test_refresh_popular_routes_ahead_of_expiry():
+    calls = []
+
+    async def fetcher(request):
+        calls.append(request.origin)
+        return {"flights": []}
+
+    async def scenario():
+        service = _service(fetcher, ttl=100)
+        popular, rare = _request(), _request()
+        for _ in range(3):
+            await service.search("flights", popular)
+        await service.search("flights", rare)
+        service.popular_routes = 1
+        for key in list(service._lru):
+            service._lru[key]["fetched_at"] -= 90
+        return await service.refresh_popular(), popular
+
+    refreshed, popular = asyncio.run(scenario())
+    assert refreshed == 1
+    # Refresh dùng request gốc (không phải bản đã chuẩn hóa)
+    assert calls[-1] == popular.origin
+
+
+def test_search_endpoint_sets_cache_header():
+    username = f"search-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    db.add(User(email=f"{username}@example.com", username=username, hashed_password="x"))
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+    client = TestClient(app)
+    body = {"location": f"Huế {uuid.uuid4().hex}", "check_in": "2025-01-01", "check_out": "2025-01-03"}
+
+    first = client.post("/api/booking/hotels/search", json=body, headers=headers)
+    second = client.post("/api/booking/hotels/search", json=body, headers=headers)
+    assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT" and "Age" in second.headers
+    assert second.json() == first.json()
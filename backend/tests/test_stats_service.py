@@ -0,0 +1,96 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy import select, func, update, delete
+
+from config.database import AsyncSessionLocal, Base, engine
+from models.models import User, Booking, ChatSession, StatCounter
+from services.stats_service import StatsService, TOTAL, DAILY_BOOKINGS
+
+
+async def _source_counts():
+    async with AsyncSessionLocal() as db:
+        return {
+            "total_users": await db.scalar(select(func.count()).select_from(User)),
+            "active_users": await db.scalar(select(func.count()).select_from(User).where(User.is_active == True)),
+            "total_bookings": await db.scalar(select(func.count()).select_from(Booking)),
+            "total_chat_sessions": await db.scalar(select(func.count()).select_from(ChatSession))
+        }
+
+
+def test_counters_track_writes_and_reconcile_fixes_drift():
+    Base.metadata.create_all(bind=engine)
+    service = StatsService()
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+
+    async def scenario():
+        await service.reconcile()
+        async with AsyncSessionLocal() as db:
+            before = await service.snapshot(db, days=2, hours=3)
+
+        # Ghi qua các hook như route: user mới, booking, chat session
+        async with AsyncSessionLocal() as db:
+            name = f"stats-{uuid.uuid4().hex[:8]}"
+            user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+            db.add(user)
+            await db.flush()
+            await service.record_user(db, active=user.is_active)
+            db.add(Booking(user_id=user.id, booking_type="hotel", booking_reference=str(uuid.uuid4()),
+                           status="pending", total_amount=1200000, booking_data={}))
+            await service.record_booking(db, "hotel", 1200000)
+            db.add(ChatSession(user_id=user.id, session_id=str(uuid.uuid4()), title="stats"))
+            await service.record_chat_session(db)
+            await db.commit()
+            user.is_active = False
+            await service.record_user_active_changed(db, False)
+            await db.commit()
+            after = await service.snapshot(db, days=2, hours=3)
+
+        # Xóa chat session trừ lại tổng và bucket giờ tạo trong cùng transaction
+        async with AsyncSessionLocal() as db:
+            session = await db.scalar(select(ChatSession).where(ChatSession.user_id == user.id))
+            await db.delete(session)
+            await service.record_chat_session_deleted(db, session.created_at)
+            await db.commit()
+            deleted = await service.snapshot(db, days=2, hours=3)
+        # Counter đã đúng sau khi xóa nên reconcile không thấy drift
+        deleted_drift = await service.reconcile(days=1)
+
+        # Drift: counter bị sửa tay phải được reconcile tính lại từ bảng gốc
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(StatCounter).where(StatCounter.metric == "bookings", StatCounter.bucket == TOTAL)
+                             .values(count=StatCounter.count + 5))
+            await db.commit()
+        drift = await service.reconcile(days=1)
+        async with AsyncSessionLocal() as db:
+            reconciled = await service.snapshot(db, days=2, hours=3)
+            booking_rows = await db.scalar(select(func.count()).select_from(StatCounter)
+                                           .where(StatCounter.metric == DAILY_BOOKINGS, StatCounter.bucket == today))
+        source = await _source_counts()
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ChatSession).where(ChatSession.user_id == user.id))
+            await db.execute(delete(Booking).where(Booking.user_id == user.id))
+            await db.execute(delete(User).where(User.id == user.id))
+            await db.commit()
+        await service.reconcile(days=1)
+        return before, after, deleted, deleted_drift, reconciled, drift, source, booking_rows
+
+    before, after, deleted, deleted_drift, reconciled, drift, source, booking_rows = asyncio.run(scenario())
+    assert after["total_users"] == before["total_users"] + 1
+    assert after["active_users"] == before["active_users"]
+    assert after["total_bookings"] == before["total_bookings"] + 1
+    assert after["total_chat_sessions"] == before["total_chat_sessions"] + 1
+    assert after["bookings_per_day"][-1]["by_type"]["hotel"] == before["bookings_per_day"][-1]["by_type"].get("hotel", 0) + 1
+    assert after["revenue_per_day"][-1]["revenue"] == before["revenue_per_day"][-1]["revenue"] + 1200000
+    assert after["chat_sessions_per_hour"][-1]["sessions"] == before["chat_sessions_per_hour"][-1]["sessions"] + 1
+    assert [point["date"] for point in after["bookings_per_day"]][-1] == datetime.utcnow().strftime("%Y-%m-%d")
+    assert len(after["chat_sessions_per_hour"]) == 3
+    assert deleted["total_chat_sessions"] == before["total_chat_sessions"]
+    assert deleted["chat_sessions_per_hour"][-1]["sessions"] == before["chat_sessions_per_hour"][-1]["sessions"]
+    assert deleted_drift == 0
+
+    assert drift >= 5
+    assert {key: reconciled[key] for key in source} == source
+    assert booking_rows >= 1
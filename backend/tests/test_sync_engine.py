@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+
+from scripts.sync_engine import SyncEngine, retry_until, wait_for_healthy
+
+
+def test_health_wait_backs_off_until_service_is_ready():
+    calls = []
+
+    def handler(request):
+        calls.append(time.perf_counter())
+        return httpx.Response(200 if len(calls) >= 4 else 503)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            ready = await wait_for_healthy(client, "Langflow", "http://langflow/api/v1/health", timeout=5)
+            never = await retry_until(lambda: asyncio.sleep(0, result=False), timeout=0.05, base=0.01, cap=0.02)
+        return ready, never
+
+    ready, never = asyncio.run(scenario())
+    assert ready and len(calls) == 4
+    assert never is False
+
+
+def test_independent_tasks_run_concurrently_with_timings():
+    async def slow(result):
+        await asyncio.sleep(0.1)
+        return result
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        engine = SyncEngine("test")
+        async with engine.stage("Resolve Flow ID"):
+            pass
+        started = time.perf_counter()
+        results = await engine.run_parallel("Sync tasks", {
+            "a": lambda: slow(True),
+            "b": lambda: slow(True),
+            "c": lambda: slow(False),
+            "d": broken
+        })
+        return engine, results, time.perf_counter() - started
+
+    engine, results, elapsed = asyncio.run(scenario())
+    assert results == {"a": True, "b": True, "c": False, "d": False}
+    assert elapsed < 0.25
+    assert [name.strip() for name, _, _ in engine.timings][:2] == ["Resolve Flow ID", "Sync tasks"]
+    assert set(engine.breakdown()) == {"Resolve Flow ID", "Sync tasks", "a", "b", "c", "d"}
@@ -0,0 +1,58 @@
+import asyncio
+import time
+import uuid
+
+from config.database import Base, engine
+from services.weather_cache_service import WeatherCacheService, normalize_location
+
+
+def test_normalize_location():
+    assert normalize_location("  Hà  Nội, ") == normalize_location("hà nội")
+    assert WeatherCacheService.make_key("forecast", "Da Nang", 5) == "forecast:da nang:5"
+
+
+def test_fresh_stale_and_db_tiers():
+    Base.metadata.create_all(bind=engine)
+    key = WeatherCacheService.make_key("current", f"city-{uuid.uuid4().hex}")
+    calls = []
+
+    async def fetcher():
+        calls.append(time.time())
+        return {"temp": len(calls)}
+
+    async def scenario():
+        cache = WeatherCacheService()
+        cache.stale_window = 60
+
+        first = await cache.get_or_fetch(key, 60, fetcher)
+        fresh = await cache.get_or_fetch(key, 60, fetcher)
+
+        # Entry quá TTL nhưng còn trong cửa sổ stale: trả ngay bản cũ, refresh ở background
+        cache._lru[key]["fetched_at"] -= 61
+        stale = await cache.get_or_fetch(key, 60, fetcher)
+        await asyncio.gather(*cache._background_tasks)
+
+        # Process khác (LRU trống, Redis không có): đọc từ bảng weather_cache
+        other = WeatherCacheService()
+        from_db = await other.get_or_fetch(key, 60, fetcher)
+        return first, fresh, stale, from_db, cache.get_stats(), other.get_stats()
+
+    first, fresh, stale, from_db, stats, other_stats = asyncio.run(scenario())
+    assert (first, fresh, stale, from_db) == ({"temp": 1}, {"temp": 1}, {"temp": 1}, {"temp": 2})
+    assert len(calls) == 2
+    assert stats["stale_served"] == 1 and stats["upstream_fetches"] == 2
+    assert other_stats["db_hits"] == 1 and other_stats["upstream_fetches"] == 0
+
+
+def test_errors_are_not_cached():
+    key = WeatherCacheService.make_key("current", f"city-{uuid.uuid4().hex}")
+
+    async def failing():
+        return {"error": "upstream down"}
+
+    async def scenario():
+        cache = WeatherCacheService()
+        await cache.get_or_fetch(key, 60, failing)
+        return await cache.lookup(key)
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,113 @@
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from config.database import Base, engine
+from services.weather_service import WeatherService
+
+CURRENT = {"name": "Da Nang", "main": {"temp": 30, "feels_like": 33, "humidity": 70, "pressure": 1010},
+           "wind": {"speed": 3}, "weather": [{"description": "nắng", "icon": "01d"}], "visibility": 10000}
+
+
+def _service(handler) -> WeatherService:
+    service = WeatherService()
+    service.api_key = "test"
+    service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service
+
+
+def test_current_and_forecast_are_fetched_concurrently():
+    Base.metadata.create_all(bind=engine)
+
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        if request.url.path.endswith("/weather"):
+            return httpx.Response(200, json=CURRENT)
+        return httpx.Response(200, json={"list": [], "city": {"timezone": 25200}})
+
+    async def scenario():
+        service = _service(handler)
+        start = time.perf_counter()
+        current, forecast = await service.get_current_with_forecast(f"city-{uuid.uuid4().hex}", 5)
+        elapsed = time.perf_counter() - start
+        await service.shutdown()
+        return current, forecast, elapsed
+
+    current, forecast, elapsed = asyncio.run(scenario())
+    assert current["name"] == "Da Nang"
+    assert forecast["list"] == []
+    assert elapsed < 0.35
+
+
+def test_forecast_failure_degrades_to_empty_forecast():
+    Base.metadata.create_all(bind=engine)
+
+    def handler(request):
+        if request.url.path.endswith("/weather"):
+            return httpx.Response(200, json=CURRENT)
+        return httpx.Response(502)
+
+    async def scenario():
+        service = _service(handler)
+        current, forecast = await service.get_current_with_forecast(f"city-{uuid.uuid4().hex}", 5)
+        await service.shutdown()
+        return service.format_weather_response(current, forecast)
+
+    result = asyncio.run(scenario())
+    assert result["location"] == "Da Nang"
+    assert result["forecast"] == []
+
+
+def test_batch_dedupes_bounds_concurrency_and_serves_cache_hits():
+    Base.metadata.create_all(bind=engine)
+    in_flight = {"now": 0, "max": 0, "calls": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["calls"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        if request.url.path.endswith("/weather"):
+            return httpx.Response(200, json={**CURRENT, "name": request.url.params["q"]})
+        return httpx.Response(200, json={"list": []})
+
+    suffix = uuid.uuid4().hex
+    locations = [f"City {i} {suffix}" for i in range(6)]
+
+    async def scenario():
+        service = _service(handler)
+        service.batch_concurrency = 2
+        service.rate_limit_per_minute = 0
+        first = await service.get_batch(locations + [f"  city 0 {suffix.upper()} "], 3)
+        calls_after_first = in_flight["calls"]
+        second = [item async for item in service.iter_batch(locations, 3)]
+        await service.shutdown()
+        return first, second, calls_after_first
+
+    first, second, calls_after_first = asyncio.run(scenario())
+    assert [item["location"] for item in first] == locations
+    assert all(item["status"] == "ok" and not item["cached"] for item in first)
+    # current + forecast cho mỗi địa điểm, tối đa 2 địa điểm cùng lúc
+    assert calls_after_first == 12
+    assert in_flight["max"] <= 4
+    assert all(item["cached"] for item in second)
+    assert in_flight["calls"] == calls_after_first
+
+
+def test_rate_limiter_allows_burst_then_throttles():
+    service = WeatherService()
+    service.rate_limit_per_minute = 600  # 10/s
+    service.rate_limit_burst = 2
+    service._rate_tokens = 2.0
+
+    async def scenario():
+        start = time.perf_counter()
+        for _ in range(3):
+            await service._wait_for_rate_limit()
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(scenario())
+    assert 0.07 < elapsed < 0.3
@@ -8,7 +8,7 @@ interface FlowIdStatus {
   lastUpdated: Date | null;
 }
 
-export const useFlowId = (autoRefresh: boolean = true, refreshInterval: number = 30000) => {
+export const useFlowId = (live: boolean = true) => {
   const [status, setStatus] = useState<FlowIdStatus>({
     flowId: langflowApi.getFlowId(),
     isLoading: false,
@@ -43,24 +43,19 @@ export const useFlowId = (autoRefresh: boolean = true, refreshInterval: number =
     }
   }, []);
 
-  // Auto refresh effect
+  // Live updates pushed by the backend (SSE), no polling
   useEffect(() => {
-    if (!autoRefresh) return;
+    if (!live) return;
 
-    // Initial refresh
-    refreshFlowId().catch(() => {
-      // Error already handled in refreshFlowId
-    });
-
-    // Set up interval for auto refresh
-    const interval = setInterval(() => {
-      refreshFlowId().catch(() => {
-        // Error already handled in refreshFlowId
+    return langflowApi.subscribeFlowId((flowId) => {
+      setStatus({
+        flowId,
+        isLoading: false,
+        error: null,
+        lastUpdated: new Date()
       });
-    }, refreshInterval);
-
-    return () => clearInterval(interval);
-  }, [autoRefresh, refreshInterval, refreshFlowId]);
+    });
+  }, [live]);
 
   // Manual refresh function
   const manualRefresh = useCallback(async () => {
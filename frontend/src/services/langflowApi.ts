@@ -45,6 +45,8 @@ class LangflowApiService {
   private baseUrl: string;
   private flowId: string;
   private backendUrl: string;
+  private flowIdEvents: EventSource | null = null;
+  private flowIdListeners = new Set<(flowId: string) => void>();
   constructor() {
     // Use the latest working flow ID from the uploader logs (fallback)
     this.baseUrl = 'http://localhost:8080';
@@ -55,8 +57,8 @@ class LangflowApiService {
     
     console.log(`🔧 LangflowApi initialized with backend URL: ${this.backendUrl}`);
     
-    // Tự động cập nhật flow ID từ backend khi khởi tạo với retry
-    this.initializeFlowIdWithRetry();
+    // Nhận flow ID từ backend qua server-push
+    this.connectFlowIdEvents();
   }
   private getBackendUrl(): string {
     // Kiểm tra environment variables từ window object
@@ -75,80 +77,36 @@ class LangflowApiService {
     }
   }
 
-  private async initializeFlowIdWithRetry(): Promise<void> {
-    let retryCount = 0;
-    const maxRetries = 5;
-    const retryDelay = 2000; // 2 seconds
-    
-    while (retryCount < maxRetries) {
-      try {
-        await this.initializeFlowId();
-        console.log('✅ Flow ID initialized successfully');
-        
-        // Start periodic checking after successful initialization
-        this.startPeriodicFlowIdCheck();
-        return;
-      } catch (error) {
-        retryCount++;
-        console.warn(`⚠️ Flow ID initialization attempt ${retryCount}/${maxRetries} failed:`, error);
-        
-        if (retryCount >= maxRetries) {
-          console.error('❌ Flow ID initialization failed after all retries, using fallback');
-          
-          // Still start periodic checking even if initial fetch failed
-          this.startPeriodicFlowIdCheck();
-          return;
-        }
-        
-        // Wait before retry
-        await new Promise(resolve => setTimeout(resolve, retryDelay));
-      }
-    }
-  }
+  private connectFlowIdEvents(): void {
+    // Backend đẩy Flow ID hiện tại ngay khi kết nối và mỗi khi đổi flow (SSE),
+    // EventSource tự kết nối lại nên không cần polling
+    if (this.flowIdEvents || typeof EventSource === 'undefined') return;
 
-  private startPeriodicFlowIdCheck(): void {
-    // Check for Flow ID updates every 30 seconds
-    setInterval(async () => {
-      try {
-        await this.initializeFlowId();
-      } catch (error) {
-        // Silently handle errors during periodic checks
-        console.debug('Periodic Flow ID check failed:', error);
+    this.flowIdEvents = new EventSource(`${this.backendUrl}/api/chatbot/flow-id/events`);
+    this.flowIdEvents.addEventListener('flow_id', (event) => {
+      const { flow_id: flowId } = JSON.parse((event as MessageEvent).data);
+      if (!flowId) return;
+      if (flowId !== this.flowId) {
+        console.log(`🔄 Flow ID pushed from backend: ${this.flowId} -> ${flowId}`);
+        this.flowId = flowId;
       }
-    }, 30000);
-    
-    console.log('🔄 Started periodic Flow ID checking (30s interval)');
+      this.flowIdListeners.forEach(listener => listener(flowId));
+    });
+    this.flowIdEvents.onerror = () => {
+      console.debug('⚠️ Flow ID event stream interrupted, reconnecting');
+    };
+
+    console.log('📡 Subscribed to Flow ID events');
   }
 
-  private async initializeFlowId(): Promise<void> {
-    try {
-      console.log(`🔄 Attempting to fetch flow ID from: ${this.backendUrl}/api/chatbot/flow-id`);
-      
-      const response = await fetch(`${this.backendUrl}/api/chatbot/flow-id`, {
-        method: 'GET',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        // Add timeout
-        signal: AbortSignal.timeout(5000)
-      });
-      
-      if (response.ok) {
-        const data = await response.json();
-        if (data.flow_id && data.flow_id !== this.flowId) {
-          console.log(`🔄 Auto-updating flow ID from ${this.flowId} to ${data.flow_id}`);
-          this.flowId = data.flow_id;
-        } else {
-          console.log(`✅ Flow ID is up to date: ${this.flowId}`);
-        }
-      } else {
-        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-      }
-    } catch (error) {
-      console.warn('⚠️ Could not auto-update flow ID from backend:', error);
-      throw error; // Re-throw for retry logic
-    }
+  subscribeFlowId(listener: (flowId: string) => void): () => void {
+    this.flowIdListeners.add(listener);
+    this.connectFlowIdEvents();
+    return () => {
+      this.flowIdListeners.delete(listener);
+    };
   }
+
   async sendMessage(message: string, sessionId: string = 'user-session', userContext?: any): Promise<string> {
     try {
       // Prepare the message payload
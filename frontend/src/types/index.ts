@@ -51,10 +51,12 @@ export interface WeatherData {
     date: string;
     temp_min: number;
     temp_max: number;
+    temp_mean: number;
     description: string;
     icon: string;
     humidity: number;
     wind_speed: number;
+    precipitation: number;
   }>;
 }
 